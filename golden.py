@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Golden-corpus regression and performance harness for pypay.
+
+Runs every statement PDF in a fixture directory through extract() and
+process(), compares the extracted rows and the resulting splits with the
+golden files stored in <fixture_dir>/golden, and appends per-file timing and
+peak memory to <fixture_dir>/golden/history.jsonl.
+
+Usage:
+    python golden.py FIXTURE_DIR            # check against golden files
+    python golden.py FIXTURE_DIR --update   # (re)write golden files
+"""
+
+import argparse
+import difflib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import datetime
+
+import piecash
+
+from load import (AccountRegistry, ENGINES, StrategyCache, build_manifest, create_gnucash_accounts,
+                  parse_file, process)
+
+
+def split_set(transaction):
+    """Return a transaction's splits as a sorted list of [account, memo, value]"""
+    if transaction is None:
+        return []
+    return sorted([split.account.fullname, split.memo, f"{split.value:.2f}"] for split in transaction.splits)
+
+
+def measure(entry, engine):
+    """
+    Extract a statement once for timing and once more under tracemalloc.
+
+    Args:
+        entry: Manifest entry of the statement
+        engine: Name of the extraction engine
+
+    Returns:
+        Tuple of (rows, seconds, peak memory in KiB)
+    """
+    start = time.perf_counter()
+    rows = parse_file(entry['source'], StrategyCache(), engine=engine)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        parse_file(entry['source'], StrategyCache(), engine=engine)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return rows, seconds, peak // 1024
+
+
+def load_rows(entry, rows, workdir, book, registry):
+    """Write extracted rows like extract() does and load them with process()"""
+    json_filepath = os.path.join(workdir, entry['name'][:-4] + ".json")
+    with open(json_filepath, "w") as f:
+        json.dump(rows, f, indent=2)
+
+    try:
+        return split_set(process(json_filepath, book, registry, date=entry['date'], errata_path=entry['errata']))
+    except Exception as e:
+        book.session.rollback()
+        registry.load_from_book(book)
+        return {'error': f"{type(e).__name__}: {e}"}
+
+
+def git_revision():
+    """Return the current git commit of the working tree, if any"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def previous_run(history_path, engine):
+    """Return the most recent history record for an engine, or None"""
+    if not os.path.exists(history_path):
+        return None
+    last = None
+    with open(history_path, "r") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get('engine') == engine:
+                last = record
+    return last
+
+
+def run(fixture_dir, update=False, engine='pdfplumber'):
+    """
+    Run the golden corpus and record performance history.
+
+    Args:
+        fixture_dir: Directory with statement PDFs (and errata JSON files)
+        update: Rewrite the golden files instead of comparing against them
+        engine: Name of the extraction engine
+
+    Returns:
+        Number of statements whose rows or splits differ from the golden files
+    """
+    golden_dir = os.path.join(fixture_dir, 'golden')
+    os.makedirs(golden_dir, exist_ok=True)
+    history_path = os.path.join(golden_dir, 'history.jsonl')
+    previous = previous_run(history_path, engine)
+
+    workdir = tempfile.mkdtemp()
+    gnucash_file = os.path.join(workdir, 'golden.gnucash')
+    create_gnucash_accounts(gnucash_file)
+    book = piecash.open_book(gnucash_file, readonly=False, do_backup=False, open_if_lock=True)
+    registry = AccountRegistry()
+    registry.load_from_book(book)
+
+    mismatches = 0
+    timings = {}
+    try:
+        for entry in build_manifest(fixture_dir, formats=['.pdf']):
+            rows, seconds, peak_kb = measure(entry, engine)
+            timings[entry['name']] = {'seconds': round(seconds, 4), 'peak_kb': peak_kb}
+            result = {'rows': rows, 'splits': load_rows(entry, rows, workdir, book, registry)}
+
+            golden_path = os.path.join(golden_dir, entry['name'][:-4] + ".json")
+            if update:
+                with open(golden_path, "w") as f:
+                    json.dump(result, f, indent=2)
+                print(f"Updated {golden_path}")
+                continue
+
+            if not os.path.exists(golden_path):
+                print(f"MISSING {entry['name']}: no golden file, run with --update")
+                mismatches += 1
+                continue
+
+            with open(golden_path, "r") as f:
+                expected = json.load(f)
+            if result != expected:
+                mismatches += 1
+                print(f"DIFF {entry['name']}:")
+                diff = difflib.unified_diff(json.dumps(expected, indent=2).splitlines(),
+                                            json.dumps(result, indent=2).splitlines(),
+                                            'golden', 'current', lineterm='')
+                for line in diff:
+                    print(f"  {line}")
+            else:
+                print(f"OK {entry['name']}")
+    finally:
+        book.close()
+        shutil.rmtree(workdir)
+
+    total = sum(t['seconds'] for t in timings.values())
+    record = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'engine': engine,
+        'mismatches': mismatches,
+        'total_seconds': round(total, 4),
+        'peak_kb': max((t['peak_kb'] for t in timings.values()), default=0),
+        'files': timings,
+    }
+    with open(history_path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    print(f"\n{len(timings)} statement(s), {mismatches} mismatch(es), {total:.2f}s extraction, "
+          f"peak {record['peak_kb']} KiB")
+    if previous:
+        for name, timing in sorted(timings.items()):
+            before = previous['files'].get(name)
+            if before and before['seconds']:
+                change = (timing['seconds'] - before['seconds']) / before['seconds'] * 100
+                print(f"  {name}: {timing['seconds']:.3f}s ({change:+.0f}% vs {previous.get('revision') or previous['timestamp']}), "
+                      f"{timing['peak_kb']} KiB ({timing['peak_kb'] - before['peak_kb']:+d} KiB)")
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check parsing against a golden statement corpus')
+    parser.add_argument('fixture_dir', help='Directory containing fixture statement PDFs')
+    parser.add_argument('--update', action='store_true', help='Rewrite golden files from the current output')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='pdfplumber', help='PDF extraction engine (default: pdfplumber)')
+    args = parser.parse_args()
+
+    sys.exit(1 if run(args.fixture_dir, update=args.update, engine=args.engine) else 0)
+
+
+if __name__ == "__main__":
+    main()
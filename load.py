@@ -1,13 +1,42 @@
 import argparse
+import concurrent.futures
+import contextlib
+import csv
+import hashlib
+import html.parser
+import http.server
 import json
+import multiprocessing
+import multiprocessing.connection
+import numpy as np
 import os
 import piecash
 import pdfplumber
+import queue
 import re
+import shutil
+import sqlite3
 import sys
-
-from datetime import datetime
-from decimal import Decimal, DecimalException, getcontext
+import tempfile
+import threading
+import time
+import urllib.parse
+import zipfile
+
+from collections import Counter, deque, namedtuple
+from datetime import date, datetime
+from decimal import Decimal, getcontext
+from numpy.lib.stride_tricks import sliding_window_view
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LTChar, LTContainer
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve1
+from pdfminer.utils import decode_text
+from piecash.kvp import Slot
+from sqlalchemy import event, select
 
 
 class AccountRegistry:
@@ -38,6 +67,33 @@ class AccountRegistry:
         return account_path in self._accounts
 
 
+class PathRegistry:
+    """
+    Account registry without a book: resolves account paths to themselves.
+
+    Used to compute the splits of a statement without opening GnuCash, e.g.
+    to preview them over HTTP. Paths are checked against ACCOUNT_PATHS, the
+    accounts create_gnucash_accounts creates.
+    """
+
+    def get(self, account_path):
+        """Get an account path, validating that the account exists"""
+        if account_path not in ACCOUNT_PATHS_SET:
+            raise ValueError(f"Account not found: {account_path}")
+        return account_path
+
+    def get_safe(self, account_path):
+        """Get an account path, returns None if not found"""
+        return account_path if account_path in ACCOUNT_PATHS_SET else None
+
+    def has(self, account_path):
+        """Check if an account exists"""
+        return account_path in ACCOUNT_PATHS_SET
+
+
+# Split computed by the account functions, turned into a piecash.Split by add_transaction
+PendingSplit = namedtuple('PendingSplit', ['account', 'memo', 'value'])
+
 def add_split(splits_groups, group_name, account, memo, value):
     """
     Add a split to a specific group within splits_groups.
@@ -45,40 +101,43 @@ def add_split(splits_groups, group_name, account, memo, value):
     Args:
         splits_groups: Dictionary containing split groups
         group_name: Name of the group (e.g., 'earnings', 'invisible', 'match401k', 'matchrestor')
-        account: GnuCash account object
+        account: Account as returned by the registry (GnuCash account or path)
         memo: Description for the split
-        value: Decimal value for the split
+        value: Value for the split in integer cents
     """
     if group_name not in splits_groups:
         splits_groups[group_name] = []
 
     print("add split", group_name, account, memo, value)
-    splits_groups[group_name].append(piecash.Split(account=account, memo=memo, value=value))
-
+    splits_groups[group_name].append(PendingSplit(account=account, memo=memo, value=value))
 
-def print_value(splits_groups, properties, item, data, registry):
-    print(item["desc"], item.get("cur"))
-
-def earnings(splits_groups, properties, item, data, registry):
-    value = parse_amount(item.get("cur"))
 
+def item_cents(item):
+    """Return an item's current amount in cents, as tokenized once by statement_items()"""
+    value = item.get("cents")
     if value is None:
         raise ValueError(f"Missing or invalid 'cur' value for item: {item['desc']}")
+    return value
+
+def print_value(splits_groups, properties, item, data, registry):
+    cents = item.get("cents")
+    print(item["desc"], None if cents is None else cents_to_decimal(cents))
 
+def add_earnings(splits_groups, properties, registry, value):
     account = registry.get(properties["account"])
     add_split(splits_groups, "earnings", account, properties["desc"], -value)
 
-def outstanding_stock_tax(splits_groups, properties, item, data, registry):
-    value = parse_amount(item.get("cur"))
+def earnings(splits_groups, properties, item, data, registry):
+    add_earnings(splits_groups, properties, registry, item_cents(item))
 
-    if value is None:
-        raise ValueError(f"Missing or invalid 'cur' value for item: {item['desc']}")
+def outstanding_stock_tax(splits_groups, properties, item, data, registry):
+    value = item_cents(item)
 
     def deferred_outstanding_stock_tax():
         splits = splits_groups["earnings"]
 
         taxable_rsu_account = registry.get(ACCOUNT_PATHS['INCOME_TAXABLE_RSU'])
-        taxable_rsu = Decimal('0.00')
+        taxable_rsu = 0
         for split in splits:
             if split.account == taxable_rsu_account:
                 taxable_rsu += split.value
@@ -87,7 +146,7 @@ def outstanding_stock_tax(splits_groups, properties, item, data, registry):
         add_split(splits_groups, "earnings", aftertax_rsu_account, "aftertax rsu", value - taxable_rsu)
 
         stock_tax_account = registry.get(ACCOUNT_PATHS['EXPENSE_TAXES_STOCK'])
-        delta = Decimal('0.00')
+        delta = 0
         for split in splits:
             delta += split.value
         add_split(splits_groups, "earnings", stock_tax_account, "stock tax", -delta)
@@ -95,10 +154,7 @@ def outstanding_stock_tax(splits_groups, properties, item, data, registry):
     return deferred_outstanding_stock_tax
 
 def dcp_payout(splits_groups, properties, item, data, registry):
-    value = parse_amount(item.get("cur"))
-
-    if value is None:
-        raise ValueError(f"Missing or invalid 'cur' value for item: {item['desc']}")
+    value = item_cents(item)
 
     add_split(splits_groups, "earnings", registry.get(properties["account"]), properties["desc"], -value)
     add_split(splits_groups, "earnings", registry.get(ACCOUNT_PATHS['ASSET_DCP_PAYOUT']), "unknown split", -value)
@@ -106,16 +162,13 @@ def dcp_payout(splits_groups, properties, item, data, registry):
 
 def drsu_vest(splits_groups, properties, item, data, registry):
     splits = splits_groups["earnings"]
-    value = parse_amount(item.get("cur"))
-
-    if value is None:
-        raise ValueError(f"Missing or invalid 'cur' value for item: {item['desc']}")
+    value = item_cents(item)
 
     drsu_income_account = registry.get(ACCOUNT_PATHS['INCOME_TAXABLE_DRSU'])
     add_split(splits_groups, "earnings", drsu_income_account, properties["desc"], -value)
 
     def deferred_drsu_vest():
-        total = Decimal('0.00')
+        total = 0
         for split in splits:
             total += split.value
 
@@ -130,10 +183,7 @@ def drsu_vest(splits_groups, properties, item, data, registry):
 
 
 def add_imputed_income(splits_groups, properties, item, data, registry):
-    value = parse_amount(item.get("cur"))
-
-    if value is None:
-        raise ValueError(f"Missing or invalid 'cur' value for item: {item['desc']}")
+    value = item_cents(item)
 
     invisible_equity_account = registry.get(ACCOUNT_PATHS['EQUITY_INVISIBLE'])
     add_split(splits_groups, "invisible", invisible_equity_account, properties["desc"], value)
@@ -142,10 +192,7 @@ def add_imputed_income(splits_groups, properties, item, data, registry):
     add_split(splits_groups, "invisible", imputed_income_account, properties["desc"], -value)
 
 def match_401k(splits_groups, properties, item, data, registry):
-    value = parse_amount(item.get("cur"))
-
-    if value is None:
-        raise ValueError(f"Missing or invalid 'cur' value for item: {item['desc']}")
+    value = item_cents(item)
 
     match_401k_account = registry.get(ACCOUNT_PATHS['ASSET_401K_PRETAX_EMPLOYER'])
     add_split(splits_groups, "match401k", match_401k_account, properties["desc"], value)
@@ -154,10 +201,7 @@ def match_401k(splits_groups, properties, item, data, registry):
     add_split(splits_groups, "match401k", non_taxable_401k_account, properties["desc"], -value)
 
 def match_restor(splits_groups, properties, item, data, registry):
-    value = parse_amount(item.get("cur"))
-
-    if value is None:
-        raise ValueError(f"Missing or invalid 'cur' value for item: {item['desc']}")
+    value = item_cents(item)
 
     match_restor_account = registry.get(ACCOUNT_PATHS['ASSET_DCP_RESTOR'])
     add_split(splits_groups, "matchrestor", match_restor_account, properties["desc"], value)
@@ -167,15 +211,7 @@ def match_restor(splits_groups, properties, item, data, registry):
 
 
 def total_net_pay(splits_groups, properties, item, data, registry):
-    value = parse_amount(item.get("cur"))
-
-    if value is None:
-        raise ValueError(f"Missing or invalid 'cur' value for item: {item['desc']}")
-
-    # Create a modified item with negated value
-    modified_item = item.copy()
-    modified_item["cur"] = str(-value)
-    return earnings(splits_groups, properties, modified_item, data, registry)
+    add_earnings(splits_groups, properties, registry, -item_cents(item))
 
 # Centralized registry of all account paths used in the system
 ACCOUNT_PATHS = {
@@ -236,6 +272,8 @@ ACCOUNT_PATHS = {
     'EQUITY_ADJUSTMENT': 'Equity:Adjustment',
 }
 
+ACCOUNT_PATHS_SET = frozenset(ACCOUNT_PATHS.values())
+
 ACCOUNTS = {
     'Manual Adjustment': {
         'account': ACCOUNT_PATHS['EQUITY_ADJUSTMENT'],
@@ -561,23 +599,47 @@ SEARCH_ACCOUNTS = [
 ]
 
 
-def parse_amount(text):
-    if text is None:
-        return None
+# Amount token: optional leading or trailing minus ("900.00-"), thousands separators
+AMOUNT_PATTERN = re.compile(r"\s*(-)?(\d+(?:,\d+)*)?(?:\.(\d+))?(-)?\s*")
+# Words of a statement table that are amounts
+AMOUNT_WORD_PATTERN = re.compile(r"\d+(,\d+)?(\.\d+)?-?")
 
-    if text.endswith("-"):
-        text = "-" + text[:-1]
+def amount_cents(text):
+    """
+    Tokenize an amount into integer cents in a single pass.
 
-    try:
-        return Decimal(text.replace(",", ""))
-    except (ValueError, DecimalException):
+    Fractions beyond cents are rounded half to even.
+
+    Args:
+        text: Amount such as '1,234.56', '900.00-' or '-12.5'
+
+    Returns:
+        Integer cents, or None if text is missing or not an amount
+    """
+    if text is None:
+        return None
+    match = AMOUNT_PATTERN.fullmatch(text)
+    if match is None:
+        return None
+    leading_minus, whole, fraction, trailing_minus = match.groups()
+    if (whole is None and fraction is None) or (leading_minus and trailing_minus):
         return None
 
+    fraction = fraction or ""
+    cents = int(whole.replace(",", "") if whole else 0) * 100 + int(fraction[:2].ljust(2, "0"))
+    rest = fraction[2:]
+    if rest:
+        half = 5 * 10 ** (len(rest) - 1)
+        if int(rest) > half or (int(rest) == half and cents % 2):
+            cents += 1
+    return -cents if leading_minus or trailing_minus else cents
 
+def cents_to_decimal(cents):
+    """Materialize integer cents as a two-place Decimal"""
+    return Decimal(cents).scaleb(-2)
 
 def is_amount(text):
-    pattern = r"^\d+(,\d+)?(\.\d+)?-?$"
-    return bool(re.match(pattern, text))
+    return AMOUNT_WORD_PATTERN.fullmatch(text) is not None
 
 def parse_date_from_file_name(path):
     file_name = path.split("/")[-1]
@@ -595,7 +657,7 @@ def parse_date_from_file_name(path):
     # Format 2: "Statement for Apr 16, 2021.json" or "Statement for Apr 16, 2021-1.json"
     if "Statement for" in file_name:
         # Extract date portion: "Apr 16, 2021" from "Statement for Apr 16, 2021.json"
-        date_part = file_name.replace("Statement for ", "").split(".json")[0]
+        date_part = os.path.splitext(file_name.replace("Statement for ", ""))[0]
         # Remove trailing -N suffix if present
         date_part = re.sub(r'-\d+$', '', date_part)
         try:
@@ -607,6 +669,123 @@ def parse_date_from_file_name(path):
     print("unable to parse date from filename:", file_name)
     return None
 
+def errata_name_for(basename):
+    """Return the name of the errata companion for a statement file, or None"""
+    if 'Statement for' in basename:
+        return os.path.splitext(basename)[0].replace('Statement for', 'Errata for') + '.json'
+    elif 'Payslip' in basename:
+        return os.path.splitext(basename)[0].replace('Payslip', 'Errata') + '.json'
+    return None
+
+def build_manifest(directory, output_dir=None, skip=None, formats=None):
+    """
+    Scan a statement directory once and build the ordered work plan.
+
+    Each statement is read from its cheapest representation: a CSV or HTML
+    export is preferred over the PDF of the same name. Exports are only
+    picked up when their name carries a pay date. Every statement is paired
+    with the JSON file it will be extracted to and with its errata companion
+    (if present), and its pay date is parsed exactly once.
+
+    Args:
+        directory: Directory containing statement files and errata JSON files
+        output_dir: Directory for extracted JSON files (default: directory)
+        skip: Optional list of patterns; files containing any of them are skipped
+        formats: Extensions to consider, cheapest first (default: PARSERS)
+
+    Returns:
+        List of entry dicts with 'name', 'date', 'source', 'fallbacks', 'json'
+        and 'errata' keys, ordered by pay date (undated files last). The name
+        is always that of the statement PDF, whichever representation is the
+        source; 'fallbacks' lists the other representations, cheapest first,
+        read in turn when an export cannot be parsed.
+    """
+    formats = list(formats or PARSERS)
+    with os.scandir(directory) as it:
+        names = {e.name for e in it if e.is_file()}
+
+    sources = {}
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        if ext not in formats:
+            continue
+        if skip and any(pattern in name for pattern in skip):
+            print(f"Skipping {name}")
+            continue
+        if ext != ".pdf" and parse_date_from_file_name(name) is None:
+            continue
+        sources.setdefault(stem, []).append((formats.index(ext), name))
+
+    entries = []
+    for stem, ranked in sources.items():
+        ranked.sort()
+        name = ranked[0][1]
+        errata_name = errata_name_for(name)
+        entries.append({
+            'name': stem + ".pdf",
+            'date': parse_date_from_file_name(name),
+            'source': os.path.join(directory, name),
+            'fallbacks': [os.path.join(directory, other) for _, other in ranked[1:]],
+            'json': os.path.join(output_dir or directory, stem + ".json"),
+            'errata': os.path.join(directory, errata_name) if errata_name in names else None,
+        })
+
+    entries.sort(key=lambda e: (e['date'] is None, e['date'] or datetime.min.date(), e['name']))
+    return entries
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def dedupe_manifest(entries):
+    """
+    Remove repeated downloads of the same statement before extraction.
+
+    Only statements that share a pay date with another statement are hashed.
+    Byte-identical copies are dropped. Copies with the same date but different
+    content are held back for review; the copy with the shortest name (the one
+    without a "(1)" or "-1" download suffix) is the one that gets loaded.
+
+    Args:
+        entries: Manifest entries as returned by build_manifest
+
+    Returns:
+        Tuple of (entries to load, duplicates, conflicts); duplicates and
+        conflicts are lists of (held back entry, loaded entry) pairs
+    """
+    by_date = {}
+    for entry in entries:
+        if entry['date'] is not None:
+            by_date.setdefault(entry['date'], []).append(entry)
+
+    dropped = set()
+    duplicates = []
+    conflicts = []
+    for group in by_date.values():
+        if len(group) < 2:
+            continue
+
+        group = sorted(group, key=lambda e: (len(e['name']), e['name']))
+        kept = group[0]
+        by_digest = {}
+        for entry in group:
+            entry['sha256'] = file_digest(entry['source'])
+            if entry['sha256'] in by_digest:
+                duplicates.append((entry, by_digest[entry['sha256']]))
+                dropped.add(entry['source'])
+            else:
+                by_digest[entry['sha256']] = entry
+                if entry is not kept:
+                    conflicts.append((entry, kept))
+                    dropped.add(entry['source'])
+
+    return [e for e in entries if e['source'] not in dropped], duplicates, conflicts
+
 def parse_cell(cell):
     if cell is None or len(cell) == 0 or not re.search(r"[a-zA-Z0-9,]", cell):
         return
@@ -686,6 +865,144 @@ def detect_column_boundaries(words):
 
     return None
 
+# Column layout used when clustering cannot place a boundary. The values are
+# those of the original statement layout; desc_right and cur_ytd are relative
+# to the Amount and Year-To-Date headers.
+DEFAULT_LAYOUT = {
+    'main_right': 320,        # Main earnings table ends, Other Benefits starts
+    'other_desc_right': 430,  # Other Benefits descriptions end, This Period starts
+    'other_cur_ytd': 495,     # Other Benefits This Period / Year-to-Date boundary
+}
+
+# Largest horizontal distance (points) between numeric words of one column
+COLUMN_GAP = 20
+
+# Column layouts by layout fingerprint, shared by all pages in this process
+COLUMN_LAYOUTS = {}
+
+def cluster_positions(positions, gap=COLUMN_GAP):
+    """
+    Cluster 1-D positions into runs separated by more than gap.
+
+    Args:
+        positions: Iterable of x-coordinates
+        gap: Largest distance between neighbours of the same cluster
+
+    Returns:
+        List of (min, max) tuples, one per cluster, from left to right
+    """
+    xs = np.sort(np.fromiter(positions, dtype=float))
+    if xs.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(xs) > gap) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [xs.size])) - 1
+    return list(zip(xs[starts].tolist(), xs[ends].tolist()))
+
+def nearest_cluster(clusters, x):
+    """Return the cluster closest to x (0 when x lies inside it), or None"""
+    if not clusters:
+        return None
+    return min(clusters, key=lambda c: max(c[0] - x, 0, x - c[1]))
+
+def infer_column_layout(words, column_bounds, other_x0=None):
+    """
+    Infer the column boundaries of a page from the positions of its amounts.
+
+    The x0 positions of numeric words are clustered into columns. The main
+    table's Amount and Year-To-Date columns are the clusters nearest their
+    headers, and the Other Benefits columns are the clusters right of the
+    main table in rows that are not Quota Summary rows (those have three
+    values). A boundary that cannot be placed keeps its DEFAULT_LAYOUT value.
+
+    Args:
+        words: Word dictionaries of the page
+        column_bounds: Dict with the 'amount_col' and 'ytd_col' header positions
+        other_x0: x0 of the Other Benefits header, if the page has one
+
+    Returns:
+        Tuple of (layout dict, whether every boundary was inferred)
+    """
+    amount_col = column_bounds['amount_col']
+    ytd_col = column_bounds['ytd_col']
+    layout = dict(DEFAULT_LAYOUT, amount_col=amount_col, ytd_col=ytd_col,
+                  desc_right=amount_col - 20, cur_ytd=ytd_col)
+    complete = True
+
+    numeric = [w for w in words if is_amount(w['text'])]
+    right_edge = other_x0 if other_x0 is not None else float('inf')
+    main = cluster_positions(w['x0'] for w in numeric if w['x0'] < right_edge)
+    amount = nearest_cluster(main, amount_col)
+    ytd = nearest_cluster(main, ytd_col)
+    if amount is not None and ytd is not None and amount != ytd:
+        layout['desc_right'] = min(amount[0], amount_col) - 5
+        layout['cur_ytd'] = (amount[1] + ytd[0]) / 2
+        layout['main_right'] = (ytd[1] + other_x0) / 2 if other_x0 is not None else ytd[1] + COLUMN_GAP
+    else:
+        complete = False
+
+    if other_x0 is None:
+        return layout, complete
+
+    # Rows of the Other Benefits table with at most two values (not Quota Summary)
+    rows = {}
+    for w in numeric:
+        if w['x0'] > layout['main_right']:
+            rows.setdefault(round(w['top']), []).append(w['x0'])
+    other = cluster_positions(x for xs in rows.values() if len(xs) <= 2 for x in xs)
+    if len(other) >= 2:
+        layout['other_desc_right'] = other[0][0] - 5
+        layout['other_cur_ytd'] = (other[0][1] + other[1][0]) / 2
+    else:
+        complete = False
+    return layout, complete
+
+def other_columns_fit(layout, words):
+    """
+    Check that the Other Benefits amounts of a page fall into a layout's columns.
+
+    Those columns have no headers of their own, so the fingerprint cannot
+    see them drift; rows with two values must straddle other_cur_ytd, and no
+    amount may reach into the description column. Quota Summary rows (three
+    values) are not checked.
+    """
+    rows = {}
+    for w in words:
+        if w['x0'] > layout['main_right'] and is_amount(w['text']):
+            rows.setdefault(round(w['top']), []).append(w['x0'])
+    for xs in rows.values():
+        if len(xs) > 2:
+            continue
+        xs.sort()
+        if xs[0] <= layout['other_desc_right']:
+            return False
+        if len(xs) == 2 and not xs[0] < layout['other_cur_ytd'] < xs[1]:
+            return False
+    return True
+
+def column_layout(words, column_bounds, other_x0, stats):
+    """
+    Return the column layout of a page, cached by layout fingerprint.
+
+    The fingerprint is the rounded position of the column headers, so pages
+    of a known layout skip clustering while a shifted layout is re-inferred.
+    The headerless Other Benefits columns are checked against the page's
+    amounts instead (other_columns_fit()). Only fully inferred layouts are
+    cached.
+    """
+    fingerprint = (round(column_bounds['amount_col']), round(column_bounds['ytd_col']),
+                   round(other_x0) if other_x0 is not None else None)
+    layout = COLUMN_LAYOUTS.get(fingerprint)
+    if layout is not None and (other_x0 is None or other_columns_fit(layout, words)):
+        stats['layout_hits'] += 1
+        return layout
+
+    stats['layout_misses'] += 1
+    layout, complete = infer_column_layout(words, column_bounds, other_x0)
+    if complete:
+        COLUMN_LAYOUTS[fingerprint] = layout
+    return layout
+
 def is_earnings_table(table):
     """Check if table contains earnings data by examining header"""
     if not table or len(table) < 1:
@@ -734,23 +1051,22 @@ def group_words_by_row(words, start_idx, end_idx):
 
     return rows
 
-def parse_row_with_positions(row_words, column_bounds):
+def parse_row_with_positions(row_words, layout):
     """
     Parse a row of words using position information to classify values.
 
     Args:
         row_words: List of word dictionaries on same row
-        column_bounds: Dict with 'amount_col' and 'ytd_col' positions
+        layout: Column layout from column_layout()
 
     Returns:
         Dict with 'desc', 'cur', and/or 'ytd' fields
     """
-    amount_col = column_bounds['amount_col']
-    ytd_col = column_bounds['ytd_col']
+    desc_right = layout['desc_right']
+    cur_ytd = layout['cur_ytd']
 
-    # Define boundaries for main earnings table (left side only)
-    # "Other Benefits and Information" section starts around x=350
-    MAIN_TABLE_RIGHT_EDGE = 320
+    # Main earnings table (left side only), "Other Benefits and Information" is right of it
+    main_right = layout['main_right']
 
     # Separate description (leftmost words) from numeric values
     description_words = []
@@ -762,19 +1078,19 @@ def parse_row_with_positions(row_words, column_bounds):
         x = word['x0']
 
         # Skip words from "Other Benefits" section (right side)
-        if x > MAIN_TABLE_RIGHT_EDGE:
+        if x > main_right:
             continue
 
         # Check if it's a numeric value (accounting format with optional trailing -)
         if is_amount(text):
             # Classify by position within main table
-            if amount_col - 20 <= x < ytd_col:  # In Amount column
+            if desc_right <= x < cur_ytd:  # In Amount column
                 cur_value = text
-            elif ytd_col <= x <= MAIN_TABLE_RIGHT_EDGE:  # In YTD column
+            elif cur_ytd <= x:  # In YTD column
                 ytd_value = text
         else:
             # Description text (should be on left side)
-            if x < amount_col - 20:  # Well before amount column
+            if x < desc_right:  # Before amount column
                 description_words.append(text)
 
     # Build result
@@ -789,7 +1105,7 @@ def parse_row_with_positions(row_words, column_bounds):
 
     return result if result else None
 
-def parse_other_benefits_table(words, start_idx, end_idx):
+def parse_other_benefits_table(words, start_idx, end_idx, layout=DEFAULT_LAYOUT):
     """
     Parse the 'Other Benefits and Information' table on the right side.
 
@@ -797,20 +1113,17 @@ def parse_other_benefits_table(words, start_idx, end_idx):
         words: List of word dictionaries
         start_idx: Starting index
         end_idx: Ending index
+        layout: Column layout from column_layout()
 
     Returns:
         List of parsed row dictionaries
     """
-    # Column boundaries for Other Benefits table
-    # Based on analysis: Description (350-430), This Period (430-495), Year-to-Date (495-560)
-    OTHER_TABLE_LEFT = 320
-    THIS_PERIOD_COL = 430
-    YTD_COL = 495
+    # Column boundaries for Other Benefits table: Description, This Period, Year-to-Date
+    OTHER_TABLE_LEFT = layout['main_right']
+    THIS_PERIOD_COL = layout['other_desc_right']
+    YTD_COL = layout['other_cur_ytd']
 
-    # Quota Summary has different columns: Earned (438-486), Used (486-520), Balance (520-560)
-    QUOTA_EARNED_COL = 438
-    QUOTA_USED_COL = 486
-    QUOTA_BALANCE_COL = 520
+    # Quota Summary has different columns (Earned, Used, Balance), assigned in x order
 
     # Group words into rows
     rows = group_words_by_row(words, start_idx, end_idx)
@@ -885,15 +1198,297 @@ def parse_other_benefits_table(words, start_idx, end_idx):
 
     return parsed_data
 
-def parse_file(file_path):
+def page_has_text(page):
+    """
+    Probe a page's raw content stream for anything that can draw text.
+
+    This only decodes the content stream bytes, without any layout analysis.
+    It is conservative: a page is reported as text-free only when it has no
+    text objects (BT) and paints no XObjects (Do) that could contain text,
+    e.g. a scanned check stub.
+
+    Args:
+        page: pdfplumber page
+
+    Returns:
+        False if the page certainly draws no text, True otherwise
+    """
+    try:
+        for stream in page.page_obj.contents:
+            data = resolve1(stream).get_data()
+            if b"BT" in data or b"Do" in data:
+                return True
+    except Exception:
+        return True
+    return False
+
+class StrategyCache:
+    """Remembers which extraction strategy works for each document format"""
+
+    WORDS = 'words'
+    TABLES = 'tables'
+
+    def __init__(self):
+        self._strategies = {}
+        self.stats = Counter()
+
+    def get(self, document_format):
+        """Get the known strategy for a document format, or None"""
+        return self._strategies.get(document_format)
+
+    def record(self, document_format, strategy):
+        """Remember the strategy that worked for a document format"""
+        if strategy is None:
+            self._strategies.pop(document_format, None)
+        else:
+            self._strategies[document_format] = strategy
+
+    def snapshot(self):
+        """Copy the learned strategies and counters (e.g. to send from a worker)"""
+        return dict(self._strategies), Counter(self.stats)
+
+    def merge(self, snapshot):
+        """Merge a snapshot taken in another process into this cache"""
+        strategies, stats = snapshot
+        self._strategies.update(strategies)
+        self.stats.update(stats)
+
+    def summary(self):
+        """Format the per-path counters and timings as printable lines"""
+        lines = []
+        for path in (self.WORDS, self.TABLES, 'tables_after_words'):
+            pages = self.stats[f'{path}_pages']
+            if pages:
+                seconds = self.stats[f'{path}_seconds']
+                lines.append(f"{path}: {pages} page(s), {seconds:.2f}s ({seconds / pages * 1000:.0f} ms/page)")
+        if self.stats['skipped_pages']:
+            lines.append(f"skipped: {self.stats['skipped_pages']} page(s) without text")
+        lines.append(f"format cache: {self.stats['cache_hits']} hit(s), {self.stats['cache_misses']} miss(es)")
+        if self.stats['layout_hits'] or self.stats['layout_misses']:
+            lines.append(f"layout cache: {self.stats['layout_hits']} hit(s), {self.stats['layout_misses']} miss(es)")
+        return lines
+
+# Strategy cache shared by all parse_file() calls in this process
+STRATEGY_CACHE = StrategyCache()
+
+def document_format(pdf, file_path):
+    """
+    Classify a statement's document format without any layout work.
+
+    The format is identified by the file naming scheme of the download and
+    by the software that produced the PDF.
+
+    Args:
+        pdf: Open pdfplumber document
+        file_path: Path to the PDF file
+
+    Returns:
+        Hashable format key
+    """
+    basename = os.path.basename(file_path)
+    if 'Statement for' in basename:
+        naming = 'Statement'
+    elif 'Payslip' in basename:
+        naming = 'Payslip'
+    else:
+        naming = None
+
+    metadata = pdf.metadata or {}
+    return (naming, metadata.get('Producer'), metadata.get('Creator'))
+
+def parse_page_tables(page):
+    """Parse a page with the table-based fallback strategy"""
+    data = []
+    tables = page.extract_tables({
+        "vertical_strategy": "lines",
+        "horizontal_strategy": "text"
+    })
+    if tables:
+        for table in tables:
+            if is_earnings_table(table):
+                data += parse_table(table)
+    return data
+
+def parse_pages_tables(pages, stats):
+    """Parse all pages with the table-based strategy, skipping word extraction"""
+    all_data = []
+    for p in pages:
+        if not page_has_text(p):
+            stats['skipped_pages'] += 1
+            continue
+
+        start = time.perf_counter()
+        all_data += parse_page_tables(p)
+        stats['tables_pages'] += 1
+        stats['tables_seconds'] += time.perf_counter() - start
+    return all_data
+
+# Statements with at least this many pages may have their pages extracted in
+# parallel; starting the processes costs more than a shorter statement takes
+PARALLEL_MIN_PAGES = 8
+
+def page_words(page):
+    """Extract a page's words with positions, or None if the page draws no text"""
+    if not page_has_text(page):
+        return None
+    return page.extract_words(x_tolerance=3, y_tolerance=3)
+
+def timed_pages_words(pages):
+    """Lazily extract each page's words, yielding (words or None, seconds)"""
+    for p in pages:
+        start = time.perf_counter()
+        words = page_words(p)
+        yield words, time.perf_counter() - start
+
+def extract_pages_words(file_path, engine, page_numbers):
+    """Worker: open a statement once and extract words of some of its pages"""
+    with ENGINES[engine](file_path) as pdf:
+        return list(timed_pages_words([pdf.pages[n] for n in page_numbers]))
+
+def parallel_pages_words(file_path, engine, page_count, jobs):
+    """
+    Extract the words of every page of a statement in a pool of processes.
+
+    Each process opens the file once and extracts a contiguous run of pages.
+    Word extraction is pure Python, so threads would not run it in parallel.
+
+    Args:
+        file_path: Path to the PDF file
+        engine: Name of the extraction engine in ENGINES
+        page_count: Number of pages in the file
+        jobs: Number of processes
+
+    Returns:
+        List of (words or None, seconds) in page order
+    """
+    jobs = max(1, min(jobs, page_count))
+    runs = [range(i * page_count // jobs, (i + 1) * page_count // jobs) for i in range(jobs)]
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=context) as executor:
+        results = executor.map(extract_pages_words, [file_path] * jobs, [engine] * jobs, runs)
+        return [page for run in results for page in run]
+
+def parse_page_words(words, column_bounds, is_continuation_page, stats):
+    """
+    Parse one page's words into table items, without state from other pages.
+
+    Args:
+        words: Words of the page
+        column_bounds: Column boundaries of this page or carried from an earlier page
+        is_continuation_page: Whether the earnings table continues from the previous page
+        stats: Counter for layout cache hits and misses
+
+    Returns:
+        Tuple of (earnings items, Other Benefits items, whether the net pay line was found)
+    """
+    # Find earnings section boundaries and Other Benefits section
+    earnings_start = None
+    earnings_end = None
+    earnings_closed = False
+    other_benefits_start = None
+    other_benefits_end = None
+
+    # On continuation pages, start parsing from the beginning of the page
+    if is_continuation_page and earnings_start is None:
+        earnings_start = 0
+
+    for i, word in enumerate(words):
+        if 'Earnings' in word['text'] and earnings_start is None:
+            earnings_start = i
+        elif 'Other' in word['text'] and i+1 < len(words) and 'Benefits' in words[i+1]['text'] and \
+                word['x0'] > column_bounds['ytd_col']:
+            other_benefits_start = i
+
+        if earnings_start is not None and not earnings_end:
+            # Look for end markers: "Total Net Pay" or "Deposited to"
+            if ('Total' in word['text'] and i+1 < len(words) and 'Net' in words[i+1]['text']) or \
+               ('Deposited' in word['text'] and i+1 < len(words) and 'to' in words[i+1]['text']):
+                earnings_closed = True
+                # Find end of current line (or go back a bit for "Deposited")
+                target_y = word['top'] - (10 if 'Deposited' in word['text'] else 0)
+                for j in range(i-5 if 'Deposited' in word['text'] else i, min(i+20, len(words))):
+                    if words[j]['top'] > target_y + 2:
+                        earnings_end = j
+                        other_benefits_end = j  # Same end point for both tables
+                        break
+                break
+
+    # If we didn't find an end marker, use end of page (earnings continue to next page)
+    if earnings_start is not None and not earnings_end:
+        earnings_end = len(words)
+
+    other_x0 = words[other_benefits_start]['x0'] if other_benefits_start is not None else None
+    layout = column_layout(words, column_bounds, other_x0, stats)
+
+    # Parse main earnings table, grouping words into rows
+    earnings_items = []
+    if earnings_start is not None and earnings_end:
+        for row_words in group_words_by_row(words, earnings_start, earnings_end):
+            parsed = parse_row_with_positions(row_words, layout)
+            if parsed:
+                earnings_items.append(parsed)
+
+    # Parse Other Benefits table
+    other_items = []
+    if other_benefits_start and other_benefits_end:
+        other_items = parse_other_benefits_table(words, other_benefits_start, other_benefits_end, layout)
+
+    return earnings_items, other_items, earnings_closed
+
+def stitch_page_items(all_data, earnings_items, other_items):
+    """
+    Append one page's items to the statement rows, in page order.
+
+    A "Withholding Tax" row continues the previous row's description, which
+    may be the last row of the previous page.
+    """
+    for parsed in earnings_items:
+        if parsed.get('desc') == 'Withholding Tax' and all_data:
+            # Merge with previous row's description
+            prev_row = all_data[-1]
+            if prev_row and len(prev_row) > 0:
+                parsed['desc'] = prev_row[0].get('desc', '')
+                all_data[-1] = [parsed]
+        else:
+            all_data.append([parsed])
+    for item in other_items:
+        all_data.append([item])
+
+def parse_pages_words(pages, stats, pages_words=None):
+    """
+    Parse pages with the word-position strategy.
+
+    Only column boundaries and the Withholding Tax merge carry over from page
+    to page. Words are extracted page by page (or all at once when given in
+    pages_words), each page is parsed on its own, and its items are stitched
+    onto the rows of the pages before it. Pages before the first column
+    header are parsed as tables.
+
+    Args:
+        pages: pdfplumber pages
+        stats: Counter for per-path page counts and timings
+        pages_words: Optional (words or None, seconds) per page, already
+            extracted; by default words are extracted lazily
+
+    Returns:
+        Tuple of (rows, strategy that produced them or None)
+    """
     all_data = []
-    pdf = pdfplumber.open(file_path)
     saved_column_bounds = None  # Remember column boundaries from first page
     is_continuation_page = False  # Track if we're on a continuation page
+    used_tables = False
+
+    if pages_words is None:
+        pages_words = timed_pages_words(pages)
+
+    for p, (words, extract_seconds) in zip(pages, pages_words):
+        # Pages that draw no text were skipped before paying for word layout
+        if words is None:
+            stats['skipped_pages'] += 1
+            continue
 
-    for p in pdf.pages:
-        # Extract words with position information
-        words = p.extract_words(x_tolerance=3, y_tolerance=3)
+        start = time.perf_counter() - extract_seconds
+        stats['words'] += len(words)
 
         # Detect column boundaries from header
         column_bounds = detect_column_boundaries(words)
@@ -909,160 +1504,867 @@ def parse_file(file_path):
 
         if not column_bounds:
             # Fall back to old table-based method if column detection fails
-            tables = p.extract_tables({
-                "vertical_strategy": "lines",
-                "horizontal_strategy": "text"
-            })
-            if tables:
-                for table in tables:
-                    if is_earnings_table(table):
-                        all_data += parse_table(table)
+            all_data += parse_page_tables(p)
+            used_tables = True
+            stats['tables_after_words_pages'] += 1
+            stats['tables_after_words_seconds'] += time.perf_counter() - start
             continue
 
-        # Find earnings section boundaries and Other Benefits section
-        earnings_start = None
-        earnings_end = None
-        other_benefits_start = None
-        other_benefits_end = None
-
-        # On continuation pages, start parsing from the beginning of the page
-        if is_continuation_page and earnings_start is None:
-            earnings_start = 0
-
-        for i, word in enumerate(words):
-            if 'Earnings' in word['text'] and earnings_start is None:
-                earnings_start = i
-            elif 'Other' in word['text'] and i+1 < len(words) and 'Benefits' in words[i+1]['text'] and word['x0'] > 320:
-                other_benefits_start = i
-
-            if earnings_start is not None and not earnings_end:
-                # Look for end markers: "Total Net Pay" or "Deposited to"
-                if ('Total' in word['text'] and i+1 < len(words) and 'Net' in words[i+1]['text']) or \
-                   ('Deposited' in word['text'] and i+1 < len(words) and 'to' in words[i+1]['text']):
-                    # Find end of current line (or go back a bit for "Deposited")
-                    target_y = word['top'] - (10 if 'Deposited' in word['text'] else 0)
-                    for j in range(i-5 if 'Deposited' in word['text'] else i, min(i+20, len(words))):
-                        if words[j]['top'] > target_y + 2:
-                            earnings_end = j
-                            other_benefits_end = j  # Same end point for both tables
-                            break
-                    break
+        earnings_items, other_items, earnings_closed = parse_page_words(
+            words, column_bounds, is_continuation_page, stats)
+        stitch_page_items(all_data, earnings_items, other_items)
+
+        stats['words_pages'] += 1
+        stats['words_seconds'] += time.perf_counter() - start
+
+        # Nothing after the net pay line belongs to the statement (legal
+        # notices, check stubs), so the remaining pages are not parsed at all
+        if earnings_closed:
+            break
+
+    if saved_column_bounds:
+        return all_data, StrategyCache.WORDS
+    if used_tables and all_data:
+        return all_data, StrategyCache.TABLES
+    return all_data, None
+
+# Ligatures expanded in word text, as pdfplumber does by default
+LIGATURES = {
+    "ﬀ": "ff",
+    "ﬃ": "ffi",
+    "ﬄ": "ffl",
+    "ﬁ": "fi",
+    "ﬂ": "fl",
+    "ﬆ": "st",
+    "ﬅ": "st",
+}
 
-        # If we didn't find an end marker, use end of page (earnings continue to next page)
-        if earnings_start is not None and not earnings_end:
-            earnings_end = len(words)
-
-        # Parse main earnings table
-        if earnings_start is not None and earnings_end:
-            # Group words into rows
-            rows = group_words_by_row(words, earnings_start, earnings_end)
-
-            # Parse each row with position awareness
-            for row_words in rows:
-                parsed = parse_row_with_positions(row_words, column_bounds)
-                if parsed:
-                    # Handle "Withholding Tax" special case (row continuation)
-                    if parsed.get('desc') == 'Withholding Tax' and all_data:
-                        # Merge with previous row's description
-                        prev_row = all_data[-1]
-                        if prev_row and len(prev_row) > 0:
-                            parsed['desc'] = prev_row[0].get('desc', '')
-                            all_data[-1] = [parsed]
-                    else:
-                        all_data.append([parsed])
+class PdfminerPage:
+    """
+    Page of a PdfminerDocument with the subset of the pdfplumber page API
+    used by the parser.
 
-        # Parse Other Benefits table
-        if other_benefits_start and other_benefits_end:
-            other_benefits_data = parse_other_benefits_table(words, other_benefits_start, other_benefits_end)
-            for item in other_benefits_data:
-                all_data.append([item])
+    Characters are collected by pdfminer without layout analysis
+    (laparams=None) and grouped into words with the same rules as pdfplumber's
+    extract_words. Words only carry text and position. Rotated characters
+    (watermarks) are ignored.
+    """
 
-    return all_data
+    def __init__(self, document, page_obj, page_number):
+        self.document = document
+        self.page_obj = page_obj
+        self.page_number = page_number
+
+    def _chars(self):
+        """Interpret the page and return (text, x0, x1, top, bottom) for upright chars"""
+        x0, y0, x1, y1 = self.page_obj.mediabox
+        if self.page_obj.rotate in (90, 270):
+            x0, y0, x1, y1 = y0, x0, y1, x1
+        height = y1 - y0
+
+        device = PDFPageAggregator(self.document.resources, laparams=None)
+        PDFPageInterpreter(self.document.resources, device).process_page(self.page_obj)
+
+        chars = []
+        stack = [iter(device.get_result())]
+        while stack:
+            for obj in stack[-1]:
+                if isinstance(obj, LTChar):
+                    if obj.upright:
+                        chars.append((obj.get_text(), obj.x0 + x0, obj.x1 + x0,
+                                      height - obj.y1 - y0, height - obj.y0 - y0))
+                elif isinstance(obj, LTContainer):
+                    stack.append(iter(obj))
+                    break
+            else:
+                stack.pop()
+        return chars
+
+    def extract_words(self, x_tolerance=3, y_tolerance=3):
+        """Group the page's characters into word dictionaries ordered by line"""
+        chars = self._chars()
+
+        # Cluster characters into lines by their top coordinate
+        line_of = {}
+        line = -1
+        last_top = None
+        for top in sorted({c[3] for c in chars}):
+            if last_top is None or top > last_top + y_tolerance:
+                line += 1
+            line_of[top] = line
+            last_top = top
+        chars.sort(key=lambda c: (line_of[c[3]], c[1], c[2]))
+
+        words = []
+        current = []
+        for char in chars:
+            text, x0, _, top, _ = char
+            if text.isspace():
+                if current:
+                    words.append(current)
+                current = []
+            elif current and (x0 < current[-1][1] or x0 > current[-1][2] + x_tolerance
+                              or abs(top - current[-1][3]) > y_tolerance):
+                words.append(current)
+                current = [char]
+            else:
+                current.append(char)
+        if current:
+            words.append(current)
+
+        return [{
+            'text': ''.join(LIGATURES.get(c[0], c[0]) for c in word),
+            'x0': min(c[1] for c in word),
+            'x1': max(c[2] for c in word),
+            'top': min(c[3] for c in word),
+            'bottom': max(c[4] for c in word),
+        } for word in words]
+
+    def extract_tables(self, table_settings=None):
+        """Table extraction is delegated to pdfplumber for the same page"""
+        return self.document.plumber().pages[self.page_number].extract_tables(table_settings)
+
+class PdfminerDocument:
+    """Statement PDF opened directly with pdfminer, used like a pdfplumber PDF"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        self._plumber = None
+        try:
+            document = PDFDocument(PDFParser(self._file))
+            self.resources = PDFResourceManager(caching=True)
+            self.metadata = {}
+            for info in document.info:
+                for key, value in info.items():
+                    value = resolve1(value)
+                    self.metadata[key] = decode_text(value) if isinstance(value, bytes) else value
+            self.pages = [PdfminerPage(self, page_obj, i)
+                          for i, page_obj in enumerate(PDFPage.create_pages(document))]
+        except Exception:
+            self._file.close()
+            raise
+
+    def plumber(self):
+        """Open the same file with pdfplumber on first use (table fallback)"""
+        if self._plumber is None:
+            self._plumber = pdfplumber.open(self.file_path)
+        return self._plumber
+
+    def close(self):
+        if self._plumber is not None:
+            self._plumber.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Extraction engines by name: each opens a PDF as a document with .pages and .metadata
+ENGINES = {
+    'pdfplumber': pdfplumber.open,
+    'pdfminer': PdfminerDocument,
+}
 
+def reaches_net_pay(rows):
+    """Check that parsed rows run through the statement's net pay line"""
+    return any(item['desc'] == 'Total Net Pay' for row in rows for item in row)
 
-def search_properties(desc):
-    for account in SEARCH_ACCOUNTS:
-        if re.search(account["pattern"], desc):
-            return account
+def parse_file(file_path, strategies=None, engine='pdfplumber', page_jobs=1):
+    """
+    Parse a statement PDF into rows of {desc, cur, ytd} items.
 
-def is_quota_subject(item):
-    return item['desc'] in ['FloatHol', 'PTO']
+    The word-position strategy is tried first, with the table strategy as a
+    per-page fallback. The strategy that worked is remembered per document
+    format, so later files of a table-only format skip word extraction.
+    The table strategy is only learned, and only taken for a later file,
+    when its rows reach the net pay line; otherwise words get their turn.
 
-def ignored(item):
-    return 'desc' in item and item['desc'] in ['San Jose']
+    Args:
+        file_path: Path to the PDF file
+        strategies: StrategyCache to consult and update (default: STRATEGY_CACHE)
+        engine: Name of the extraction engine in ENGINES
+        page_jobs: Processes extracting the words of a statement with at
+            least PARALLEL_MIN_PAGES pages
+
+    Returns:
+        List of rows, where each row is a list of item dictionaries
+    """
+    if strategies is None:
+        strategies = STRATEGY_CACHE
+
+    with ENGINES[engine](file_path) as pdf:
+        fmt = document_format(pdf, file_path)
+        strategy = strategies.get(fmt)
+        strategies.stats['cache_hits' if strategy else 'cache_misses'] += 1
+
+        if strategy == StrategyCache.TABLES:
+            all_data = parse_pages_tables(pdf.pages, strategies.stats)
+            if reaches_net_pay(all_data):
+                return all_data
+
+        pages_words = None
+        if page_jobs > 1 and len(pdf.pages) >= PARALLEL_MIN_PAGES:
+            # Long statement: extract all pages at once, parse and stitch in order
+            pages_words = parallel_pages_words(file_path, engine, len(pdf.pages), page_jobs)
+
+        # Pages of a word-layout statement only lack column bounds before the
+        # first header (e.g. a summary page), so they always get the table fallback
+        all_data, learned = parse_pages_words(pdf.pages, strategies.stats, pages_words=pages_words)
+        if learned == StrategyCache.TABLES and not reaches_net_pay(all_data):
+            # An odd statement must not lock its whole format into the table path
+            learned = None
+        strategies.record(fmt, learned)
+        return all_data
+
+# SEARCH_ACCOUNTS patterns, compiled once per process
+COMPILED_SEARCH_ACCOUNTS = [(re.compile(account["pattern"]), account) for account in SEARCH_ACCOUNTS]
+
+# Column headers of CSV/HTML statement exports, by the item key they fill
+EXPORT_COLUMNS = {
+    'desc': ('description', 'desc', 'item', 'earnings', 'deductions'),
+    'cur': ('current', 'amount', 'this period', 'cur'),
+    'ytd': ('year-to-date', 'year to date', 'ytd'),
+    'earned': ('earned', 'accrued'),
+    'used': ('used', 'taken'),
+    'balance': ('balance', 'available'),
+}
+
+def export_header(record):
+    """Map the cells of an export record to item keys, or None if it is not a header"""
+    columns = {}
+    for i, cell in enumerate(record):
+        label = cell.strip().lower()
+        for key, labels in EXPORT_COLUMNS.items():
+            if label in labels and key not in columns.values():
+                columns[i] = key
+                break
+    return columns if 'desc' in columns.values() and len(columns) > 1 else None
+
+def export_amount(text):
+    """Write an exported amount the way statements print it, e.g. $(900.00) as 900.00-"""
+    text = text.replace('$', '').replace(' ', '')
+    if text.startswith('(') and text.endswith(')'):
+        return text[1:-1] + '-'
+    if text.startswith('-'):
+        return text[1:] + '-'
+    return text
+
+def parse_export_records(records, file_path):
+    """
+    Turn the records of a CSV or HTML export into rows like parse_file().
 
-def extract(filepath, output_dir=None):
-    """Extract PDF to JSON
+    A header record (see EXPORT_COLUMNS) starts a section; each record below
+    it with a description and at least one amount becomes a row holding one
+    item, so process() and the errata merge see the same input as for a PDF.
 
     Args:
-        filepath: Path to the PDF file
-        output_dir: Optional output directory for JSON
+        records: Iterable of lists of cell texts
+        file_path: Path of the export, for error messages
 
     Returns:
-        Path to the created JSON file
+        List of rows, each a list of {desc, cur, ytd} or {desc, earned, used, balance} items
+
+    Raises:
+        ValueError: If the export has no recognised header or no line items
     """
-    data = parse_file(filepath)
+    rows = []
+    columns = None
+    for record in records:
+        header = export_header(record)
+        if header:
+            columns = header
+            continue
+        if columns is None:
+            continue
+        item = {}
+        for i, key in columns.items():
+            text = record[i].strip() if i < len(record) else ''
+            if text:
+                item[key] = ' '.join(text.split()) if key == 'desc' else export_amount(text)
+        if item.get('desc') and len(item) > 1:
+            rows.append([item])
+    if columns is None:
+        raise ValueError(f"{os.path.basename(file_path)} has no header row with a description and an amount column")
+    if not rows:
+        raise ValueError(f"{os.path.basename(file_path)} has no line items")
+    return rows
 
-    if output_dir:
-        # Extract just the filename and place in output directory
-        filename = os.path.basename(filepath)
-        json_filepath = os.path.join(output_dir, filename[:-4] + ".json")
-    else:
-        # Place JSON in same directory as PDF
-        json_filepath = filepath[:-4] + ".json"
+class HtmlTables(html.parser.HTMLParser):
+    """Collect the rows of every <table> in an HTML document as lists of cell texts"""
 
-    with open(json_filepath, "w") as f:
-        json.dump(data, f, indent=2)
-    return json_filepath
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ('td', 'th') and self._cell is not None:
+            self._row.append(''.join(self._cell))
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.records.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+def parse_csv_file(file_path, **options):
+    """Parse a CSV statement export into rows like parse_file() (its options are ignored)"""
+    with open(file_path, "r", newline='', encoding='utf-8-sig') as f:
+        return parse_export_records(csv.reader(f), file_path)
+
+def parse_html_file(file_path, **options):
+    """Parse an HTML statement export into rows like parse_file() (its options are ignored)"""
+    parser = HtmlTables()
+    with open(file_path, "r", encoding='utf-8', errors='replace') as f:
+        parser.feed(f.read())
+    parser.close()
+    return parse_export_records(parser.records, file_path)
+
+# Statement parsers by file extension, cheapest first; all produce parse_file() rows
+PARSERS = {
+    '.csv': parse_csv_file,
+    '.html': parse_html_file,
+    '.htm': parse_html_file,
+    '.pdf': parse_file,
+}
+
+def parse_input(file_path, engine='pdfplumber', page_jobs=1, fallbacks=()):
+    """
+    Parse a statement with the parser registered in PARSERS for its extension.
 
-def process(file_path, book, registry, source_pdf_path=None):
-    """Process a JSON file and create GnuCash transactions
+    An export that cannot be parsed falls back to the next representation of
+    the same statement, so an unrecognised CSV layout still reads the PDF.
 
     Args:
-        file_path: Path to the JSON file
-        book: GnuCash book object
-        registry: Account registry
-        source_pdf_path: Optional path to the source PDF file (for errata lookup)
+        file_path: Path to a statement PDF or export
+        engine: Name of the extraction engine in ENGINES (PDF only)
+        page_jobs: Processes extracting the pages of a long statement (PDF only)
+        fallbacks: Other representations of the statement, cheapest first
+
+    Returns:
+        List of rows as produced by parse_file()
     """
-    with open(file_path, "r") as f:
-        data = json.load(f)
+    parser = PARSERS.get(os.path.splitext(file_path)[1].lower())
+    if parser is None:
+        raise ValueError(f"No parser for {os.path.basename(file_path)}")
+    try:
+        return parser(file_path, engine=engine, page_jobs=page_jobs)
+    except ValueError as e:
+        if parser is parse_file or not fallbacks:
+            raise
+        print(f"{e}; reading {os.path.basename(fallbacks[0])} instead")
+        return parse_input(fallbacks[0], engine, page_jobs, fallbacks[1:])
 
-    # Parse date from filename
-    date = parse_date_from_file_name(file_path)
+def search_properties(desc):
+    for pattern, account in COMPILED_SEARCH_ACCOUNTS:
+        if pattern.search(desc):
+            return account
 
-    # Check for errata file alongside the source PDF
-    errata_path = None
-    if source_pdf_path:
-        # Look for errata file in the same directory as the PDF
-        basename = os.path.basename(source_pdf_path)
-        dirname = os.path.dirname(source_pdf_path)
-
-        if 'Statement for' in basename:
-            errata_name = basename.replace('.pdf', '.json').replace('Statement for', 'Errata for')
-        elif 'Payslip' in basename:
-            errata_name = basename.replace('.pdf', '.json').replace('Payslip', 'Errata')
-        else:
-            errata_name = None
+def resolve_properties(desc):
+    """Return the ACCOUNTS or SEARCH_ACCOUNTS properties for a descriptor, or None"""
+    properties = ACCOUNTS.get(desc)
+    if properties is None:
+        properties = search_properties(desc)
+    return properties
 
-        if errata_name:
-            errata_path = os.path.join(dirname, errata_name) if dirname else errata_name
+def is_quota_subject(item):
+    return item['desc'] in ['FloatHol', 'PTO']
 
-    errata_items = []
-    if errata_path and os.path.exists(errata_path):
-        print(f"Loading errata from {errata_path}")
-        with open(errata_path, "r") as f:
-            errata_data = json.load(f)
-            # Validate and collect errata items
-            for item in errata_data:
-                if isinstance(item, dict) and 'desc' in item and 'cur' in item:
-                    errata_items.append(item)
-                else:
-                    print(f"Warning: Invalid errata item (missing 'desc' or 'cur'): {item}")
-
-    current = [item for sublist in data for item in sublist if not ignored(item) and ("cur" in item or is_quota_subject(item))]
+def ignored(item):
+    return 'desc' in item and item['desc'] in ['San Jose']
+
+# SEARCH_ACCOUNTS entries by pattern, as recorded in typed statements
+SEARCH_ACCOUNTS_BY_PATTERN = {account["pattern"]: account for account in SEARCH_ACCOUNTS}
+
+# Typed statements record which account mapping resolved their items
+ACCOUNTS_FINGERPRINT = hashlib.sha256(
+    json.dumps([sorted(ACCOUNTS), sorted(SEARCH_ACCOUNTS_BY_PATTERN)]).encode()).hexdigest()[:16]
+
+# Versioned, pre-resolved intermediate format written by extract(typed=True)
+STATEMENT_FORMAT = 'pypay-statement'
+STATEMENT_VERSION = 1
+
+def typed_item(item):
+    """
+    Convert an extracted item into a typed statement item.
+
+    Typed items hold the descriptor, the ACCOUNTS key ('key') or
+    SEARCH_ACCOUNTS pattern ('pattern') that resolves it, if any, the
+    current and year-to-date amounts in cents ('cents', 'ytd_cents') and,
+    for quota subjects, earned/used/balance in hundredths of an hour.
+    """
+    desc = item['desc']
+    typed = {'desc': desc, 'cents': amount_cents(item.get('cur')), 'ytd_cents': amount_cents(item.get('ytd'))}
+    if desc in ACCOUNTS:
+        typed['key'] = desc
+    else:
+        account = search_properties(desc)
+        if account is not None:
+            typed['pattern'] = account['pattern']
+    if is_quota_subject(item):
+        for field in ('earned', 'used', 'balance'):
+            typed[field] = amount_cents(item.get(field))
+    return typed
+
+def item_properties(item):
+    """Return the ACCOUNTS or SEARCH_ACCOUNTS properties of a typed item, or None"""
+    if 'key' in item:
+        properties = ACCOUNTS.get(item['key'])
+    elif 'pattern' in item:
+        properties = SEARCH_ACCOUNTS_BY_PATTERN.get(item['pattern'])
+    else:
+        properties = None
+    return properties if properties is not None else resolve_properties(item['desc'])
+
+def is_statement_record(data):
+    """Return whether extracted data is a typed statement rather than rows"""
+    return isinstance(data, dict) and data.get('format') == STATEMENT_FORMAT
+
+def statement_record(rows, date):
+    """
+    Build the typed statement of extracted rows.
+
+    Args:
+        rows: Rows as produced by parse_file() (a typed statement is returned as is)
+        date: Pay date, or None
+
+    Returns:
+        Dict with format, version, date, accounts (ACCOUNTS_FINGERPRINT) and
+        the typed items that are booked
+    """
+    if is_statement_record(rows):
+        return rows
+    return {
+        'format': STATEMENT_FORMAT,
+        'version': STATEMENT_VERSION,
+        'date': date.isoformat() if date else None,
+        'accounts': ACCOUNTS_FINGERPRINT,
+        'items': statement_items(rows),
+    }
+
+def extract(filepath, output_dir=None, engine='pdfplumber', page_jobs=1, typed=False, fallbacks=()):
+    """Extract a statement PDF or export to JSON
+
+    Args:
+        filepath: Path to the PDF file or to a CSV/HTML export (see PARSERS)
+        output_dir: Optional output directory for JSON
+        engine: Name of the extraction engine in ENGINES
+        page_jobs: Processes extracting the pages of a long statement
+        typed: Write a typed statement (statement_record()) instead of rows
+        fallbacks: Other representations of the statement (see parse_input())
+
+    Returns:
+        Path to the created JSON file
+    """
+    data = parse_input(filepath, engine=engine, page_jobs=page_jobs, fallbacks=fallbacks)
+    if typed:
+        data = statement_record(data, parse_date_from_file_name(filepath))
+
+    if output_dir:
+        # Extract just the filename and place in output directory
+        filename = os.path.basename(filepath)
+        json_filepath = os.path.join(output_dir, os.path.splitext(filename)[0] + ".json")
+    else:
+        # Place JSON in same directory as the source
+        json_filepath = os.path.splitext(filepath)[0] + ".json"
+
+    write_json(data, json_filepath)
+    return json_filepath
+
+def write_json(data, json_filepath):
+    """Write extracted rows in the JSON format produced by extract()"""
+    with open(json_filepath, "w") as f:
+        json.dump(data, f, indent=2)
+
+class ExtractionCache:
+    """
+    Content-addressed cache of extracted statement rows.
+
+    Rows are stored by the SHA-256 of the PDF, the extraction engine and
+    EXTRACTION_VERSION, so the cache can be shared between runs and between
+    books. The learned per-format strategies are kept alongside.
+    """
+
+    # Bump when parsing heuristics change so stale rows are not reused
+    EXTRACTION_VERSION = 2
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, entry, engine):
+        if 'sha256' not in entry:
+            entry['sha256'] = file_digest(entry['source'])
+        digest = entry['sha256']
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.{engine}.v{self.EXTRACTION_VERSION}.json")
+
+    def get(self, entry, engine):
+        """Return the cached rows for a manifest entry, or None"""
+        try:
+            with open(self._path(entry, engine), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, entry, engine, rows):
+        """Store the extracted rows for a manifest entry"""
+        path = self._path(entry, engine)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(rows, f)
+        os.replace(tmp_path, path)
+
+    def load_strategies(self):
+        """Merge the persisted per-format strategies into STRATEGY_CACHE"""
+        path = os.path.join(self.cache_dir, 'strategies.json')
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                strategies = {tuple(key): strategy for key, strategy in json.load(f)}
+            STRATEGY_CACHE.merge((strategies, Counter()))
+
+    def save_strategies(self):
+        """Persist STRATEGY_CACHE's strategies, keeping those learned by other books"""
+        path = os.path.join(self.cache_dir, 'strategies.json')
+        strategies = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                strategies = {tuple(key): strategy for key, strategy in json.load(f)}
+        strategies.update(STRATEGY_CACHE.snapshot()[0])
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump([[list(key), strategy] for key, strategy in strategies.items()], f)
+        os.replace(tmp_path, path)
+
+def _pool_worker(conn, func, max_tasks, strategies):
+    """Worker process loop: run func on argument tuples received over conn"""
+    STRATEGY_CACHE.merge(strategies)
+    STRATEGY_CACHE.stats.clear()
+    # Imports are done: tell the pool to start the clock of the first task
+    conn.send(('ready', None, None))
+    for _ in range(max_tasks):
+        try:
+            args = conn.recv()
+        except EOFError:
+            break
+        if args is None:
+            break
+
+        try:
+            conn.send(('ok', func(*args), STRATEGY_CACHE.snapshot()))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}", STRATEGY_CACHE.snapshot()))
+        STRATEGY_CACHE.stats.clear()
+    conn.close()
+
+class WorkerPool:
+    """
+    Pool of recyclable worker processes for PDF extraction.
+
+    Each task runs in a worker process with a wall-clock timeout and a
+    resident memory ceiling; a worker that exceeds either is killed and
+    replaced, and the task fails with a RuntimeError. Workers exit after
+    max_tasks_per_worker tasks so memory leaked by pdfminer is returned;
+    with prestart, all workers are started with the pool instead of on demand.
+    Memory is read from /proc, so the RSS ceiling only applies on Linux.
+    """
+
+    POLL_INTERVAL = 0.1
+    # Seconds a new worker may take to import the loader before it is killed
+    STARTUP_TIMEOUT = 60
+
+    def __init__(self, func, workers=1, timeout=120, max_rss_mb=1024, max_tasks_per_worker=25, prestart=False):
+        self.func = func
+        self.prestart = prestart
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_rss_mb = max_rss_mb
+        self.max_tasks_per_worker = max(1, max_tasks_per_worker)
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, *args):
+        """Queue func(*args) for a worker and return a concurrent.futures.Future"""
+        future = concurrent.futures.Future()
+        self._queue.put((args, future))
+        return future
+
+    def imap(self, tasks):
+        """
+        Run func over argument tuples, yielding (result, error) in task order.
+
+        error is None on success, otherwise a message describing the failure.
+        """
+        futures = [self.submit(*args) for args in tasks]
+        for future in futures:
+            try:
+                yield future.result(), None
+            except Exception as e:
+                yield None, str(e)
+
+    def close(self):
+        """Stop the dispatcher and all worker processes"""
+        self._closed.set()
+        self._dispatcher.join()
+
+    def _spawn(self):
+        # Workers are spawned rather than forked: forking from the dispatcher
+        # thread is unsafe, and a fresh interpreter holds no state of the loader
+        context = multiprocessing.get_context('spawn')
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=_pool_worker,
+                                  args=(child_conn, self.func, self.max_tasks_per_worker,
+                                        STRATEGY_CACHE.snapshot()),
+                                  daemon=True)
+        process.start()
+        child_conn.close()
+        return {'process': process, 'conn': parent_conn, 'tasks': 0, 'future': None, 'deadline': None,
+                'ready': False, 'started': time.monotonic()}
+
+    def _retire(self, worker, kill=False):
+        if kill:
+            worker['process'].kill()
+        worker['process'].join()
+        worker['conn'].close()
+        worker['process'] = None
+
+    def _rss_mb(self, worker):
+        try:
+            with open(f"/proc/{worker['process'].pid}/statm") as f:
+                pages = int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            return 0
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+    def _collect(self, worker):
+        future = worker['future']
+        worker['future'] = None
+        try:
+            status, result, snapshot = worker['conn'].recv()
+        except (EOFError, OSError):
+            self._retire(worker, kill=True)
+            future.set_exception(RuntimeError("worker exited unexpectedly"))
+            return
+
+        STRATEGY_CACHE.merge(snapshot)
+        if status == 'ok':
+            future.set_result(result)
+        else:
+            future.set_exception(RuntimeError(result))
+
+        worker['tasks'] += 1
+        if worker['tasks'] >= self.max_tasks_per_worker:
+            # Worker exits on its own after its last task
+            self._retire(worker)
+
+    def _ready(self, worker):
+        try:
+            worker['conn'].recv()
+        except (EOFError, OSError):
+            self._fail(worker, "worker exited during start-up")
+            return
+        worker['ready'] = True
+        worker['deadline'] = time.monotonic() + self.timeout
+
+    def _fail(self, worker, reason):
+        future = worker['future']
+        worker['future'] = None
+        self._retire(worker, kill=True)
+        future.set_exception(RuntimeError(reason))
+
+    def _dispatch(self):
+        # Long-running users (the HTTP service) start all workers up front
+        workers = [self._spawn() for _ in range(self.workers)] if self.prestart else []
+        backlog = deque()
+        while True:
+            while True:
+                try:
+                    backlog.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if self._closed.is_set():
+                for args, future in backlog:
+                    future.cancel()
+                break
+
+            # Hand out queued tasks to idle workers, spawning up to the limit
+            for worker in workers:
+                if worker['future'] is None and backlog:
+                    self._assign(worker, *backlog.popleft())
+            while backlog and len(workers) < self.workers:
+                worker = self._spawn()
+                workers.append(worker)
+                self._assign(worker, *backlog.popleft())
+            # Drop workers retired because a task could not be sent to them
+            workers = [w for w in workers if w['process'] is not None]
+
+            busy = [w for w in workers if w['future'] is not None]
+            if not busy:
+                time.sleep(self.POLL_INTERVAL)
+                continue
+
+            ready = multiprocessing.connection.wait([w['conn'] for w in busy], timeout=self.POLL_INTERVAL)
+            now = time.monotonic()
+            for worker in busy:
+                if worker['conn'] in ready:
+                    if worker['ready']:
+                        self._collect(worker)
+                    else:
+                        self._ready(worker)
+                elif not worker['ready']:
+                    if now > worker['started'] + self.STARTUP_TIMEOUT:
+                        self._fail(worker, f"worker did not start within {self.STARTUP_TIMEOUT}s")
+                elif now > worker['deadline']:
+                    self._fail(worker, f"timed out after {self.timeout}s")
+                elif self.max_rss_mb and self._rss_mb(worker) > self.max_rss_mb:
+                    self._fail(worker, f"exceeded {self.max_rss_mb} MB resident memory")
+            workers = [w for w in workers if w['process'] is not None]
+
+        for worker in workers:
+            if worker['future'] is not None:
+                self._fail(worker, "worker pool closed")
+                continue
+            try:
+                worker['conn'].send(None)
+            except OSError:
+                pass
+            worker['process'].join(timeout=5)
+            self._retire(worker, kill=worker['process'].is_alive())
+
+    def _assign(self, worker, args, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        worker['future'] = future
+        # The clock of a task sent to a worker that is still starting runs from _ready()
+        worker['deadline'] = time.monotonic() + self.timeout if worker['ready'] else None
+        try:
+            worker['conn'].send(args)
+        except Exception as e:
+            # The worker died while idle (or args cannot be pickled): fail this
+            # task only; the worker is dropped and a new one spawned on demand
+            self._fail(worker, f"could not send task to worker: {type(e).__name__}: {e}")
+
+class Quarantine:
+    """Persistent record of statements that could not be extracted safely"""
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        self.added = []
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self._entries = json.load(f)
+
+    def contains(self, entry):
+        """Check if a manifest entry is quarantined and has not changed since"""
+        record = self._entries.get(entry['name'])
+        if record is None:
+            return False
+        if 'sha256' not in entry:
+            entry['sha256'] = file_digest(entry['source'])
+        return record['sha256'] == entry['sha256']
+
+    def add(self, entry, reason):
+        """Quarantine a manifest entry and persist the record immediately"""
+        if 'sha256' not in entry:
+            entry['sha256'] = file_digest(entry['source'])
+        self._entries[entry['name']] = {
+            'sha256': entry['sha256'],
+            'reason': reason,
+            'quarantined': datetime.now().isoformat(timespec='seconds'),
+        }
+        self.added.append((entry, reason))
+        self._save()
+
+    def discard(self, entry):
+        """Release a manifest entry that extracted fine and persist the change immediately"""
+        if self._entries.pop(entry['name'], None) is not None:
+            self._save()
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+def load_errata(errata_path):
+    """Read the valid {desc, cur} items of an errata file"""
+    print(f"Loading errata from {errata_path}")
+    errata_items = []
+    with open(errata_path, "r") as f:
+        errata_data = json.load(f)
+        # Validate and collect errata items
+        for item in errata_data:
+            if isinstance(item, dict) and 'desc' in item and 'cur' in item:
+                errata_items.append(item)
+            else:
+                print(f"Warning: Invalid errata item (missing 'desc' or 'cur'): {item}")
+    return errata_items
+
+def statement_items(data, errata_items=()):
+    """
+    Return the typed items of a statement that are booked, with errata items merged in.
+
+    Rows from parse_file() are filtered, tokenized and resolved here. A
+    typed statement already holds its items; they are used as they are
+    unless the account mapping changed since it was written, in which case
+    their descriptors are resolved again.
+
+    Args:
+        data: Rows as produced by parse_file(), or a typed statement
+        errata_items: Additional {desc, cur} items merged into the statement
+
+    Returns:
+        List of typed items (see typed_item())
+    """
+    if is_statement_record(data):
+        current = data['items']
+        if data.get('accounts') != ACCOUNTS_FINGERPRINT:
+            current = [{k: v for k, v in item.items() if k not in ('key', 'pattern')} for item in current]
+    else:
+        current = [typed_item(item) for sublist in data for item in sublist
+                   if not ignored(item) and ("cur" in item or is_quota_subject(item))]
 
     # Merge errata items
-    current.extend(errata_items)
+    return current + [typed_item(item) for item in errata_items]
+
+def compute_splits(data, registry, errata_items=(), stats=None):
+    """
+    Compute the splits of a statement from its extracted rows.
+
+    Args:
+        data: Rows as produced by parse_file(), or a typed statement
+        registry: AccountRegistry of a book, or PathRegistry to work without one
+        errata_items: Additional {desc, cur} items merged into the statement
+        stats: Optional Counter for the rows and unknown descriptors seen
+
+    Returns:
+        List of PendingSplit, whose accounts are whatever the registry returns
+        and whose values are integer cents
+    """
+    current = statement_items(data, errata_items)
 
     unknown_accounts = []
     deferred_functions = []
@@ -1070,7 +2372,7 @@ def process(file_path, book, registry, source_pdf_path=None):
     for item in current:
         desc = item["desc"]
 
-        properties = ACCOUNTS[item["desc"]] if item["desc"] in ACCOUNTS else search_properties(desc)
+        properties = item_properties(item)
         if properties:
             #print(item, properties)
             func = properties["function"] if "function" in properties else earnings
@@ -1080,6 +2382,9 @@ def process(file_path, book, registry, source_pdf_path=None):
         else:
             unknown_accounts.append(desc)
 
+    if stats is not None:
+        stats['rows'] += len(current)
+        stats['unknown_descriptors'] += len(unknown_accounts)
     if len(unknown_accounts) > 0:
         raise ValueError(f"Unknown accounts: {', '.join(unknown_accounts)}")
 
@@ -1087,14 +2392,931 @@ def process(file_path, book, registry, source_pdf_path=None):
         func()
 
     # Combine all splits from all groups into a single transaction
-    currency = book.commodities(mnemonic="USD")
     all_splits = []
     for id, splits in groups.items():
         all_splits.extend(splits)
+    return all_splits
+
+def check_balance(splits):
+    """Raise ValueError unless computed splits sum to zero cents"""
+    imbalance = sum(split.value for split in splits)
+    if imbalance:
+        raise ValueError(f"Paycheck splits do not balance (off by {cents_to_decimal(imbalance)})")
+
+def add_transaction(book, splits, date):
+    """
+    Create the paycheck transaction for computed splits, or None if there are none.
+
+    Split values become Decimals only here. The balance is checked exactly on
+    the integer cents, before piecash builds any objects.
+    """
+    if len(splits) > 0:
+        check_balance(splits)
+        currency = book.commodities(mnemonic="USD")
+        return piecash.Transaction(post_date=date, currency=currency, description="Paycheck",
+                                   splits=[piecash.Split(account=split.account, memo=split.memo,
+                                                         value=cents_to_decimal(split.value))
+                                           for split in splits])
+
+def read_statement(file_path, source_pdf_path=None, date=None, errata_path=None):
+    """
+    Read an extracted statement with its pay date and errata items.
+
+    Args:
+        file_path: Path to the JSON file
+        source_pdf_path: Optional path to the source PDF file (for errata lookup)
+        date: Optional pay date; parsed from the file name when omitted
+        errata_path: Optional known errata file (as paired by build_manifest);
+            skips the errata lookup next to source_pdf_path
 
-    if len(all_splits) > 0:
-        piecash.Transaction(post_date=date, splits=all_splits, currency=currency, description="Paycheck")
+    Returns:
+        Tuple of (rows or typed statement, pay date, errata items)
+    """
+    with open(file_path, "r") as f:
+        data = json.load(f)
 
+    if is_statement_record(data):
+        if data.get('version', 0) > STATEMENT_VERSION:
+            raise ValueError(f"{file_path} has statement format version {data['version']}, "
+                             f"this loader reads up to {STATEMENT_VERSION}")
+        if date is None and data.get('date'):
+            date = datetime.strptime(data['date'], "%Y-%m-%d").date()
+
+    # Parse date from filename
+    if date is None:
+        date = parse_date_from_file_name(file_path)
+
+    # Check for errata file alongside the source PDF
+    if errata_path is None:
+        errata_path = find_errata(source_pdf_path)
+
+    errata_items = load_errata(errata_path) if errata_path else []
+    return data, date, errata_items
+
+def find_errata(source_pdf_path):
+    """Return the errata file next to a source PDF, or None"""
+    if not source_pdf_path:
+        return None
+    # Look for errata file in the same directory as the PDF
+    basename = os.path.basename(source_pdf_path)
+    dirname = os.path.dirname(source_pdf_path)
+    errata_name = errata_name_for(basename)
+
+    if errata_name:
+        errata_path = os.path.join(dirname, errata_name) if dirname else errata_name
+        if os.path.exists(errata_path):
+            return errata_path
+    return None
+
+def process(file_path, sink, registry=None, source_pdf_path=None, date=None, errata_path=None):
+    """Process a JSON file and write its paycheck to a sink
+
+    Args:
+        file_path: Path to the JSON file
+        sink: StatementSink, or a GnuCash book object
+        registry: Account registry of a GnuCash book given as sink
+        source_pdf_path: Optional path to the source PDF file (for errata lookup)
+        date: Optional pay date; parsed from the file name when omitted
+        errata_path: Optional known errata file (as paired by build_manifest);
+            skips the errata lookup next to source_pdf_path
+
+    Returns:
+        What the sink's add() returned (the created transaction for a GnuCash
+        book), or None if the statement produced no splits
+    """
+    if not isinstance(sink, StatementSink):
+        sink = GnuCashSink(sink, registry)
+    data, date, errata_items = read_statement(file_path, source_pdf_path, date, errata_path)
+    return sink.add(compute_splits(data, sink.registry, errata_items), date)
+
+
+class QuotaLedger:
+    """
+    Time series of PTO and floating-holiday quota balances by pay date.
+
+    The Quota Summary rows (earned, used, balance) of each loaded statement
+    are kept in a SQLite file next to the book, <gnucash_file>.quota.sqlite,
+    one row per subject and pay date. Recording a statement is a single
+    upsert and queries use the (subject, pay_date) primary key, so history
+    and balances never need the PDFs or JSON files again. Amounts are stored
+    as integer hundredths of an hour.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS quota (
+                subject TEXT NOT NULL,
+                pay_date TEXT NOT NULL,
+                earned INTEGER,
+                used INTEGER,
+                balance INTEGER,
+                PRIMARY KEY (subject, pay_date)
+            ) WITHOUT ROWID""")
+        self._conn.commit()
+
+    @staticmethod
+    def path_for(gnucash_file):
+        """Return the ledger path kept next to a GnuCash file"""
+        return gnucash_file + ".quota.sqlite"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _amount(hundredths):
+        return None if hundredths is None else cents_to_decimal(hundredths)
+
+    def record(self, date, data):
+        """
+        Upsert the quota rows of one statement (not committed until commit()).
+
+        Args:
+            date: Pay date of the statement; statements without one are skipped
+            data: Rows as produced by parse_file(), or a typed statement
+
+        Returns:
+            Number of quota subjects recorded
+        """
+        if date is None:
+            return 0
+        rows = [(item['desc'], date.isoformat(), item['earned'], item['used'], item['balance'])
+                for item in statement_items(data) if is_quota_subject(item) and item['balance'] is not None]
+        self._conn.executemany("INSERT OR REPLACE INTO quota VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+    def subjects(self):
+        """Return the quota subjects with recorded history"""
+        return [subject for subject, in self._conn.execute("SELECT DISTINCT subject FROM quota ORDER BY subject")]
+
+    def history(self, subject, start=None, end=None):
+        """
+        Return the recorded quota of a subject in pay date order.
+
+        Args:
+            subject: Quota subject, e.g. 'PTO' or 'FloatHol'
+            start: Optional first pay date (inclusive)
+            end: Optional last pay date (inclusive)
+
+        Returns:
+            List of dicts with 'date', 'earned', 'used' and 'balance' (Decimal hours)
+        """
+        query = "SELECT pay_date, earned, used, balance FROM quota WHERE subject = ?"
+        params = [subject]
+        if start is not None:
+            query += " AND pay_date >= ?"
+            params.append(start.isoformat())
+        if end is not None:
+            query += " AND pay_date <= ?"
+            params.append(end.isoformat())
+        return [{'date': datetime.strptime(pay_date, "%Y-%m-%d").date(), 'earned': self._amount(earned),
+                 'used': self._amount(used), 'balance': self._amount(balance)}
+                for pay_date, earned, used, balance in self._conn.execute(query + " ORDER BY pay_date", params)]
+
+    def balance_at(self, subject, date):
+        """Return a subject's balance as of the last pay date on or before date, or None"""
+        row = self._conn.execute("SELECT balance FROM quota WHERE subject = ? AND pay_date <= ? "
+                                 "ORDER BY pay_date DESC LIMIT 1", (subject, date.isoformat())).fetchone()
+        return self._amount(row[0]) if row else None
+
+    def liability_at(self, date, rates=None):
+        """
+        Return the outstanding quota of every subject as of a date.
+
+        Args:
+            date: Date to evaluate the balances at
+            rates: Optional mapping of subject to hourly rate; balances of
+                subjects with a rate are returned as money instead of hours
+
+        Returns:
+            Dictionary of subject to balance (subjects without history at date are omitted)
+        """
+        liability = {}
+        for subject in self.subjects():
+            balance = self.balance_at(subject, date)
+            if balance is not None:
+                rate = (rates or {}).get(subject)
+                liability[subject] = balance if rate is None else (balance * Decimal(str(rate))).quantize(Decimal('0.01'))
+        return liability
+
+# Transaction slot recording which statement a paycheck was loaded from
+STATEMENT_SLOT = 'pypay-statement'
+# Transaction slot recording the statement_digest() of the inputs it was loaded from
+DIGEST_SLOT = 'pypay-statement-digest'
+
+LoadedStatement = namedtuple('LoadedStatement', ['guid', 'digest'])
+
+def statement_digest(source_path, errata_path=None, source_sha256=None):
+    """
+    Hash the inputs a statement is booked from.
+
+    Args:
+        source_path: The statement PDF (or its JSON when there is no PDF)
+        errata_path: Optional errata file of the statement
+        source_sha256: Optional known file_digest() of source_path
+
+    Returns:
+        SHA-256 hex digest over the source and errata file digests
+    """
+    digest = hashlib.sha256((source_sha256 or file_digest(source_path)).encode())
+    if errata_path:
+        digest.update(file_digest(errata_path).encode())
+    return digest.hexdigest()
+
+def loaded_statements(book):
+    """
+    Return the statements already loaded into a book.
+
+    Returns:
+        Dict of statement name to LoadedStatement(transaction guid, digest);
+        the digest is None for statements loaded before digests were recorded
+    """
+    slots = Slot.__table__
+    query = (select(slots.c.obj_guid, slots.c.name, slots.c.string_val)
+             .where(slots.c.name.in_((STATEMENT_SLOT, DIGEST_SLOT))))
+    names, digests = {}, {}
+    for guid, slot, value in book.session.execute(query):
+        (names if slot == STATEMENT_SLOT else digests)[guid] = value
+    return {name: LoadedStatement(guid, digests.get(guid)) for guid, name in names.items()}
+
+def replace_splits(transaction, splits):
+    """
+    Make a transaction's splits match newly computed splits.
+
+    Splits that are unchanged (same account, memo and value) are kept with
+    their reconcile state; only the others are removed or added.
+
+    Args:
+        transaction: Existing piecash Transaction
+        splits: PendingSplits as returned by compute_splits()
+
+    Returns:
+        Tuple of (added, removed) PendingSplits
+    """
+    check_balance(splits)
+    wanted = Counter(splits)
+    removed = []
+    for split in list(transaction.splits):
+        pending = PendingSplit(split.account, split.memo, int(split.value.scaleb(2)))
+        if wanted[pending]:
+            wanted[pending] -= 1
+        else:
+            removed.append(pending)
+            transaction.splits.remove(split)
+    added = list(wanted.elements())
+    for split in added:
+        piecash.Split(account=split.account, memo=split.memo, value=cents_to_decimal(split.value),
+                      transaction=transaction)
+    return added, removed
+
+class StatementSink:
+    """
+    Destination of computed paychecks, behind process() and load_book().
+
+    load() and update() read a statement, compute its splits with the sink's
+    registry and hand them to add() or replace(). Subclasses provide:
+
+    - registry: resolves account paths for compute_splits()
+    - loaded(): {statement name: LoadedStatement} of the statements already written
+    - add(splits, date, name, digest): write one paycheck, or raise and write nothing
+    - replace(loaded, splits, digest): bring a written paycheck in line with new splits
+    - save() and close()
+
+    SQLITE tells whether the destination is a SQLite database, to which
+    snapshots and bulk-load mode apply.
+    """
+
+    SQLITE = False
+
+    def load(self, json_filepath, name, ledger=None, digest=None, stats=None, **kwargs):
+        """
+        Write one statement.
+
+        Args:
+            json_filepath: Path to the extracted JSON file
+            name: Statement name, recorded with the paycheck
+            ledger: Optional QuotaLedger that receives the statement's quota rows
+                once the statement has been written
+            digest: Optional statement_digest(), recorded with the paycheck
+            stats: Optional Counter for the rows, unknown descriptors and splits created
+            **kwargs: Passed on to read_statement()
+
+        Returns:
+            What add() returned, or None if the statement produced no splits
+        """
+        data, date, errata_items = read_statement(json_filepath, **kwargs)
+        splits = compute_splits(data, self.registry, errata_items, stats)
+        record = self.add(splits, date, name, digest)
+        if stats is not None and record is not None:
+            stats['splits'] += len(splits)
+        if ledger is not None:
+            ledger.record(date, data)
+        return record
+
+    def update(self, json_filepath, loaded, digest, ledger=None, stats=None, **kwargs):
+        """
+        Update a written statement whose inputs changed.
+
+        Args:
+            json_filepath: Path to the extracted JSON file
+            loaded: LoadedStatement of the statement, from loaded()
+            digest: New statement_digest(), recorded with the paycheck
+            ledger: Optional QuotaLedger whose rows for the pay date are replaced
+            stats: Optional Counter for the rows, unknown descriptors and splits created
+            **kwargs: Passed on to read_statement()
+
+        Returns:
+            Tuple of (record, added, removed PendingSplits)
+        """
+        data, date, errata_items = read_statement(json_filepath, **kwargs)
+        record, added, removed = self.replace(loaded, compute_splits(data, self.registry, errata_items, stats), digest)
+        if stats is not None:
+            stats['splits'] += len(added)
+        if ledger is not None:
+            ledger.record(date, data)
+        return record, added, removed
+
+class GnuCashSink(StatementSink):
+    """
+    Writes each paycheck as a transaction of a GnuCash book.
+
+    Each paycheck is added inside its own savepoint. piecash validates the
+    transaction when the savepoint is committed, so a failing statement rolls
+    back only its own splits and the statements before it can still be saved.
+    """
+
+    SQLITE = True
+
+    def __init__(self, book, registry, gnucash_file=None):
+        """
+        Args:
+            book: Open piecash book
+            registry: AccountRegistry loaded from the book
+            gnucash_file: Path of the book, to also find statements in its archives
+        """
+        self.book = book
+        self.registry = registry
+        self.gnucash_file = gnucash_file
+
+    @classmethod
+    def open(cls, gnucash_file):
+        """Open a book for writing"""
+        book = piecash.open_book(gnucash_file, readonly=False, do_backup=False, open_if_lock=True)
+        try:
+            registry = AccountRegistry()
+            registry.load_from_book(book)
+        except Exception:
+            book.close()
+            raise
+        return cls(book, registry, gnucash_file)
+
+    @staticmethod
+    def create(gnucash_file):
+        """Create a book with all accounts"""
+        create_gnucash_accounts(gnucash_file)
+
+    def loaded(self):
+        loaded = loaded_statements(self.book)
+        if self.gnucash_file:
+            # Statements archived with the paychecks of a closed year stay loaded, but only while
+            # the book holds that year's balance transaction: a recreated book does not
+            archive = BookArchive(self.gnucash_file)
+            for name in archive.statements(archive.balanced_years(self.book)):
+                loaded.setdefault(name, LoadedStatement(None, None))
+        return loaded
+
+    def add(self, splits, date, name=None, digest=None):
+        """Add a transaction recording name and digest in its slots; returns it, or None without splits"""
+        savepoint = self.book.session.begin_nested()
+        try:
+            transaction = add_transaction(self.book, splits, date)
+            if transaction is not None and name:
+                transaction[STATEMENT_SLOT] = name
+                if digest:
+                    transaction[DIGEST_SLOT] = digest
+            # piecash validates the transaction when the savepoint is committed
+            savepoint.commit()
+        except Exception:
+            savepoint.rollback()
+            raise
+        return transaction
+
+    def replace(self, loaded, splits, digest):
+        """Replace only the splits that differ (see replace_splits()); the transaction keeps its guid and post date"""
+        savepoint = self.book.session.begin_nested()
+        try:
+            transaction = self.book.get(piecash.Transaction, guid=loaded.guid)
+            added, removed = replace_splits(transaction, splits)
+            transaction[DIGEST_SLOT] = digest
+            savepoint.commit()
+        except Exception:
+            savepoint.rollback()
+            raise
+        return transaction, added, removed
+
+    def save(self):
+        self.book.save()
+
+    def close(self):
+        self.book.close()
+
+class LedgerSink(StatementSink):
+    """
+    Appends each paycheck as a balanced entry to a plain-text ledger/hledger journal.
+
+    No book is opened and no ORM objects are built. Accounts are the
+    ACCOUNT_PATHS names (PathRegistry), and amounts are written straight from
+    the integer cents. The statement name and digest are tags of each entry,
+    which is how loaded() finds them again. The journal is append-only, so
+    replace() appends a correcting entry with the differences instead of
+    editing the original. Entries are written when the load is saved.
+    """
+
+    COMMODITY = 'USD'
+    POSTING = re.compile(r'^\s+(\S(?:.*?\S)?)\s{2,}(-?[\d,]+\.\d\d) (\S+)(?:\s+; (.*))?$')
+    TAG = re.compile(r'^\s*; ([\w-]+): (.*)$')
+
+    def __init__(self, path):
+        self.path = path
+        self.registry = PathRegistry()
+        self._pending = []
+        self._entries = {}
+
+    @classmethod
+    def open(cls, path):
+        return cls(path)
+
+    @staticmethod
+    def create(path):
+        """Start a journal that declares all accounts"""
+        with open(path, "w") as f:
+            f.write("; Paychecks loaded by pypay\n\n")
+            for account in sorted(set(ACCOUNT_PATHS.values())):
+                f.write(f"account {account}\n")
+
+    def loaded(self):
+        """Read the statements, digests and net postings recorded in the journal"""
+        self._entries = {}
+        with open(self.path, "r") as f:
+            blocks = f.read().split("\n\n")
+        for block in blocks:
+            tags, postings, date = {}, Counter(), None
+            for line in block.splitlines():
+                if line[:1].isdigit():
+                    date = datetime.strptime(line.split()[0], "%Y-%m-%d").date()
+                elif match := self.TAG.match(line):
+                    tags[match.group(1)] = match.group(2)
+                elif match := self.POSTING.match(line):
+                    account, amount, _, memo = match.groups()
+                    postings[(account, memo or '')] += amount_cents(amount)
+            name = tags.get(STATEMENT_SLOT)
+            if name:
+                entry = self._entries.setdefault(name, {'date': date, 'digest': None, 'postings': Counter()})
+                entry['digest'] = tags.get(DIGEST_SLOT, entry['digest'])
+                entry['postings'].update(postings)
+        return {name: LoadedStatement(name, entry['digest']) for name, entry in self._entries.items()}
+
+    def _entry(self, splits, date, name, digest, description):
+        lines = [f"{date.isoformat()} * {description}"] if splits else []
+        for slot, value in ((STATEMENT_SLOT, name), (DIGEST_SLOT, digest)):
+            if value:
+                lines.append(f"    ; {slot}: {value}" if splits else f"; {slot}: {value}")
+        width = max((len(split.account) for split in splits), default=0) + 2
+        for split in splits:
+            memo = f"  ; {split.memo}" if split.memo else ""
+            lines.append(f"    {split.account:{width}}{cents_to_decimal(split.value):>12} {self.COMMODITY}{memo}")
+        self._pending.append("\n".join(lines) + "\n")
+
+    def add(self, splits, date, name=None, digest=None):
+        """Queue a paycheck entry; returns the splits written, or None without splits"""
+        if not splits:
+            return None
+        check_balance(splits)
+        self._entry(splits, date, name, digest, "Paycheck")
+        return splits
+
+    def replace(self, loaded, splits, digest):
+        """Queue a correcting entry that turns the statement's net postings into splits"""
+        check_balance(splits)
+        entry = self._entries[loaded.guid]
+        wanted = Counter()
+        for split in splits:
+            wanted[(split.account, split.memo)] += split.value
+        current = entry['postings']
+        changed = sorted(key for key in set(wanted) | set(current) if wanted[key] != current[key])
+        added = [PendingSplit(account, memo, wanted[(account, memo)]) for account, memo in changed if wanted[(account, memo)]]
+        removed = [PendingSplit(account, memo, current[(account, memo)]) for account, memo in changed if current[(account, memo)]]
+        correction = [PendingSplit(account, memo, wanted[(account, memo)] - current[(account, memo)])
+                      for account, memo in changed]
+        # Without changed postings only the new digest is recorded, as a comment block
+        self._entry(correction, entry['date'], loaded.guid, digest, "Paycheck correction")
+        return correction, added, removed
+
+    def save(self):
+        """Append the queued entries to the journal"""
+        if self._pending:
+            with open(self.path, "a") as f:
+                for entry in self._pending:
+                    f.write("\n" + entry)
+                f.flush()
+                os.fsync(f.fileno())
+        self._pending = []
+
+    def close(self):
+        # Entries that were not saved are dropped, like an unsaved book
+        self._pending = []
+
+# Statement sinks by file extension; any other file is a GnuCash book
+SINKS = {
+    '.hledger': LedgerSink,
+    '.journal': LedgerSink,
+    '.ledger': LedgerSink,
+}
+
+def sink_class(path):
+    """Return the StatementSink class that writes to a file"""
+    return SINKS.get(os.path.splitext(path)[1].lower(), GnuCashSink)
+
+def load_statement(book, registry, json_filepath, name, ledger=None, digest=None, stats=None, **kwargs):
+    """
+    Process one statement into a GnuCash book, inside its own savepoint.
+
+    Args:
+        book: GnuCash book object
+        registry: Account registry
+        json_filepath, name, ledger, digest, stats, **kwargs: See StatementSink.load()
+
+    Returns:
+        The created transaction, or None if the statement produced no splits
+    """
+    return GnuCashSink(book, registry).load(json_filepath, name, ledger=ledger, digest=digest, stats=stats, **kwargs)
+
+def update_statement(book, registry, json_filepath, loaded, digest, ledger=None, stats=None, **kwargs):
+    """
+    Update an already loaded statement of a GnuCash book whose inputs changed.
+
+    Only the splits that differ are replaced; the transaction keeps its guid,
+    post date and unchanged splits.
+
+    Args:
+        book: GnuCash book object
+        registry: Account registry
+        json_filepath, loaded, digest, ledger, stats, **kwargs: See StatementSink.update()
+
+    Returns:
+        Tuple of (transaction, added, removed) as returned by replace_splits()
+    """
+    return GnuCashSink(book, registry).update(json_filepath, loaded, digest, ledger=ledger, stats=stats, **kwargs)
+
+def print_split_changes(name, added, removed):
+    """Print the splits a StatementSink.update() changed"""
+    print(f"Updated {name}: {len(added)} split(s) added, {len(removed)} removed")
+    for sign, splits in (('-', removed), ('+', added)):
+        for split in splits:
+            account = getattr(split.account, 'fullname', split.account)
+            print(f"  {sign} {account}  {split.memo}  {cents_to_decimal(split.value)}")
+
+# Page cache of each book connection during a bulk load, in KiB
+BULK_LOAD_CACHE_KIB = 256 * 1024
+
+@contextlib.contextmanager
+def bulk_load(gnucash_file, cache_kib=BULK_LOAD_CACHE_KIB):
+    """
+    Put a SQLite book in bulk-load mode for the duration of an import.
+
+    The book is switched to WAL journaling, so read-only queries (reports,
+    a readonly open_book) keep reading the last committed state while the
+    load writes. The context yields tune(book): called with the opened
+    book, it gives the book's connection, and every later connection of
+    the book's engine, synchronous=NORMAL, which skips the fsync of each
+    commit (with the SQLite driver, every statement's savepoint release is
+    one), and a larger page cache. Other engines are left alone. On exit
+    the WAL is checkpointed into the book and its original journal mode is
+    restored, so GnuCash sees a plain single-file book again; the relaxed
+    settings end with the connections. A book found in WAL mode was left
+    there by a load that could not restore it, and gets the rollback
+    journal (delete) back.
+
+    Enter before the book is opened and leave after it is closed: the
+    journal mode can only be restored while no other connection is open.
+
+    Args:
+        gnucash_file: Path to the SQLite GnuCash file
+        cache_kib: Page cache per connection in KiB
+    """
+    path = os.path.realpath(gnucash_file)
+    with contextlib.closing(sqlite3.connect(path)) as conn:
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        if journal_mode == 'wal':
+            # GnuCash never uses WAL: it is left over from a load that a reader kept from restoring
+            journal_mode = 'delete'
+        conn.execute("PRAGMA journal_mode=WAL")
+
+    def configure(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA cache_size=-{int(cache_kib)}")
+        finally:
+            cursor.close()
+
+    engines = []
+
+    def tune(book):
+        # piecash's engine uses NullPool: the open session's connection is
+        # configured directly, the ones opened after it by the listener
+        engine = book.session.bind
+        event.listen(engine, "connect", configure)
+        engines.append(engine)
+        configure(book.session.connection().connection, None)
+
+    try:
+        yield tune
+    finally:
+        for engine in engines:
+            event.remove(engine, "connect", configure)
+        with contextlib.closing(sqlite3.connect(path)) as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            try:
+                conn.execute(f"PRAGMA journal_mode={journal_mode}")
+            except sqlite3.OperationalError as e:
+                # A reader is still connected; the next load restores the rollback journal
+                print(f"Warning: {gnucash_file} left in WAL mode ({e})")
+
+class BookSnapshots:
+    """
+    Rotating snapshots of a SQLite book, taken with SQLite's online backup API.
+
+    A snapshot copies the database pages of the book (and of its quota
+    ledger, if present) into <gnucash_file>.snapshots/<timestamp>.gnucash
+    without going through piecash, so it is as fast as copying the pages and
+    does not wait for GnuCash's application lock. Lock rows are cleared in
+    the copy, so a restored book is not left locked by a process that is
+    gone. Only the newest `keep` snapshots are kept.
+    """
+
+    SUFFIX = ".gnucash"
+
+    def __init__(self, gnucash_file, keep=10):
+        self.gnucash_file = gnucash_file
+        self.keep = keep
+        self.directory = gnucash_file + ".snapshots"
+
+    @staticmethod
+    def _copy(source_path, target_path):
+        with contextlib.closing(sqlite3.connect(source_path)) as source, \
+                contextlib.closing(sqlite3.connect(target_path)) as target:
+            source.backup(target)
+
+    def list(self):
+        """Return snapshot names, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(self.SUFFIX)] for name in os.listdir(self.directory) if name.endswith(self.SUFFIX))
+
+    def take(self):
+        """
+        Snapshot the book and its quota ledger, then drop the oldest snapshots.
+
+        Returns:
+            Path of the book snapshot
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        name = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = os.path.join(self.directory, name + self.SUFFIX)
+        self._copy(self.gnucash_file, path)
+        with contextlib.closing(sqlite3.connect(path)) as snapshot:
+            with snapshot:
+                if snapshot.execute("SELECT 1 FROM sqlite_master WHERE name = 'gnclock'").fetchone():
+                    snapshot.execute("DELETE FROM gnclock")
+
+        ledger_path = QuotaLedger.path_for(self.gnucash_file)
+        if os.path.exists(ledger_path):
+            self._copy(ledger_path, os.path.join(self.directory, name + ".quota.sqlite"))
+
+        for old in self.list()[:-self.keep] if self.keep > 0 else []:
+            for suffix in (self.SUFFIX, ".quota.sqlite"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(self.directory, old + suffix))
+        return path
+
+    def locked(self):
+        """Return whether another program holds GnuCash's lock on the book"""
+        with contextlib.closing(sqlite3.connect(self.gnucash_file)) as book:
+            if not book.execute("SELECT 1 FROM sqlite_master WHERE name = 'gnclock'").fetchone():
+                return False
+            return book.execute("SELECT count(*) FROM gnclock").fetchone()[0] > 0
+
+    def restore(self, name=None):
+        """
+        Copy a snapshot back over the book and its quota ledger, in place.
+
+        Args:
+            name: Snapshot name from list() (default: the newest)
+
+        Returns:
+            Name of the restored snapshot
+        """
+        names = self.list()
+        if not names:
+            raise ValueError(f"No snapshots of {self.gnucash_file} in {self.directory}")
+        name = name or names[-1]
+        if name not in names:
+            raise ValueError(f"No snapshot named {name} in {self.directory}")
+
+        self._copy(os.path.join(self.directory, name + self.SUFFIX), self.gnucash_file)
+        ledger_snapshot = os.path.join(self.directory, name + ".quota.sqlite")
+        ledger_path = QuotaLedger.path_for(self.gnucash_file)
+        if os.path.exists(ledger_snapshot):
+            self._copy(ledger_snapshot, ledger_path)
+        elif os.path.exists(ledger_path):
+            # The ledger did not exist yet when the snapshot was taken
+            os.remove(ledger_path)
+        return name
+
+# Transaction slot marking the balance transaction that stands in for an archived year
+ARCHIVE_SLOT = 'pypay-archive'
+
+class BookArchive:
+    """
+    Per-year archive books that hold the paychecks of closed years.
+
+    Archive books sit next to the book as <book>.<year>.gnucash and are
+    created with the same ACCOUNT_PATHS tree. archive() moves a year's
+    paychecks into its archive book and posts one balance transaction per
+    year in their place, dated December 31 and marked with ARCHIVE_SLOT, so
+    account balances in the book do not change. account_totals() reads an
+    archive instead of its balance transaction when a date range reaches
+    into its year.
+    """
+
+    def __init__(self, gnucash_file):
+        self.gnucash_file = gnucash_file
+        self._root, self._ext = os.path.splitext(gnucash_file)
+
+    def path(self, year):
+        """Return the archive book of a year"""
+        return f"{self._root}.{year}{self._ext}"
+
+    def years(self):
+        """Return the years that have an archive book, oldest first"""
+        pattern = re.compile(re.escape(os.path.basename(self._root)) + r'\.(\d{4})' + re.escape(self._ext) + '$')
+        matches = map(pattern.match, os.listdir(os.path.dirname(self.gnucash_file) or '.'))
+        return sorted(int(match.group(1)) for match in matches if match)
+
+    def balanced_years(self, book):
+        """
+        Return the archived years whose balance transaction is in a book, oldest first.
+
+        An archive book whose balance transaction is missing (the book was
+        recreated, e.g. with --init, or restored from before the archive) no
+        longer stands in for paychecks of the book.
+        """
+        slots = Slot.__table__
+        names = {name for name, in book.session.execute(
+            select(slots.c.string_val).where(slots.c.name == ARCHIVE_SLOT))}
+        return [year for year in self.years() if os.path.basename(self.path(year)) in names]
+
+    def statements(self, years=None):
+        """Return the names of the statements whose paychecks were archived (in years, default all)"""
+        names = set()
+        for year in self.years() if years is None else years:
+            with contextlib.closing(sqlite3.connect(self.path(year))) as archive:
+                names.update(name for name, in archive.execute("SELECT string_val FROM slots WHERE name = ?",
+                                                               (STATEMENT_SLOT,)))
+        return names
+
+    def archive(self, before):
+        """
+        Move the paychecks posted before a year into per-year archive books.
+
+        Paychecks are the transactions loaded from statements (STATEMENT_SLOT).
+        Each archive book is saved before the book, so an interrupted archive
+        leaves a year in both rather than lost; re-running it does not copy
+        the paychecks already in the archive again.
+
+        Args:
+            before: First year that stays in the book
+
+        Returns:
+            Dict of archived year to number of paychecks moved
+        """
+        moved = {}
+        book = piecash.open_book(self.gnucash_file, readonly=False, do_backup=False, open_if_lock=True)
+        try:
+            years = {}
+            for loaded in loaded_statements(book).values():
+                transaction = book.get(piecash.Transaction, guid=loaded.guid)
+                if transaction.post_date.year < before:
+                    years.setdefault(transaction.post_date.year, []).append(transaction)
+
+            currency = book.commodities(mnemonic="USD")
+            for year, transactions in sorted(years.items()):
+                totals = self._copy_to_archive(year, transactions)
+                if any(totals.values()):
+                    balance = piecash.Transaction(
+                        post_date=date(year, 12, 31), currency=currency, description=f"Archived paychecks {year}",
+                        splits=[piecash.Split(account=book.accounts(fullname=account), memo="Archived paychecks",
+                                              value=cents_to_decimal(cents))
+                                for account, cents in sorted(totals.items()) if cents])
+                    balance[ARCHIVE_SLOT] = os.path.basename(self.path(year))
+                for transaction in transactions:
+                    book.delete(transaction)
+                book.save()
+                moved[year] = len(transactions)
+        finally:
+            book.close()
+        return moved
+
+    def _copy_to_archive(self, year, transactions):
+        """
+        Copy paychecks into the archive book of their year, skipping those it already holds.
+
+        Returns:
+            Counter of account full name to the cents moved out of the book
+            (all transactions, copied now or by an interrupted earlier run)
+        """
+        path = self.path(year)
+        if not os.path.exists(path):
+            create_gnucash_accounts(path)
+        archive = piecash.open_book(path, readonly=False, do_backup=False, open_if_lock=True)
+        try:
+            registry = AccountRegistry()
+            registry.load_from_book(archive)
+            archived = loaded_statements(archive)
+            currency = archive.commodities(mnemonic="USD")
+            totals = Counter()
+            for transaction in transactions:
+                for split in transaction.splits:
+                    totals[split.account.fullname] += int(split.value.scaleb(2))
+                if transaction[STATEMENT_SLOT].value in archived:
+                    continue
+                copy = piecash.Transaction(
+                    post_date=transaction.post_date, currency=currency, description=transaction.description,
+                    splits=[piecash.Split(account=registry.get(split.account.fullname), memo=split.memo,
+                                          value=split.value, reconcile_state=split.reconcile_state)
+                            for split in transaction.splits])
+                for slot in (STATEMENT_SLOT, DIGEST_SLOT):
+                    if slot in transaction:
+                        copy[slot] = transaction[slot].value
+            archive.save()
+        finally:
+            archive.close()
+        return totals
+
+    def account_totals(self, start=None, end=None):
+        """
+        Sum split values per account across the book and the archives a date range reaches.
+
+        Args:
+            start: First post date included (default: unbounded)
+            end: Last post date included (default: unbounded)
+
+        Returns:
+            Tuple of (Counter of account full name to cents, paths of the books read)
+        """
+        book = piecash.open_book(self.gnucash_file, readonly=True, do_backup=False, open_if_lock=True)
+        try:
+            balanced = self.balanced_years(book)
+        finally:
+            book.close()
+        years = [year for year in balanced
+                 if (start is None or year >= start.year) and (end is None or year <= end.year)]
+        books = [self.gnucash_file] + [self.path(year) for year in years]
+        totals = Counter()
+        for path in books:
+            book = piecash.open_book(path, readonly=True, do_backup=False, open_if_lock=True)
+            try:
+                slots = Slot.__table__
+                # Balance transactions of the archives read here would count their years twice
+                balances = {guid for guid, in book.session.execute(
+                    select(slots.c.obj_guid).where(slots.c.name == ARCHIVE_SLOT))}
+                query = book.session.query(piecash.Split).join(piecash.Split.transaction)
+                if start is not None:
+                    query = query.filter(piecash.Transaction.post_date >= start)
+                if end is not None:
+                    query = query.filter(piecash.Transaction.post_date <= end)
+                for split in query:
+                    transaction = split.transaction
+                    if transaction.guid in balances and transaction.post_date.year in years:
+                        continue
+                    totals[split.account.fullname] += int(split.value.scaleb(2))
+            finally:
+                book.close()
+        return totals, books
 
 def create_gnucash_accounts(gnucash_file):
     """Create a new GnuCash file with all accounts but no transactions"""
@@ -1156,34 +3378,189 @@ def create_gnucash_accounts(gnucash_file):
         book.save()
         print(f"Created GnuCash file: {gnucash_file}")
 
-def main():
-    parser = argparse.ArgumentParser(description='Process payroll PDFs and load into GnuCash')
+# Metrics of a load in the Prometheus textfile format: name -> (type, help).
+# Counters restart with every run; the node exporter's textfile collector
+# publishes whatever the last run wrote.
+LOAD_METRICS = {
+    'files_scanned_total': ('counter', 'Statement files found in the input'),
+    'files_processed_total': ('counter', 'Statements loaded, updated, failed or quarantined'),
+    'pages_parsed_total': ('counter', 'PDF pages parsed'),
+    'words_extracted_total': ('counter', 'Words extracted from parsed pages'),
+    'rows_total': ('counter', 'Statement line items processed'),
+    'splits_created_total': ('counter', 'Transaction splits created'),
+    'unknown_descriptors_total': ('counter', 'Line items whose descriptor maps to no account'),
+    'cache_hits_total': ('counter', 'Statements read from the extraction cache'),
+    'bytes_read_total': ('counter', 'Bytes of statement and errata files read'),
+    'stage_seconds': ('gauge', 'Wall time spent in each stage of the load'),
+    'files_per_second': ('gauge', 'Statements processed per second'),
+    'duration_seconds': ('gauge', 'Wall time of the load'),
+    'last_run_timestamp_seconds': ('gauge', 'Unix time the load finished'),
+    'last_run_success': ('gauge', 'Whether the load finished without an error'),
+}
 
-    # Main arguments
-    parser.add_argument('gnucash_file', help='Path to GnuCash file')
-    parser.add_argument('path', nargs='?', help='Path to PDF/JSON file or directory containing PDF/JSON files')
+def write_metrics(path, runs):
+    """
+    Write load metrics atomically in the Prometheus textfile format.
 
-    # Flags
-    parser.add_argument('--init', action='store_true', help='Create/recreate GnuCash file with accounts before loading')
+    Args:
+        path: Output file, e.g. pypay.prom in the node exporter's textfile directory
+        runs: List of (labels dict, RunMetrics.samples()), one per book
+    """
+    def label_text(labels):
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                   for value in labels.values())
+        return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}' if labels else ''
+
+    lines = []
+    for name, (kind, help_text) in LOAD_METRICS.items():
+        lines.append(f"# HELP pypay_{name} {help_text}")
+        lines.append(f"# TYPE pypay_{name} {kind}")
+        for labels, samples in runs:
+            if name not in samples:
+                continue
+            value = samples[name]
+            # Per-stage values are one series per stage
+            series = value.items() if isinstance(value, dict) else [(None, value)]
+            for stage, v in series:
+                series_labels = dict(labels, stage=stage) if stage else labels
+                lines.append(f"pypay_{name}{label_text(series_labels)} {v}")
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+class RunMetrics:
+    """
+    Counters, stage timings and progress of one load.
+
+    Counts are kept in a Counter like the parsing stats, so the same object can
+    be handed to load_statement(). Pages and words come from the STRATEGY_CACHE
+    counters, which the extraction workers merge back as they finish.
+    """
+
+    STAGES = ('snapshot', 'scan', 'extract', 'load', 'save')
+
+    def __init__(self, progress=None):
+        """
+        Args:
+            progress: Whether to draw the progress line (default: when stderr is a terminal)
+        """
+        self.stats = Counter()
+        self.total = 0
+        self._start = time.perf_counter()
+        self._parse_stats = Counter(STRATEGY_CACHE.stats)
+        self._progress = sys.stderr.isatty() if progress is None else progress
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Add the wall time of the enclosed block to a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stats[f'{name}_seconds'] += time.perf_counter() - start
+
+    def read(self, *paths):
+        """Count the bytes of input files (None entries are ignored)"""
+        self.stats['bytes_read'] += sum(os.path.getsize(path) for path in paths if path)
+
+    def track(self, entries):
+        """Iterate over statements, counting each as processed once the loop moves past it"""
+        self.total += len(entries)
+        for entry in entries:
+            yield entry
+            self.stats['files_processed'] += 1
+            if self._progress:
+                # Back at the start of the line, so the next log line overwrites it
+                sys.stderr.write(f"\r{self.progress_line()}\033[K\r")
+                sys.stderr.flush()
+        if self._progress and entries:
+            sys.stderr.write("\n")
+
+    def progress_line(self):
+        """Format processed statements, throughput and the ETA of the remaining ones"""
+        done = self.stats['files_processed']
+        rate = done / (time.perf_counter() - self._start)
+        eta = (self.total - done) / rate if rate else 0
+        return f"{done}/{self.total} statement(s), {rate:.1f} files/s, ETA {eta:.0f}s"
+
+    def samples(self, success=True):
+        """Return the values of LOAD_METRICS for this run"""
+        seconds = time.perf_counter() - self._start
+        parsed = STRATEGY_CACHE.stats - self._parse_stats
+        return {
+            'files_scanned_total': self.stats['files_scanned'],
+            'files_processed_total': self.stats['files_processed'],
+            'pages_parsed_total': sum(parsed[f'{path}_pages'] for path in (StrategyCache.WORDS, StrategyCache.TABLES,
+                                                                           'tables_after_words')),
+            'words_extracted_total': parsed['words'],
+            'rows_total': self.stats['rows'],
+            'splits_created_total': self.stats['splits'],
+            'unknown_descriptors_total': self.stats['unknown_descriptors'],
+            'cache_hits_total': self.stats['cache_hits'],
+            'bytes_read_total': self.stats['bytes_read'],
+            'stage_seconds': {stage: round(self.stats[f'{stage}_seconds'], 6) for stage in self.STAGES},
+            'files_per_second': round(self.stats['files_processed'] / seconds, 6) if seconds else 0,
+            'duration_seconds': round(seconds, 6),
+            'last_run_timestamp_seconds': int(time.time()),
+            'last_run_success': int(success),
+        }
+
+def add_load_arguments(parser):
+    """Add the flags shared by single-book and batch loads to an argument parser"""
     parser.add_argument('--clean', action='store_true', help='Delete generated JSON files after successful load')
-    parser.add_argument('--force', '-f', action='store_true', help='[Deprecated] Force operations without confirmation')
     parser.add_argument('--skip', action='append', help='Skip files matching this pattern (can be used multiple times)')
-    parser.add_argument('--output-dir', '-o', help='Output directory for preprocessed JSON files (default: <input_dir>/json)')
-
-    args = parser.parse_args()
+    parser.add_argument('--jobs', '-j', type=int, default=min(4, os.cpu_count() or 1), help='Number of extraction worker processes for directory input, or for the pages of a long single statement')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds allowed to extract a single PDF before it is quarantined')
+    parser.add_argument('--max-rss', type=int, default=1024, help='Resident memory ceiling in MB for an extraction worker')
+    parser.add_argument('--max-tasks-per-worker', type=int, default=25, help='Recycle an extraction worker after this many PDFs')
+    parser.add_argument('--retry-quarantined', action='store_true', help='Retry files quarantined by an earlier run')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='pdfplumber', help='PDF extraction engine (default: pdfplumber)')
+    parser.add_argument('--cache-dir', help='Directory for the content-addressed extraction cache (default: no cache)')
+    parser.add_argument('--bulk-load', action='store_true', help='Import with WAL journaling, relaxed fsync and a larger page cache; read-only queries can run during the load')
+    parser.add_argument('--typed-json', action='store_true', help='Write extracted statements in the typed format (amounts in cents, accounts resolved)')
+    parser.add_argument('--no-snapshot', dest='snapshot', action='store_false', help='Do not snapshot the book before loading')
+    parser.add_argument('--keep-snapshots', type=int, default=10, help='Number of pre-load snapshots kept per book (default: 10)')
+    parser.add_argument('--metrics-file', help='Write run metrics here in Prometheus textfile format (e.g. for the node exporter)')
+
+def load_book(args):
+    """
+    Load a statement file or directory into an existing GnuCash book (or
+    another StatementSink, chosen by sink_class()).
 
-    # Helper function to check if a file should be skipped
-    def should_skip(filename):
-        if not args.skip:
-            return False
-        for pattern in args.skip:
-            if pattern in filename:
-                return True
-        return False
+    Args:
+        args: Parsed arguments with gnucash_file, path, output_dir and the
+            flags from add_load_arguments
 
+    Returns:
+        Summary dict with counts of loaded, already loaded, cached, duplicate,
+        conflicting, quarantined and failed statements, and the error that
+        stopped the load (or None)
+    """
+    start = time.perf_counter()
+    summary = {'gnucash_file': args.gnucash_file, 'path': args.path, 'loaded': 0, 'already_loaded': 0,
+               'updated': 0, 'cached': 0, 'duplicates': 0, 'conflicts': 0, 'quarantined': 0, 'failed': 0, 'error': None,
+               'snapshot': None}
+    metrics = RunMetrics()
+    completed = False
+    try:
+        _load_book(args, summary, metrics)
+        completed = True
+    finally:
+        # Written on every exit path, so a load that failed before it started
+        # never leaves the previous run's success in the metrics file
+        summary['seconds'] = time.perf_counter() - start
+        summary['metrics'] = metrics.samples(success=completed and summary['error'] is None)
+        if args.metrics_file:
+            write_metrics(args.metrics_file, [({'book': os.path.basename(args.gnucash_file)}, summary['metrics'])])
+    return summary
+
+def _load_book(args, summary, metrics):
+    """Body of load_book(): load into the sink, filling summary and metrics"""
     # Determine output directory for JSON files
     output_dir = None
-    if args.path and os.path.isdir(args.path):
+    if os.path.isdir(args.path):
         # For directory input, use --output-dir if specified, otherwise create 'json' subdirectory
         if args.output_dir:
             output_dir = args.output_dir
@@ -1195,74 +3572,189 @@ def main():
             os.makedirs(output_dir)
             print(f"Created output directory: {output_dir}")
 
-    # Validate path argument for load operations
-    if not args.path:
-        print("Error: path argument is required")
-        parser.print_help()
-        return
-
-    # Handle --init flag: recreate GnuCash file before load
-    if args.init:
-        if os.path.exists(args.gnucash_file):
-            response = input(f"File {args.gnucash_file} already exists. Overwrite? (yes/no): ")
-            if response.lower() != 'yes':
-                print("Aborted.")
-                return
-        print(f"Creating GnuCash file: {args.gnucash_file}")
-        create_gnucash_accounts(args.gnucash_file)
-    elif not os.path.exists(args.gnucash_file):
-        print(f"Error: GnuCash file {args.gnucash_file} does not exist. Use --init to create it.")
-        return
+    cache = ExtractionCache(args.cache_dir) if args.cache_dir else None
+    if cache:
+        cache.load_strategies()
 
-    # Load into GnuCash
-    book = piecash.open_book(args.gnucash_file, readonly=False, do_backup=False, open_if_lock=True)
-    registry = AccountRegistry()
+    # Snapshot the book before anything touches it, so a bad load can be undone
+    sink_type = sink_class(args.gnucash_file)
+    if args.snapshot and sink_type.SQLITE:
+        with metrics.stage('snapshot'):
+            summary['snapshot'] = BookSnapshots(args.gnucash_file, keep=args.keep_snapshots).take()
+        print(f"Snapshot of {args.gnucash_file} saved to {summary['snapshot']}")
 
     # Track JSON files created from PDFs for cleanup
     created_json_files = []
-
+    conflicts = []
+    failures = []
+    quarantine = None
+    sink = None
+    ledger = None
+
+    # Bulk-load mode lasts from before the book is opened until after it is closed
+    bulk = contextlib.ExitStack()
     try:
-        registry.load_from_book(book)
+        tune = bulk.enter_context(bulk_load(args.gnucash_file)) if args.bulk_load and sink_type.SQLITE else None
+        # Load into GnuCash (or another StatementSink)
+        sink = sink_type.open(args.gnucash_file)
+        if tune:
+            tune(sink.book)
+        ledger = QuotaLedger(QuotaLedger.path_for(args.gnucash_file))
+        loaded = sink.loaded()
 
         if os.path.isdir(args.path):
-            # Process directory - handle both PDFs and JSONs
-            for file in sorted(os.listdir(args.path)):
-                if should_skip(file):
-                    print(f"Skipping {file}")
-                    continue
+            # Process directory in pay date order, as planned by a single scan
+            with metrics.stage('scan'):
+                manifest = build_manifest(args.path, output_dir, args.skip)
+                metrics.stats['files_scanned'] += len(manifest)
+                manifest, duplicates, conflicts = dedupe_manifest(manifest)
+            for entry, kept in duplicates:
+                print(f"Skipping {entry['name']} (identical to {kept['name']})")
+            summary['duplicates'] = len(duplicates)
+            summary['conflicts'] = len(conflicts)
+
+            quarantine = Quarantine(os.path.join(output_dir, 'quarantine.json'))
+            if not args.retry_quarantined:
+                for entry in [e for e in manifest if quarantine.contains(e)]:
+                    print(f"Skipping {entry['name']} (quarantined, use --retry-quarantined)")
+                    manifest.remove(entry)
+            # Statements loaded before are updated in place only when their inputs changed
+            with metrics.stage('scan'):
+                for entry in manifest:
+                    entry['digest'] = statement_digest(entry['source'], entry['errata'], entry.get('sha256'))
+                    metrics.read(entry['source'], entry['errata'])
+            for entry in [e for e in manifest if e['name'] in loaded]:
+                if loaded[entry['name']].digest in (None, entry['digest']):
+                    manifest.remove(entry)
+                    summary['already_loaded'] += 1
+            if summary['already_loaded']:
+                print(f"Skipping {summary['already_loaded']} statement(s) already loaded into {args.gnucash_file}")
+
+            # Extract in isolated workers and load each statement as soon as it is ready. Workers
+            # return rows; the JSON is written here, so the cache always holds rows, also with --typed-json
+            with WorkerPool(parse_input, workers=args.jobs, timeout=args.timeout, max_rss_mb=args.max_rss,
+                            max_tasks_per_worker=args.max_tasks_per_worker) as pool:
+                futures = {}
+                for entry in manifest:
+                    with metrics.stage('extract'):
+                        rows = cache.get(entry, args.engine) if cache else None
+                        if rows is not None:
+                            write_json(statement_record(rows, entry['date']) if args.typed_json else rows, entry['json'])
+                            summary['cached'] += 1
+                            metrics.stats['cache_hits'] += 1
+                        else:
+                            futures[entry['source']] = pool.submit(entry['source'], args.engine, 1, entry['fallbacks'])
+
+                for entry in metrics.track(manifest):
+                    json_filepath = entry['json']
+                    future = futures.get(entry['source'])
+                    if future:
+                        try:
+                            with metrics.stage('extract'):
+                                rows = future.result()
+                                write_json(statement_record(rows, entry['date']) if args.typed_json else rows,
+                                           json_filepath)
+                        except Exception as e:
+                            print(f"Quarantining {entry['name']}: {e}")
+                            quarantine.add(entry, str(e))
+                            continue
+                        quarantine.discard(entry)
+                        if cache:
+                            cache.put(entry, args.engine, rows)
 
-                file_path = os.path.join(args.path, file)
-                if file.endswith(".pdf"):
-                    # Extract PDF to JSON and immediately load it
-                    print(f"Preprocessing {file_path}...")
-                    json_filepath = extract(file_path, output_dir)
                     created_json_files.append(json_filepath)
                     print(f"Loading {json_filepath}...")
-                    process(json_filepath, book, registry, source_pdf_path=file_path)
+                    try:
+                        with metrics.stage('load'):
+                            if entry['name'] in loaded:
+                                record, added, removed = sink.update(
+                                    json_filepath, loaded[entry['name']], entry['digest'], ledger=ledger,
+                                    stats=metrics.stats, date=entry['date'], errata_path=entry['errata'])
+                            else:
+                                sink.load(json_filepath, entry['name'], ledger=ledger, digest=entry['digest'],
+                                          stats=metrics.stats, date=entry['date'], errata_path=entry['errata'])
+                    except Exception as e:
+                        # Only this statement's savepoint was rolled back, keep going
+                        print(f"Error loading {entry['name']}: {e}")
+                        failures.append((entry['name'], str(e)))
+                        continue
+                    if entry['name'] in loaded:
+                        print_split_changes(entry['name'], added, removed)
+                        summary['updated'] += 1
+                    else:
+                        summary['loaded'] += 1
 
         elif os.path.isfile(args.path):
-            if args.path.endswith(".pdf"):
-                # Extract single PDF to JSON (in same directory) and immediately load it
-                print(f"Preprocessing {args.path}...")
-                json_filepath = extract(args.path)  # No output_dir for single file
-                created_json_files.append(json_filepath)
-                print(f"Loading {json_filepath}...")
-                process(json_filepath, book, registry, source_pdf_path=args.path)
-            elif args.path.endswith(".json"):
-                # Process JSON file directly
-                print(f"Loading {args.path}...")
+            # Statements are recorded by their PDF name, also when loaded from JSON
+            name = os.path.splitext(os.path.basename(args.path))[0] + ".pdf"
+            is_source = os.path.splitext(args.path)[1].lower() in PARSERS
+            if is_source:
+                source_path = args.path
+            else:
                 # Try to infer PDF path from JSON path
-                pdf_path = args.path.replace('.json', '.pdf')
-                if not os.path.exists(pdf_path):
-                    pdf_path = None
-                process(args.path, book, registry, source_pdf_path=pdf_path)
+                source_path = args.path.replace('.json', '.pdf')
+                if not os.path.exists(source_path):
+                    source_path = None
+            errata_path = find_errata(source_path)
+            digest = statement_digest(source_path or args.path, errata_path)
+            previous = loaded.get(name)
+            metrics.stats['files_scanned'] += 1
+            metrics.read(args.path, errata_path)
+
+            if not is_source and not args.path.endswith(".json"):
+                print(f"Error: {args.path} is not a statement ({', '.join(PARSERS)}) or JSON file")
+            elif previous and previous.digest in (None, digest):
+                print(f"Skipping {args.path} (already loaded into {args.gnucash_file})")
+                summary['already_loaded'] += 1
             else:
-                print(f"Error: {args.path} is not a PDF or JSON file")
+                json_filepath = args.path
+                if is_source:
+                    # Extract single statement to JSON (in same directory) and immediately load it
+                    print(f"Preprocessing {args.path}...")
+                    # No output_dir for single file; the workers split the pages of a long statement
+                    with metrics.stage('extract'):
+                        json_filepath = extract(args.path, engine=args.engine, page_jobs=args.jobs,
+                                                typed=args.typed_json)
+                    created_json_files.append(json_filepath)
+                print(f"Loading {json_filepath}...")
+                with metrics.stage('load'):
+                    if previous:
+                        record, added, removed = sink.update(json_filepath, previous, digest, ledger=ledger,
+                                                             stats=metrics.stats, errata_path=errata_path)
+                        print_split_changes(name, added, removed)
+                        summary['updated'] += 1
+                    else:
+                        sink.load(json_filepath, name, ledger=ledger, digest=digest, stats=metrics.stats,
+                                  errata_path=errata_path)
+                        summary['loaded'] += 1
+                metrics.stats['files_processed'] += 1
         else:
             raise ValueError(f"The path '{args.path}' is not valid")
 
-        book.save()
-        print("Successfully saved to GnuCash")
+        with metrics.stage('save'):
+            sink.save()
+            ledger.commit()
+        print(f"Successfully saved to {args.gnucash_file}")
+
+        if STRATEGY_CACHE.stats:
+            print("\nExtraction strategies:")
+            for line in STRATEGY_CACHE.summary():
+                print(f"  {line}")
+
+        if quarantine and quarantine.added:
+            print(f"\n{len(quarantine.added)} file(s) quarantined (listed in {quarantine.path}):")
+            for entry, reason in quarantine.added:
+                print(f"  {entry['name']}: {reason}")
+
+        if failures:
+            print(f"\n{len(failures)} statement(s) failed and were not loaded (re-run to retry only these):")
+            for name, error in failures:
+                print(f"  {name}: {error}")
+
+        if conflicts:
+            print(f"\n{len(conflicts)} statement(s) need review (same pay date, different content, not loaded):")
+            for entry, kept in conflicts:
+                print(f"  {entry['name']} (loaded {kept['name']} instead)")
 
         # Handle --clean flag: clean up JSON files after successful load
         if args.clean and created_json_files:
@@ -1278,11 +3770,1075 @@ def main():
             print(f"Successfully deleted {deleted_count}/{len(created_json_files)} file(s)")
 
     except Exception as e:
+        summary['error'] = str(e)
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
+        if summary['snapshot']:
+            print(f"To undo this load: python load.py restore {args.gnucash_file}")
+    finally:
+        if ledger:
+            ledger.rollback()
+            ledger.close()
+        if sink:
+            sink.close()
+        bulk.close()
+        if cache:
+            cache.save_strategies()
+
+    if quarantine:
+        summary['quarantined'] = len(quarantine.added)
+    summary['failed'] = len(failures)
+
+def _load_book_quietly(args, log_path):
+    """Batch worker: load one book with its output captured in a log file"""
+    with open(log_path, "w") as log:
+        with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            return load_book(args)
+
+def batch_main(argv):
+    """Load many independent books concurrently, one process per book"""
+    parser = argparse.ArgumentParser(prog='load.py batch',
+                                     description='Load payroll statements into many GnuCash books concurrently')
+    parser.add_argument('manifest', help='JSON file with a list of {"gnucash_file": ..., "path": ...} entries')
+    parser.add_argument('--books', type=int, default=os.cpu_count() or 1,
+                        help='Number of books loaded concurrently; they share the --jobs extraction workers')
+    add_load_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with open(args.manifest, "r") as f:
+        books = json.load(f)
+
+    # Relative paths in the manifest are relative to the manifest itself
+    base_dir = os.path.dirname(os.path.abspath(args.manifest))
+    if args.cache_dir is None:
+        args.cache_dir = os.path.join(base_dir, '.pypay-cache')
+
+    # --jobs is the extraction worker budget of the whole batch, so the
+    # per-worker --max-rss ceiling also bounds the batch as a whole
+    concurrent_books = max(1, min(args.books, len(books)))
+    book_jobs = max(1, args.jobs // concurrent_books)
+
+    jobs = []
+    for book in books:
+        book_args = argparse.Namespace(**vars(args))
+        book_args.jobs = book_jobs
+        book_args.gnucash_file = os.path.join(base_dir, book['gnucash_file'])
+        book_args.path = os.path.join(base_dir, book['path'])
+        book_args.output_dir = None
+        book_args.metrics_file = None  # Written once for all books below
+        jobs.append(book_args)
+
+    missing = [a.gnucash_file for a in jobs if not os.path.exists(a.gnucash_file)]
+    if missing:
+        print(f"Error: GnuCash file(s) do not exist, create them with --init first: {', '.join(missing)}")
+        return
+
+    # Books are independent SQLite files, so each gets its own process and writer
+    print(f"Loading {len(jobs)} book(s), {concurrent_books} at a time with {book_jobs} extraction worker(s) each")
+    summaries = []
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=concurrent_books, mp_context=context) as executor:
+        futures = {executor.submit(_load_book_quietly, a, a.gnucash_file + ".log"): a for a in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            book_args = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {'gnucash_file': book_args.gnucash_file, 'path': book_args.path, 'loaded': 0,
+                           'already_loaded': 0, 'updated': 0, 'cached': 0, 'duplicates': 0, 'conflicts': 0,
+                           'quarantined': 0, 'failed': 0,
+                           'error': f"{type(e).__name__}: {e}", 'seconds': 0,
+                           'metrics': {'last_run_timestamp_seconds': int(time.time()), 'last_run_success': 0}}
+            print(f"{'FAILED' if summary['error'] else 'done'}: {summary['gnucash_file']} "
+                  f"({summary['loaded']} statement(s), {summary['seconds']:.1f}s)")
+            summaries.append(summary)
+
+    summaries.sort(key=lambda s: s['gnucash_file'])
+    print(f"\n{'Book':40} {'Loaded':>7} {'Before':>7} {'Updated':>7} {'Cached':>7} {'Dup':>5} {'Review':>7} {'Quar':>5} "
+          f"{'Failed':>7} {'Secs':>7}  Status")
+    for s in summaries:
+        status = f"error: {s['error']}" if s['error'] else "ok"
+        print(f"{os.path.basename(s['gnucash_file']):40} {s['loaded']:>7} {s['already_loaded']:>7} {s['updated']:>7} {s['cached']:>7} "
+              f"{s['duplicates']:>5} {s['conflicts']:>7} {s['quarantined']:>5} {s['failed']:>7} "
+              f"{s['seconds']:>7.1f}  {status}")
+    failed_books = sum(1 for s in summaries if s['error'])
+    print(f"\n{len(summaries)} book(s), {sum(s['loaded'] for s in summaries)} statement(s) loaded, {failed_books} failed "
+          f"(per-book logs: <gnucash_file>.log)")
+    if args.metrics_file:
+        write_metrics(args.metrics_file, [({'book': os.path.relpath(s['gnucash_file'], base_dir)}, s['metrics'])
+                                          for s in summaries])
+    return summaries
+
+def iter_statement_rows(manifest, engine, cache, pool, window=8):
+    """
+    Yield the rows of each manifest entry in order, extracting only when needed.
+
+    Rows come from the extraction cache, from a JSON file at least as new as
+    the source file, or are extracted in the pool. At most window statements are in
+    flight or held at once, so any number of statements streams through in
+    bounded memory.
+
+    Args:
+        manifest: Entries from build_manifest()
+        engine: Name of the extraction engine in ENGINES
+        cache: Optional ExtractionCache, read and filled
+        pool: WorkerPool running parse_input
+        window: Number of statements read ahead of the one yielded
+
+    Yields:
+        Tuple of (entry, rows or None, error or None)
+    """
+    def source(entry):
+        rows = cache.get(entry, engine) if cache else None
+        if rows is None and os.path.exists(entry['json']) and \
+                os.path.getmtime(entry['json']) >= os.path.getmtime(entry['source']):
+            with open(entry['json'], "r") as f:
+                rows = json.load(f)
+        return rows if rows is not None else pool.submit(entry['source'], engine, 1, entry['fallbacks'])
+
+    def resolve(entry, source):
+        if not isinstance(source, concurrent.futures.Future):
+            return entry, source, None
+        try:
+            rows = source.result()
+        except Exception as e:
+            return entry, None, str(e)
+        if cache:
+            cache.put(entry, engine, rows)
+        return entry, rows, None
+
+    pending = deque()
+    for entry in manifest:
+        pending.append((entry, source(entry)))
+        if len(pending) > window:
+            yield resolve(*pending.popleft())
+    while pending:
+        yield resolve(*pending.popleft())
+
+def preflight(directory, skip=None, engine='pdfplumber', cache_dir=None, jobs=1, timeout=120,
+              max_rss_mb=1024, max_tasks_per_worker=25):
+    """
+    Find the descriptors of a statement directory that no account resolves.
+
+    Rows come from the extraction cache, from JSON files already extracted
+    to <directory>/json, or are extracted in a WorkerPool; no book is opened.
+
+    Args:
+        directory: Directory containing statement PDFs and errata JSON files
+        skip: Optional list of patterns; files containing any of them are skipped
+        engine: Name of the extraction engine in ENGINES
+        cache_dir: Optional ExtractionCache directory, read and filled
+        jobs, timeout, max_rss_mb, max_tasks_per_worker: WorkerPool settings
+
+    Returns:
+        Tuple of (unknown, failed, checked): unknown maps each descriptor to
+        {'count', 'files', 'first'}, failed is a list of (entry, error) pairs
+        and checked is the number of statements scanned
+    """
+    manifest, _, _ = dedupe_manifest(build_manifest(directory, os.path.join(directory, 'json'), skip))
+    cache = ExtractionCache(cache_dir) if cache_dir else None
+
+    unknown = {}
+    failed = []
+    checked = 0
+    with WorkerPool(parse_input, workers=jobs, timeout=timeout, max_rss_mb=max_rss_mb,
+                    max_tasks_per_worker=max_tasks_per_worker) as pool:
+        for entry, rows, error in iter_statement_rows(manifest, engine, cache, pool, window=2 * max(1, jobs)):
+            if error:
+                failed.append((entry, error))
+                continue
+
+            errata_items = load_errata(entry['errata']) if entry['errata'] else []
+            seen = set()
+            for item in statement_items(rows, errata_items):
+                desc = item['desc']
+                if item_properties(item) is not None:
+                    continue
+                record = unknown.setdefault(desc, {'count': 0, 'files': 0, 'first': entry['name']})
+                record['count'] += 1
+                if desc not in seen:
+                    record['files'] += 1
+                    seen.add(desc)
+            checked += 1
+
+    return unknown, failed, checked
+
+def preflight_main(argv):
+    """Print one table of unknown descriptors across a statement directory"""
+    parser = argparse.ArgumentParser(prog='load.py preflight',
+                                     description='List statement descriptors that no account is mapped to, without loading')
+    parser.add_argument('path', help='Directory containing statement PDFs or exports')
+    parser.add_argument('--skip', action='append', help='Skip files matching this pattern (can be used multiple times)')
+    parser.add_argument('--jobs', '-j', type=int, default=min(4, os.cpu_count() or 1), help='Number of extraction worker processes')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds allowed to extract a single PDF')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='pdfplumber', help='PDF extraction engine (default: pdfplumber)')
+    parser.add_argument('--cache-dir', help='Directory for the content-addressed extraction cache (default: no cache)')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.path):
+        print(f"Error: {args.path} is not a directory")
+        return
+
+    unknown, failed, checked = preflight(args.path, skip=args.skip, engine=args.engine, cache_dir=args.cache_dir,
+                                         jobs=args.jobs, timeout=args.timeout)
+
+    if unknown:
+        print(f"\n{'Descriptor':40} {'Count':>6} {'Files':>6}  First seen in")
+        for desc, record in sorted(unknown.items(), key=lambda kv: (-kv[1]['count'], kv[0])):
+            print(f"{desc:40} {record['count']:>6} {record['files']:>6}  {record['first']}")
+    for entry, error in failed:
+        print(f"Could not extract {entry['name']}: {error}")
+    print(f"\n{checked} statement(s) checked, {len(unknown)} unknown descriptor(s), {len(failed)} unreadable")
+    return unknown
+
+class ColumnarWriter:
+    """
+    Columnar line-item table written as a typed CSV and a NumPy .npz.
+
+    Rows are buffered one chunk at a time. Each full chunk is appended to the
+    CSV and to one raw spill file per .npz column. Closing the writer copies
+    the spill files into the .npz members block by block, so memory does not
+    grow with the number of rows. Only the descriptor and account
+    dictionaries are kept in memory.
+
+    The .npz holds:
+    - date: datetime64[D]; NaT for undated statements
+    - desc and account: int32 codes into the descriptors and accounts arrays
+    - cur and ytd: int64 cents; MISSING_CENTS where the statement has no value
+    """
+
+    MISSING_CENTS = np.iinfo(np.int64).min
+    CSV_HEADER = ['date', 'desc', 'account', 'cur', 'ytd']
+    DTYPES = {
+        'date': np.dtype('datetime64[D]'),
+        'desc': np.dtype(np.int32),
+        'account': np.dtype(np.int32),
+        'cur': np.dtype(np.int64),
+        'ytd': np.dtype(np.int64),
+    }
+
+    def __init__(self, prefix, chunk_rows=65536):
+        self.csv_path = prefix + ".csv"
+        self.npz_path = prefix + ".npz"
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._codes = {'desc': {}, 'account': {}}
+        self._chunk = []
+        self._spills = {name: tempfile.TemporaryFile() for name in self.DTYPES}
+        self._csv_file = open(self.csv_path, "w", newline="")
+        self._csv = csv.writer(self._csv_file)
+        self._csv.writerow(self.CSV_HEADER)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def _code(self, column, value):
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    def append(self, date, desc, account, cur, ytd):
+        """
+        Add one line item.
+
+        Args:
+            date: Pay date, or None
+            desc: Statement descriptor
+            account: Resolved account path ('' if none)
+            cur, ytd: Amounts in cents, or None
+        """
+        self._chunk.append((date, desc, account, cur, ytd))
+        if len(self._chunk) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered chunk to the CSV and the spill files"""
+        if not self._chunk:
+            return
+        for date, desc, account, cur, ytd in self._chunk:
+            self._csv.writerow([date.isoformat() if date else '', desc, account,
+                                '' if cur is None else str(cents_to_decimal(cur)),
+                                '' if ytd is None else str(cents_to_decimal(ytd))])
+
+        dates, descs, accounts, curs, ytds = zip(*self._chunk)
+        columns = {
+            'date': [date if date else 'NaT' for date in dates],
+            'desc': [self._code('desc', desc) for desc in descs],
+            'account': [self._code('account', account) for account in accounts],
+            'cur': [self.MISSING_CENTS if cur is None else cur for cur in curs],
+            'ytd': [self.MISSING_CENTS if ytd is None else ytd for ytd in ytds],
+        }
+        for name, values in columns.items():
+            self._spills[name].write(np.asarray(values, dtype=self.DTYPES[name]).tobytes())
+        self.rows += len(self._chunk)
+        self._chunk = []
+
+    def close(self):
+        """Flush the last chunk, finish the CSV and assemble the .npz"""
+        self.flush()
+        self._csv_file.close()
+
+        tmp_path = f"{self.npz_path}.{os.getpid()}.tmp"
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED, allowZip64=True) as npz:
+            for name, dtype in self.DTYPES.items():
+                spill = self._spills[name]
+                spill.seek(0)
+                with npz.open(name + ".npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array_header_1_0(member, {
+                        'descr': np.lib.format.dtype_to_descr(dtype),
+                        'fortran_order': False,
+                        'shape': (self.rows,),
+                    })
+                    shutil.copyfileobj(spill, member)
+                spill.close()
+            for column, name in (('desc', 'descriptors'), ('account', 'accounts')):
+                with npz.open(name + ".npy", "w") as member:
+                    np.lib.format.write_array(member, np.array(list(self._codes[column]), dtype=str))
+        os.replace(tmp_path, self.npz_path)
+
+    def discard(self):
+        """Abandon the export, removing the partial CSV"""
+        self._csv_file.close()
+        for spill in self._spills.values():
+            spill.close()
+        os.remove(self.csv_path)
+
+def export_statements(directory, prefix, skip=None, engine='pdfplumber', cache_dir=None, jobs=1, timeout=120,
+                      chunk_rows=65536):
+    """
+    Export every line item of a statement directory as a columnar table.
+
+    Statements stream through extraction (cached or in a WorkerPool) and
+    account resolution one at a time, in pay date order. No book is needed.
+
+    Args:
+        directory: Directory containing statement PDFs and errata JSON files
+        prefix: Output path without extension; <prefix>.csv and <prefix>.npz are written
+        skip: Optional list of patterns; files containing any of them are skipped
+        engine: Name of the extraction engine in ENGINES
+        cache_dir: Optional ExtractionCache directory, read and filled
+        jobs, timeout: WorkerPool settings
+        chunk_rows: Rows buffered before a chunk is written
+
+    Returns:
+        Tuple of (rows written, statements exported, failed (entry, error) pairs)
+    """
+    manifest, _, _ = dedupe_manifest(build_manifest(directory, os.path.join(directory, 'json'), skip))
+    cache = ExtractionCache(cache_dir) if cache_dir else None
+
+    failed = []
+    exported = 0
+    with WorkerPool(parse_input, workers=jobs, timeout=timeout) as pool, \
+            ColumnarWriter(prefix, chunk_rows) as writer:
+        for entry, rows, error in iter_statement_rows(manifest, engine, cache, pool, window=2 * max(1, jobs)):
+            if error:
+                failed.append((entry, error))
+                continue
+            errata_items = load_errata(entry['errata']) if entry['errata'] else []
+            for item in statement_items(rows, errata_items):
+                if item['cents'] is None:
+                    continue
+                properties = item_properties(item) or {}
+                writer.append(entry['date'], item['desc'], properties.get('account', ''),
+                              item['cents'], item['ytd_cents'])
+            exported += 1
+
+    return writer.rows, exported, failed
+
+def export_main(argv):
+    """Export the line items of a statement directory to <output>.csv and <output>.npz"""
+    parser = argparse.ArgumentParser(prog='load.py export',
+                                     description='Export all statement line items as a typed CSV and a NumPy .npz')
+    parser.add_argument('path', help='Directory containing statement PDFs or exports')
+    parser.add_argument('output', help='Output path without extension (writes <output>.csv and <output>.npz)')
+    parser.add_argument('--skip', action='append', help='Skip files matching this pattern (can be used multiple times)')
+    parser.add_argument('--jobs', '-j', type=int, default=min(4, os.cpu_count() or 1), help='Number of extraction worker processes')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds allowed to extract a single PDF')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='pdfplumber', help='PDF extraction engine (default: pdfplumber)')
+    parser.add_argument('--cache-dir', help='Directory for the content-addressed extraction cache (default: no cache)')
+    parser.add_argument('--chunk-rows', type=int, default=65536, help='Rows buffered in memory before a chunk is written')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.path):
+        print(f"Error: {args.path} is not a directory")
+        return
+
+    rows, exported, failed = export_statements(args.path, args.output, skip=args.skip, engine=args.engine,
+                                               cache_dir=args.cache_dir, jobs=args.jobs, timeout=args.timeout,
+                                               chunk_rows=args.chunk_rows)
+    for entry, error in failed:
+        print(f"Could not extract {entry['name']}: {error}")
+    print(f"{rows} line item(s) from {exported} statement(s) written to {args.output}.csv and {args.output}.npz"
+          f", {len(failed)} unreadable")
+    return rows
+
+# Audit: previous statements a line item is compared with, and the modified
+# z-score (deviation from their median in MADs) above which it is flagged
+AUDIT_WINDOW = 8
+AUDIT_THRESHOLD = 3.5
+AUDIT_MIN_HISTORY = 4
+# Deviations within this many cents, or this fraction of the median, are never
+# flagged; fixed deductions have a MAD of zero
+AUDIT_FLOOR_CENTS = 100
+AUDIT_FLOOR_RELATIVE = 0.01
+
+def read_line_items(npz_path):
+    """Read the columns of an export .npz (see ColumnarWriter) into memory"""
+    with np.load(npz_path) as npz:
+        return {name: npz[name] for name in npz.files}
+
+def window_median(values, count):
+    """
+    Median over the last axis, ignoring NaN, of values with `count` non-NaN entries each.
+
+    Sorting puts NaN last, so the median is taken from the first `count`
+    entries; rows without values give NaN. Much faster than np.nanmedian for
+    short windows.
+    """
+    ordered = np.sort(values, axis=-1)
+    low = np.take_along_axis(ordered, np.maximum(count - 1, 0)[..., None] // 2, axis=-1)[..., 0]
+    high = np.take_along_axis(ordered, (count // 2)[..., None], axis=-1)[..., 0]
+    return np.where(count > 0, (low + high) / 2, np.nan)
+
+def score_series(source, statement, key, cents, statement_counts, window=AUDIT_WINDOW,
+                 threshold=AUDIT_THRESHOLD, min_history=AUDIT_MIN_HISTORY, chunk_cells=1 << 22):
+    """
+    Score line-item series against the rolling median of their previous statements.
+
+    Items are summed into a grid of series (source, key) by statement. Each
+    cell is compared with the median and the median absolute deviation of
+    the previous `window` statements of its series that have the item, all
+    series of a chunk at once. A recurring item that is missing from a
+    statement (present in all of the window) is flagged as well.
+
+    Args:
+        source: Source (employee) of each item
+        statement: Position of each item's statement among its source's statements
+        key: Descriptor or account code of each item; negative codes are ignored
+        cents: Amount of each item
+        statement_counts: Number of statements of each source
+        window, threshold, min_history: Rolling window, flag threshold and
+            the number of previous values needed to score a cell
+
+    Returns:
+        Dict of arrays over the flagged cells: source, key, statement, cents
+        (NaN if missing), median and score (NaN if missing)
+    """
+    keep = key >= 0
+    n_keys = int(key.max()) + 1 if keep.any() else 1
+    # Number the (source, key) pairs that occur without sorting the items
+    pair = source[keep].astype(np.int64) * n_keys + key[keep]
+    occurs = np.bincount(pair, minlength=len(statement_counts) * n_keys) > 0
+    series = np.flatnonzero(occurs)
+    series_index = (np.cumsum(occurs) - 1)[pair]
+    n_series, n_cols = len(series), int(statement_counts.max()) if len(statement_counts) else 0
+    cell = series_index * n_cols + statement[keep]
+    present = np.bincount(cell, minlength=n_series * n_cols).reshape(n_series, n_cols) > 0
+    sums = np.bincount(cell, weights=cents[keep], minlength=n_series * n_cols).reshape(n_series, n_cols)
+    grid = np.where(present, sums, np.nan)
+    series_source = series // n_keys
+    is_statement = np.arange(n_cols)[None, :] < statement_counts[series_source][:, None]
+
+    # windows[s, p] holds grid[s, p - window:p], NaN-padded before the first statement
+    padded = np.concatenate([np.full((n_series, window), np.nan), grid], axis=1)
+    windows = sliding_window_view(padded, window, axis=1)[:, :n_cols]
+
+    flagged = {name: [] for name in ('series', 'statement', 'cents', 'median', 'score')}
+    step = max(1, chunk_cells // max(1, n_cols * window))
+    for start in range(0, n_series, step):
+        rows = slice(start, start + step)
+        history = windows[rows]
+        count = np.count_nonzero(~np.isnan(history), axis=-1)
+        median = window_median(history, count)
+        mad = window_median(np.abs(history - median[..., None]), count)
+        scale = np.maximum(1.4826 * mad, np.maximum(np.abs(median) * AUDIT_FLOOR_RELATIVE, AUDIT_FLOOR_CENTS))
+        values = grid[rows]
+        score = (values - median) / scale
+        outlier = ~np.isnan(values) & (count >= min_history) & (np.abs(score) > threshold)
+        missing = is_statement[rows] & np.isnan(values) & (count == window)
+        s, p = np.nonzero(outlier | missing)
+        flagged['series'].append(s + start)
+        flagged['statement'].append(p)
+        flagged['cents'].append(values[s, p])
+        flagged['median'].append(median[s, p])
+        flagged['score'].append(score[s, p])
+
+    result = {name: np.concatenate(parts) if parts else np.empty(0) for name, parts in flagged.items()}
+    found = result.pop('series').astype(np.int64)
+    result['source'] = series_source[found]
+    result['key'] = series[found] % n_keys
+    result['statement'] = result['statement'].astype(np.int64)
+    return result
+
+def audit_line_items(sources, window=AUDIT_WINDOW, threshold=AUDIT_THRESHOLD, min_history=AUDIT_MIN_HISTORY):
+    """
+    Flag unusual line items by descriptor and by account across sources.
+
+    Args:
+        sources: List of (name, columns as read by read_line_items()), e.g. one per employee
+        window, threshold, min_history: Passed on to score_series()
+
+    Returns:
+        List of findings {source, date, level ('descriptor' or 'account'),
+        name, cents (None if missing), median, score (None if missing)},
+        ordered by source, pay date, level and name
+    """
+    if not sources:
+        return []
+    # Codes are per export; map them into vocabularies shared by all sources
+    vocabularies = {
+        level: np.unique(np.concatenate([columns[names] for _, columns in sources]))
+        for level, names in (('desc', 'descriptors'), ('account', 'accounts'))
+    }
+    # Statements are the distinct pay dates of a source, numbered in date order
+    source, position, keys, cents, statement_dates = [], [], {'desc': [], 'account': []}, [], []
+    for i, (_, columns) in enumerate(sources):
+        # Undated statements cannot be placed in a history
+        dated = ~np.isnat(columns['date']) & (columns['cur'] != ColumnarWriter.MISSING_CENTS)
+        dates, index = np.unique(columns['date'][dated], return_inverse=True)
+        statement_dates.append(dates)
+        source.append(np.full(len(index), i))
+        position.append(index)
+        for level, names in (('desc', 'descriptors'), ('account', 'accounts')):
+            codes = np.searchsorted(vocabularies[level], columns[names])
+            keys[level].append(codes[columns[level][dated]])
+        cents.append(columns['cur'][dated])
+    statement_counts = np.array([len(dates) for dates in statement_dates])
+    first_statement = np.concatenate([[0], np.cumsum(statement_counts)[:-1]])
+    statement_dates = np.concatenate(statement_dates)
+    source, position, cents = np.concatenate(source), np.concatenate(position), np.concatenate(cents).astype(np.float64)
+
+    findings = []
+    for level, label in (('desc', 'descriptor'), ('account', 'account')):
+        key = np.concatenate(keys[level])
+        if level == 'account':
+            # Items without a resolved account only have a descriptor series
+            blank = np.searchsorted(vocabularies['account'], '')
+            if blank < len(vocabularies['account']) and vocabularies['account'][blank] == '':
+                key = np.where(key == blank, -1, key)
+        flagged = score_series(source, position, key, cents, statement_counts, window, threshold, min_history)
+        dates = statement_dates[first_statement[flagged['source']] + flagged['statement']]
+        for s, k, d, c, m, z in zip(flagged['source'], flagged['key'], dates,
+                                    flagged['cents'], flagged['median'], flagged['score']):
+            findings.append({
+                'source': sources[s][0],
+                'date': d.item(),
+                'level': label,
+                'name': str(vocabularies[level][k]),
+                'cents': None if np.isnan(c) else int(c),
+                'median': int(round(m)),
+                'score': None if np.isnan(z) else round(float(z), 1),
+            })
+    findings.sort(key=lambda f: (f['source'], f['date'], f['level'], f['name']))
+    return findings
+
+def audit_main(argv):
+    """Flag unusual line items across the paycheck history of one or more employees"""
+    parser = argparse.ArgumentParser(prog='load.py audit',
+                                     description='Flag line items that deviate from their recent history')
+    parser.add_argument('paths', nargs='+', help='Statement directories or exported .npz files, e.g. one per employee')
+    parser.add_argument('--window', type=int, default=AUDIT_WINDOW, help=f'Previous statements compared with (default: {AUDIT_WINDOW})')
+    parser.add_argument('--threshold', type=float, default=AUDIT_THRESHOLD, help=f'Flag above this modified z-score (default: {AUDIT_THRESHOLD})')
+    parser.add_argument('--min-history', type=int, default=AUDIT_MIN_HISTORY, help=f'Previous values needed to score an item (default: {AUDIT_MIN_HISTORY})')
+    parser.add_argument('--skip', action='append', help='Skip files matching this pattern (can be used multiple times)')
+    parser.add_argument('--jobs', '-j', type=int, default=min(4, os.cpu_count() or 1), help='Number of extraction worker processes')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds allowed to extract a single PDF')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='pdfplumber', help='PDF extraction engine (default: pdfplumber)')
+    parser.add_argument('--cache-dir', help='Directory for the content-addressed extraction cache (default: no cache)')
+    args = parser.parse_args(argv)
+
+    sources = []
+    with tempfile.TemporaryDirectory(prefix='pypay-audit-') as tmpdir:
+        for i, path in enumerate(args.paths):
+            name = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+            if os.path.isdir(path):
+                prefix = os.path.join(tmpdir, str(i))
+                rows, exported, failed = export_statements(path, prefix, skip=args.skip, engine=args.engine,
+                                                           cache_dir=args.cache_dir, jobs=args.jobs,
+                                                           timeout=args.timeout)
+                for entry, error in failed:
+                    print(f"Could not extract {entry['name']}: {error}")
+                sources.append((name, read_line_items(prefix + ".npz")))
+            elif path.endswith(".npz"):
+                sources.append((name, read_line_items(path)))
+            else:
+                print(f"Error: {path} is not a directory or an exported .npz file")
+                return
+
+    findings = audit_line_items(sources, args.window, args.threshold, args.min_history)
+    print(f"{'Source':16} {'Pay date':10} {'Level':10} {'Name':40} {'Amount':>12} {'Median':>12} {'Score':>8}")
+    for f in findings:
+        amount = '-' if f['cents'] is None else f"{cents_to_decimal(f['cents']):,}"
+        score = 'missing' if f['score'] is None else f"{f['score']:+.1f}"
+        print(f"{f['source']:16} {f['date'].isoformat():10} {f['level']:10} {f['name'][:40]:40} {amount:>12} "
+              f"{cents_to_decimal(f['median']):>12,} {score:>8}")
+    print(f"\n{len(findings)} finding(s) in {len(sources)} source(s)")
+    return findings
+
+def parse_rate(text):
+    """Parse a SUBJECT=RATE argument into (subject, Decimal rate)"""
+    subject, sep, rate = text.partition('=')
+    try:
+        value = Decimal(rate.strip())
+    except ArithmeticError:
+        value = None
+    if not sep or not subject.strip() or value is None or not value.is_finite() or value < 0:
+        raise argparse.ArgumentTypeError(f"expected SUBJECT=RATE with a non-negative hourly rate, got {text!r}")
+    return subject.strip(), value
+
+def quota_main(argv):
+    """Print quota balance history, or the outstanding quota at a date"""
+    parser = argparse.ArgumentParser(prog='load.py quota',
+                                     description='Show PTO and floating-holiday quota recorded while loading a book')
+    parser.add_argument('gnucash_file', help='Path to GnuCash file')
+    parser.add_argument('--subject', action='append', help='Quota subject to show, e.g. PTO (default: all)')
+    parser.add_argument('--at', type=lambda text: datetime.strptime(text, "%Y-%m-%d").date(),
+                        help='Show the outstanding quota as of this date (YYYY-MM-DD) instead of the history')
+    parser.add_argument('--rate', action='append', default=[], type=parse_rate, metavar='SUBJECT=RATE',
+                        help='Hourly rate used to value a subject with --at (can be used multiple times)')
+    args = parser.parse_args(argv)
+
+    path = QuotaLedger.path_for(args.gnucash_file)
+    if not os.path.exists(path):
+        print(f"Error: no quota ledger for {args.gnucash_file} ({path}); it is written when statements are loaded")
+        return
+
+    with QuotaLedger(path) as ledger:
+        subjects = args.subject or ledger.subjects()
+        if args.at:
+            rates = dict(args.rate)
+            liability = ledger.liability_at(args.at, rates)
+            for subject in subjects:
+                unit = '' if subject in rates else ' h'
+                print(f"{subject:10} {liability.get(subject, '-')}{unit}")
+            return liability
+
+        history = {subject: ledger.history(subject) for subject in subjects}
+        for subject, entries in history.items():
+            print(f"\n{subject}")
+            print(f"  {'Pay date':10} {'Earned':>8} {'Used':>8} {'Balance':>8}")
+            for entry in entries:
+                print(f"  {entry['date'].isoformat():10} {entry['earned'] if entry['earned'] is not None else '-':>8} "
+                      f"{entry['used'] if entry['used'] is not None else '-':>8} {entry['balance']:>8}")
+        return history
+
+class BookWriter:
+    """
+    Single writer thread that owns an open GnuCash book and its quota ledger.
+
+    SQLAlchemy sessions and SQLite connections must not be shared between
+    threads, so both are opened, written and closed by this thread only;
+    other threads submit statements and wait on the returned future. A
+    statement already in the book (or in one of its archives) is not added
+    again. Errata files are not applied: the writer never sees the
+    statement's directory.
+    """
+
+    def __init__(self, gnucash_file):
+        self._queue = queue.Queue()
+        ready = concurrent.futures.Future()
+        self._thread = threading.Thread(target=self._run, args=(gnucash_file, ready), daemon=True)
+        self._thread.start()
+        ready.result()  # Raise here if the book cannot be opened
+
+    def submit(self, rows, date, name, digest=None):
+        """
+        Queue extracted rows for commit.
+
+        Returns:
+            Future resolving to (transaction guid or None, added); added is False
+            when a statement of that name was already loaded (its guid is returned)
+        """
+        future = concurrent.futures.Future()
+        self._queue.put((rows, date, name, digest, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self, gnucash_file, ready):
+        try:
+            sink = GnuCashSink.open(gnucash_file)
+        except Exception as e:
+            ready.set_exception(e)
+            return
+        try:
+            loaded = sink.loaded()
+            ledger = QuotaLedger(QuotaLedger.path_for(gnucash_file))
+        except Exception as e:
+            sink.close()
+            ready.set_exception(e)
+            return
+        ready.set_result(None)
+
+        try:
+            while True:
+                task = self._queue.get()
+                if task is None:
+                    break
+                rows, date, name, digest, future = task
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if name in loaded:
+                    future.set_result((loaded[name].guid, False))
+                    continue
+                try:
+                    transaction = sink.add(compute_splits(rows, sink.registry), date, name, digest)
+                    ledger.record(date, rows)
+                    sink.save()
+                    ledger.commit()
+                except Exception as e:
+                    sink.book.session.rollback()
+                    ledger.rollback()
+                    future.set_exception(e)
+                    continue
+                guid = transaction.guid if transaction else None
+                if guid:
+                    loaded[name] = LoadedStatement(guid, digest)
+                future.set_result((guid, True))
+        finally:
+            ledger.close()
+            sink.close()
+
+class IngestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    HTTP API of IngestServer.
+
+    POST /statements?name=<file name>[&commit=1] with the PDF as the body
+    returns the extracted rows and the proposed splits; with commit=1 the
+    statement is also written to the server's book and quota ledger (409 if
+    a statement of that name is already loaded; errata are not applied).
+    GET /health returns request counters.
+    """
+
+    def do_GET(self):
+        if urllib.parse.urlparse(self.path).path != '/health':
+            return self._reply(404, {'error': 'not found'})
+        self._reply(200, {'status': 'ok', 'stats': self.server.snapshot()})
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != '/statements':
+            return self._reply(404, {'error': 'not found'})
+        query = urllib.parse.parse_qs(url.query)
+        name = os.path.basename(query.get('name', [''])[0]) or 'statement.pdf'
+        commit = query.get('commit', ['0'])[0].lower() in ('1', 'true', 'yes')
+
+        try:
+            length = int(self.headers['Content-Length'])
+        except (TypeError, ValueError):
+            self.close_connection = True
+            return self._reply(411, {'error': 'Content-Length required'})
+        if length > self.server.max_bytes:
+            # Body is left unread, so the connection cannot be reused
+            self.close_connection = True
+            return self._reply(413, {'error': f"statement exceeds {self.server.max_bytes} bytes"})
+        if commit and self.server.writer is None:
+            return self._reply(400, {'error': 'server was started without --book'})
+
+        if not self.server.pending.acquire(blocking=False):
+            self.close_connection = True
+            return self._reply(503, {'error': 'too many pending statements, retry later'})
+        try:
+            status, result = self.server.ingest(name, self.rfile.read(length), commit)
+        finally:
+            self.server.pending.release()
+        self._reply(status, result)
+
+    def _reply(self, status, payload):
+        self.server.count(status)
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+class IngestServer(http.server.ThreadingHTTPServer):
+    """
+    Local HTTP service that parses statements in a warm WorkerPool.
+
+    Imports, worker start-up and (with gnucash_file) opening the book are paid
+    once when the server starts instead of once per statement. Each request
+    is bounded by max_bytes and by timeout, which covers both waiting for a
+    worker and the extraction itself; at most max_pending requests are
+    accepted at once and the rest are rejected with 503.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, jobs=1, engine='pdfplumber', max_bytes=10 * 1024 * 1024, timeout=30,
+                 max_pending=32, max_rss_mb=1024, max_tasks_per_worker=25, gnucash_file=None, quiet=False):
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.quiet = quiet
+        self.pending = threading.BoundedSemaphore(max(1, max_pending))
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        super().__init__(address, IngestHandler)
+        try:
+            self.writer = BookWriter(gnucash_file) if gnucash_file else None
+        except Exception:
+            self.socket.close()
+            raise
+        self.pool = WorkerPool(parse_file, workers=jobs, timeout=timeout, max_rss_mb=max_rss_mb,
+                               max_tasks_per_worker=max_tasks_per_worker, prestart=True)
+
+    def count(self, status):
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats[f'status_{status}'] += 1
+
+    def snapshot(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def ingest(self, name, body, commit):
+        """
+        Parse one statement and compute its splits.
+
+        Returns:
+            Tuple of (HTTP status, JSON payload)
+        """
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        date = parse_date_from_file_name(name)
+        if commit and date is None:
+            return 400, {'error': f"cannot commit {name}: no pay date in the name"}
+
+        # The worker reads from disk; keep the client's file name for format detection.
+        # A running extraction cannot be cancelled, so the file is removed only once
+        # the worker is done with it, also when the client already got a 504.
+        tmpdir = tempfile.mkdtemp(prefix='pypay-')
+        try:
+            file_path = os.path.join(tmpdir, name)
+            with open(file_path, "wb") as f:
+                f.write(body)
+            digest = statement_digest(file_path)
+            future = self.pool.submit(file_path, None, self.engine)
+        except Exception:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+        future.add_done_callback(lambda _: shutil.rmtree(tmpdir, ignore_errors=True))
+        try:
+            rows = future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return 504, {'error': f"extraction did not finish within {self.timeout}s"}
+        except Exception as e:
+            return 422, {'error': str(e)}
+
+        try:
+            splits = compute_splits(rows, PathRegistry())
+        except ValueError as e:
+            return 422, {'error': str(e), 'rows': rows}
+
+        transaction = None
+        if commit:
+            future = self.writer.submit(rows, date, name, digest)
+            try:
+                transaction, added = future.result(timeout=max(0, deadline - time.monotonic()))
+            except concurrent.futures.TimeoutError:
+                # Still committed eventually; the client has to check the book
+                return 504, {'error': f"commit did not finish within {self.timeout}s"}
+            except Exception as e:
+                return 422, {'error': str(e), 'rows': rows}
+            if not added:
+                return 409, {'error': f"{name} is already loaded", 'transaction': transaction}
+
+        return 200, {
+            'name': name,
+            'date': date.isoformat() if date else None,
+            'rows': rows,
+            'splits': [{'account': s.account, 'memo': s.memo, 'value': str(cents_to_decimal(s.value))}
+                       for s in splits],
+            'transaction': transaction,
+            'seconds': round(time.perf_counter() - start, 4),
+        }
+
+    def server_close(self):
+        super().server_close()
+        self.pool.close()
+        if self.writer:
+            self.writer.close()
+
+def restore_main(argv):
+    """Restore a book from a pre-load snapshot, or list its snapshots"""
+    parser = argparse.ArgumentParser(prog='load.py restore',
+                                     description='Restore a GnuCash book (and its quota ledger) from a pre-load snapshot')
+    parser.add_argument('gnucash_file', help='Path to GnuCash file')
+    parser.add_argument('snapshot', nargs='?', help='Snapshot name (default: the newest)')
+    parser.add_argument('--list', action='store_true', help='List the snapshots of the book instead')
+    parser.add_argument('--force', action='store_true', help='Restore even if the book is locked (only when GnuCash is not running)')
+    args = parser.parse_args(argv)
+
+    snapshots = BookSnapshots(args.gnucash_file)
+    if args.list:
+        for name in snapshots.list():
+            print(name)
+        return
+
+    if not os.path.exists(args.gnucash_file):
+        print(f"Error: GnuCash file {args.gnucash_file} does not exist")
+        return
+    if snapshots.locked() and not args.force:
+        print(f"Error: {args.gnucash_file} is open in GnuCash (or was not closed cleanly); use --force if it is not running")
+        return
+    try:
+        name = snapshots.restore(args.snapshot)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    print(f"Restored {args.gnucash_file} from snapshot {name}")
+    return name
+
+def archive_main(argv):
+    """Move the paychecks of closed years into per-year archive books"""
+    parser = argparse.ArgumentParser(prog='load.py archive',
+                                     description='Move paychecks of closed years into per-year archive books')
+    parser.add_argument('gnucash_file', help='Path to GnuCash file')
+    parser.add_argument('--before', type=int, default=date.today().year,
+                        help='Archive the years before this one (default: the current year)')
+    parser.add_argument('--no-snapshot', dest='snapshot', action='store_false', help='Do not snapshot the book before archiving')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.gnucash_file):
+        print(f"Error: GnuCash file {args.gnucash_file} does not exist")
+        return
+    if args.snapshot:
+        print(f"Snapshot of {args.gnucash_file} saved to {BookSnapshots(args.gnucash_file).take()}")
+
+    archive = BookArchive(args.gnucash_file)
+    moved = archive.archive(args.before)
+    for year, count in moved.items():
+        print(f"{year}: moved {count} paycheck(s) to {archive.path(year)}")
+    if not moved:
+        print(f"No paychecks before {args.before} left in {args.gnucash_file}")
+    return moved
+
+def report_main(argv):
+    """Print account totals over a date range, reading archive books where needed"""
+    parser = argparse.ArgumentParser(prog='load.py report',
+                                     description='Show account totals of a book and its per-year archives')
+    parser.add_argument('gnucash_file', help='Path to GnuCash file')
+    parse_date = lambda text: datetime.strptime(text, "%Y-%m-%d").date()
+    parser.add_argument('--from', dest='start', type=parse_date, help='First post date included (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end', type=parse_date, help='Last post date included (YYYY-MM-DD)')
+    parser.add_argument('--account', help='Only show accounts whose full name contains this text')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.gnucash_file):
+        print(f"Error: GnuCash file {args.gnucash_file} does not exist")
+        return
+
+    totals, books = BookArchive(args.gnucash_file).account_totals(args.start, args.end)
+    if args.account:
+        totals = Counter({account: cents for account, cents in totals.items() if args.account in account})
+    print(f"{'Account':50} {'Amount':>14}")
+    for account, cents in sorted(totals.items()):
+        print(f"{account:50} {cents_to_decimal(cents):>14,}")
+    print(f"\nRead {len(books)} book(s): {', '.join(os.path.basename(path) for path in books)}")
+    return totals
+
+def serve_main(argv):
+    """Run the HTTP ingestion service until interrupted"""
+    parser = argparse.ArgumentParser(prog='load.py serve',
+                                     description='Serve statement parsing over HTTP with warm extraction workers')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    parser.add_argument('--book', help='GnuCash file that commit=1 requests are written to')
+    parser.add_argument('--jobs', '-j', type=int, default=min(4, os.cpu_count() or 1), help='Number of extraction worker processes')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds allowed per request, including queueing')
+    parser.add_argument('--max-bytes', type=int, default=10 * 1024 * 1024, help='Largest statement accepted, in bytes')
+    parser.add_argument('--max-pending', type=int, default=32, help='Requests accepted at once before answering 503')
+    parser.add_argument('--max-rss', type=int, default=1024, help='Resident memory ceiling in MB for an extraction worker')
+    parser.add_argument('--max-tasks-per-worker', type=int, default=25, help='Recycle an extraction worker after this many PDFs')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='pdfplumber', help='PDF extraction engine (default: pdfplumber)')
+    parser.add_argument('--quiet', action='store_true', help='Do not log each request')
+    args = parser.parse_args(argv)
+
+    if args.book and not os.path.exists(args.book):
+        print(f"Error: GnuCash file {args.book} does not exist. Use --init to create it.")
+        return
+
+    server = IngestServer((args.host, args.port), jobs=args.jobs, engine=args.engine, max_bytes=args.max_bytes,
+                          timeout=args.timeout, max_pending=args.max_pending, max_rss_mb=args.max_rss,
+                          max_tasks_per_worker=args.max_tasks_per_worker, gnucash_file=args.book, quiet=args.quiet)
+    host, port = server.server_address[:2]
+    print(f"Listening on http://{host}:{port}/statements ({args.jobs} worker(s), engine {args.engine})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
     finally:
-        book.close()
+        server.server_close()
+
+# Subcommands dispatched by main() on the first argument
+COMMANDS = {
+    'archive': archive_main,
+    'audit': audit_main,
+    'batch': batch_main,
+    'export': export_main,
+    'preflight': preflight_main,
+    'quota': quota_main,
+    'report': report_main,
+    'restore': restore_main,
+    'serve': serve_main,
+}
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        return COMMANDS[sys.argv[1]](sys.argv[2:])
+
+    parser = argparse.ArgumentParser(description='Process payroll PDFs and load into GnuCash')
+
+    # Main arguments
+    parser.add_argument('gnucash_file', help='Path to GnuCash file, or to a plain-text ledger (.ledger, .journal, .hledger)')
+    parser.add_argument('path', nargs='?', help='Path to a statement (PDF, CSV or HTML export) or JSON file, or a directory of them')
+
+    # Flags
+    parser.add_argument('--init', action='store_true', help='Create/recreate GnuCash file with accounts before loading')
+    parser.add_argument('--force', '-f', action='store_true', help='[Deprecated] Force operations without confirmation')
+    parser.add_argument('--output-dir', '-o', help='Output directory for preprocessed JSON files (default: <input_dir>/json)')
+    add_load_arguments(parser)
+
+    args = parser.parse_args()
+
+    # Validate path argument for load operations
+    if not args.path:
+        print("Error: path argument is required")
+        parser.print_help()
+        return
+
+    # Handle --init flag: recreate GnuCash file before load
+    if args.init:
+        if os.path.exists(args.gnucash_file):
+            response = input(f"File {args.gnucash_file} already exists. Overwrite? (yes/no): ")
+            if response.lower() != 'yes':
+                print("Aborted.")
+                return
+        print(f"Creating {args.gnucash_file}")
+        sink_class(args.gnucash_file).create(args.gnucash_file)
+    elif not os.path.exists(args.gnucash_file):
+        print(f"Error: GnuCash file {args.gnucash_file} does not exist. Use --init to create it.")
+        return
+
+    load_book(args)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Load test for the pypay HTTP ingestion service (load.py serve).
+
+Posts statement PDFs to a running server from several concurrent clients and
+reports throughput, latency percentiles and the status codes returned.
+
+Usage:
+    python load.py serve --quiet &
+    python loadtest.py path/to/statements --requests 200 --concurrency 8
+"""
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from collections import Counter
+
+
+def post_statement(url, name, body, timeout):
+    """POST one statement and return (HTTP status, seconds)"""
+    request = urllib.request.Request(f"{url}/statements?name={urllib.parse.quote(name)}", data=body,
+                                     headers={'Content-Type': 'application/pdf'}, method='POST')
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(url, statements, requests, concurrency, timeout):
+    """
+    Drive the server with concurrent clients.
+
+    Args:
+        url: Base URL of the server
+        statements: List of (file name, PDF bytes), posted round-robin
+        requests: Total number of requests
+        concurrency: Number of concurrent clients
+        timeout: Client timeout per request in seconds
+
+    Returns:
+        Dictionary with request count, throughput, latency percentiles and status counts
+    """
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(post_statement, url, *statements[i % len(statements)], timeout)
+                   for i in range(requests)]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(seconds for status, seconds in results if status == 200)
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50': round(percentile(latencies, 0.50), 4),
+        'p95': round(percentile(latencies, 0.95), 4),
+        'p99': round(percentile(latencies, 0.99), 4),
+        'status': dict(Counter(str(status) for status, seconds in results)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the pypay HTTP ingestion service')
+    parser.add_argument('path', help='Statement PDF or directory of statement PDFs to post')
+    parser.add_argument('--url', default='http://127.0.0.1:8765', help='Server URL (default: http://127.0.0.1:8765)')
+    parser.add_argument('--requests', '-n', type=int, default=100, help='Total number of requests')
+    parser.add_argument('--concurrency', '-c', type=int, default=4, help='Number of concurrent clients')
+    parser.add_argument('--timeout', type=float, default=60, help='Client timeout per request in seconds')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.path, '*.pdf'))) if os.path.isdir(args.path) else [args.path]
+    if not paths:
+        print(f"Error: no PDF files in {args.path}")
+        sys.exit(1)
+    statements = []
+    for path in paths:
+        with open(path, "rb") as f:
+            statements.append((os.path.basename(path), f.read()))
+
+    result = run(args.url.rstrip('/'), statements, args.requests, args.concurrency, args.timeout)
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if set(result['status']) == {'200'} else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,10 +16,91 @@ from decimal import Decimal
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(__file__))
-from load import process, create_gnucash_accounts
+from load import process, create_gnucash_accounts, build_manifest, dedupe_manifest
 from load import AccountRegistry
 
 
+# Word layout of a synthetic one-page statement: (x0, top, text). Its benefit
+# line is SPST, which ACCOUNTS maps, so the statement also loads into a book
+STATEMENT_WORDS = [
+    (20, 100, 'Earnings'), (100, 100, 'Rate'), (200, 100, 'Amount'), (260, 100, 'Year-To-Date'),
+    (360, 100, 'Other'), (385, 100, 'Benefits'),
+    (20, 115, 'Regular Salary'), (200, 115, '5,000.00'), (265, 115, '10,000.00'),
+    (360, 115, 'SPST'), (440, 115, '12.00'), (500, 115, '24.00'),
+    (20, 130, 'Tax Deductions: Federal'), (205, 130, '900.00-'), (265, 130, '1,800.00-'),
+    (360, 130, 'Quota'), (390, 130, 'Summary'),
+    (360, 145, 'PTO'), (440, 145, '6.67'), (490, 145, '8.00'), (525, 145, '40.00'),
+    (20, 160, 'Total Net Pay'), (200, 160, '4,100.00'), (265, 160, '8,200.00'),
+    (20, 200, 'Deposited to the account ending in 1234'),
+]
+
+# Statement whose Federal tax row continues as "Withholding Tax" on page 2
+MULTIPAGE_STATEMENT = [
+    STATEMENT_WORDS[:12] + [(20, 130, 'Tax Deductions: Federal')],
+    [
+        (20, 100, 'Withholding Tax'), (205, 100, '900.00-'), (265, 100, '1,800.00-'),
+        (20, 115, 'Total Net Pay'), (200, 115, '4,100.00'), (265, 115, '8,200.00'),
+        (20, 150, 'Deposited to the account ending in 1234'),
+    ],
+    [(20, 100, 'Important notice about your pay 1.00')],
+]
+
+# Older table-only layout: no Amount/Year-To-Date headers, cells ruled by lines
+TABLE_STATEMENT_STREAM = (
+    b"BT /F1 8 Tf 20 684 Td (Earnings Rate Hours/Units) Tj ET\n"
+    b"BT /F1 8 Tf 20 669 Td (Regular Salary 5,000.00 10,000.00) Tj ET\n"
+    b"BT /F1 8 Tf 20 654 Td (Tax Deductions: Federal 900.00- 1,800.00-) Tj ET\n"
+    b"BT /F1 8 Tf 20 639 Td (Total Net Pay 4,100.00 8,200.00) Tj ET\n"
+    b"20 630 m 20 700 l S 172 630 m 172 700 l S"
+)
+
+
+def text_stream(words, height=792):
+    """Build a page content stream that draws (x0, top, text) words"""
+    ops = []
+    for x, top, text in words:
+        text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        ops.append(f"BT /F1 8 Tf {x} {height - top - 8} Td ({text}) Tj ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def write_pdf(path, pages, height=792):
+    """
+    Write a minimal PDF with Helvetica text at absolute positions.
+
+    Args:
+        path: Output file path
+        pages: List of pages; each page is a list of (x0, top, text) words
+            or raw content stream bytes
+        height: Page height in points
+    """
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>", b""]
+    page_ids = []
+    for words in pages:
+        stream = words if isinstance(words, bytes) else text_stream(words, height)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 %d] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 1 0 R >> >> >>" % (height, len(objects)))
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, len(objects), xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
 def test_single_transaction_per_paycheck():
     """Test that exactly one transaction is created per paycheck"""
     with tempfile.NamedTemporaryFile(suffix='.gnucash', delete=False) as tmp:
@@ -283,7 +364,1127 @@ def test_errata_file_processing():
             shutil.rmtree(tmpdir)
 
 
+def test_amount_cents():
+    """Test that amounts are tokenized into exact integer cents and balances are checked on them"""
+    from load import amount_cents, add_transaction, PendingSplit
+
+    assert amount_cents('1,234.56') == 123456
+    assert amount_cents('900.00-') == -90000
+    assert amount_cents('-12.5') == -1250
+    assert amount_cents('0.125') == 12 and amount_cents('0.135') == 14, "Sub-cent digits round half to even"
+    assert [amount_cents(text) for text in (None, '', 'abc', '-5-', '.')] == [None] * 5
+    # Float arithmetic would leave 0.1 + 0.2 - 0.3 unbalanced
+    assert amount_cents('0.10') + amount_cents('0.20') - amount_cents('0.30') == 0
+
+    splits = [PendingSplit('Income:Taxable:Regular', 'Salary', -500000),
+              PendingSplit('Assets:Bank:Checking', 'Net Pay', 499999)]
+    try:
+        add_transaction(None, splits, None)
+        assert False, "Unbalanced splits were accepted"
+    except ValueError as e:
+        assert 'off by -0.01' in str(e), str(e)
+
+    print("✓ test_amount_cents PASSED")
+
+
+def test_typed_statement_format(tmp_path):
+    """Test that a typed statement loads exactly like the rows it was built from"""
+    import json
+    from datetime import date
+    from load import extract, read_statement, compute_splits, PathRegistry, QuotaLedger, STATEMENT_VERSION
+
+    tmpdir = str(tmp_path)
+    pdf_file = os.path.join(tmpdir, 'Statement for Jan 08, 2021.pdf')
+    write_pdf(pdf_file, [STATEMENT_WORDS])
+    with open(extract(pdf_file)) as f:
+        rows = json.load(f)
+    os.makedirs(os.path.join(tmpdir, 'typed'))
+    typed_file = extract(pdf_file, output_dir=os.path.join(tmpdir, 'typed'), typed=True)
+    with open(typed_file) as f:
+        record = json.load(f)
+
+    assert (record['format'], record['version'], record['date']) == ('pypay-statement', STATEMENT_VERSION, '2021-01-08')
+    assert {'desc': 'Regular Salary', 'key': 'Regular Salary', 'cents': 500000, 'ytd_cents': 1000000} in record['items']
+    pto = next(item for item in record['items'] if item['desc'] == 'PTO')
+    assert (pto['earned'], pto['used'], pto['balance']) == (667, 800, 4000), pto
+
+    data, pay_date, _ = read_statement(typed_file)
+    assert pay_date == date(2021, 1, 8)
+    assert compute_splits(data, PathRegistry()) == compute_splits(rows, PathRegistry())
+
+    # Items written under another account mapping are resolved again by descriptor
+    record['accounts'] = 'older mapping'
+    for item in record['items']:
+        item.pop('pattern', None)
+        item['key'] = 'No longer mapped'
+    assert compute_splits(record, PathRegistry()) == compute_splits(rows, PathRegistry())
+
+    with QuotaLedger(os.path.join(tmpdir, 'quota.sqlite')) as ledger:
+        assert ledger.record(pay_date, data) == 1
+        assert ledger.balance_at('PTO', pay_date) == Decimal('40.00')
+
+    record['version'] = STATEMENT_VERSION + 1
+    with open(typed_file, 'w') as f:
+        json.dump(record, f)
+    try:
+        read_statement(typed_file)
+        assert False, "Newer format version was accepted"
+    except ValueError as e:
+        assert 'version' in str(e)
+
+    print("✓ test_typed_statement_format PASSED")
+
+
+def test_manifest_orders_by_pay_date(tmp_path):
+    """Test that the directory manifest is ordered by pay date and pairs errata"""
+    tmpdir = str(tmp_path)
+    for name in ['Statement for Apr 16, 2021.pdf', 'Statement for Jan 08, 2021.pdf',
+                 'Errata for Jan 08, 2021.json', 'Payslip_2020-12-25.pdf', 'notes.txt']:
+        with open(os.path.join(tmpdir, name), 'w') as f:
+            f.write('mock')
+
+    manifest = build_manifest(tmpdir, output_dir=os.path.join(tmpdir, 'json'))
+
+    names = [entry['name'] for entry in manifest]
+    assert names == ['Payslip_2020-12-25.pdf', 'Statement for Jan 08, 2021.pdf',
+                     'Statement for Apr 16, 2021.pdf'], f"Unexpected order: {names}"
+
+    jan = manifest[1]
+    assert jan['errata'] == os.path.join(tmpdir, 'Errata for Jan 08, 2021.json'), f"Errata not paired: {jan}"
+    assert jan['json'] == os.path.join(tmpdir, 'json', 'Statement for Jan 08, 2021.json')
+    assert manifest[0]['errata'] is None and manifest[2]['errata'] is None
+
+    skipped = build_manifest(tmpdir, skip=['Apr'])
+    assert [entry['name'] for entry in skipped] == names[:2]
+
+    print("✓ test_manifest_orders_by_pay_date PASSED")
+
+
+def test_dedupe_manifest(tmp_path):
+    """Test that identical copies are dropped and conflicting copies held back"""
+    tmpdir = str(tmp_path)
+    contents = {
+        'Statement for Apr 16, 2021.pdf': 'april',
+        'Statement for Apr 16, 2021-1.pdf': 'april',
+        'Payslip_2024-01-05.pdf': 'january',
+        'Payslip_2024-01-05(1).pdf': 'january reissued',
+        'Payslip_2024-01-19.pdf': 'january',
+    }
+    for name, content in contents.items():
+        with open(os.path.join(tmpdir, name), 'w') as f:
+            f.write(content)
+
+    entries, duplicates, conflicts = dedupe_manifest(build_manifest(tmpdir))
+
+    names = [entry['name'] for entry in entries]
+    assert names == ['Statement for Apr 16, 2021.pdf', 'Payslip_2024-01-05.pdf',
+                     'Payslip_2024-01-19.pdf'], f"Unexpected entries: {names}"
+    assert [(d['name'], k['name']) for d, k in duplicates] == \
+        [('Statement for Apr 16, 2021-1.pdf', 'Statement for Apr 16, 2021.pdf')]
+    assert [(c['name'], k['name']) for c, k in conflicts] == \
+        [('Payslip_2024-01-05(1).pdf', 'Payslip_2024-01-05.pdf')]
+
+    print("✓ test_dedupe_manifest PASSED")
+
+
+def test_parse_file_stops_after_net_pay(tmp_path):
+    """Test that pages after the net pay line and pages without text are not parsed"""
+    import pdfplumber
+    from load import parse_file, page_has_text
+
+    tmpdir = str(tmp_path)
+    pdf_file = os.path.join(tmpdir, 'Statement for Jan 08, 2021.pdf')
+    drawing_only = b"0 0 100 100 re f"
+    write_pdf(pdf_file, [drawing_only, STATEMENT_WORDS, [(20, 100, 'Legal notice 12.00')]])
+
+    with pdfplumber.open(pdf_file) as pdf:
+        assert [page_has_text(p) for p in pdf.pages] == [False, True, True]
+
+    data = parse_file(pdf_file)
+    descs = [row[0].get('desc') for row in data]
+    assert 'Legal notice' not in descs, f"Page after net pay was parsed: {descs}"
+    assert descs[-1] == 'PTO', f"Unexpected rows: {descs}"
+    assert {'desc': 'Regular Salary', 'cur': '5,000.00', 'ytd': '10,000.00'} in [row[0] for row in data]
+
+    print("✓ test_parse_file_stops_after_net_pay PASSED")
+
+
+def test_strategy_cache_per_format(tmp_path):
+    """Test that the working extraction strategy is remembered per document format"""
+    from load import parse_file, StrategyCache
+
+    tmpdir = str(tmp_path)
+    words_files = [os.path.join(tmpdir, f'Statement for Jan {day}, 2021.pdf') for day in ('08', '22')]
+    table_files = [os.path.join(tmpdir, f'Payslip_2024-01-{day}.pdf') for day in ('05', '19')]
+    for path in words_files:
+        write_pdf(path, [STATEMENT_WORDS])
+    for path in table_files:
+        write_pdf(path, [TABLE_STATEMENT_STREAM])
+
+    strategies = StrategyCache()
+    results = [parse_file(path, strategies) for path in words_files + table_files]
+
+    assert results[0] == results[1], "Cached word strategy changed the result"
+    assert results[2] == results[3], "Cached table strategy changed the result"
+    assert {'desc': 'Total Net Pay', 'cur': '4,100.00', 'ytd': '8,200.00'} in [row[0] for row in results[3]]
+
+    stats = strategies.stats
+    assert stats['cache_misses'] == 2 and stats['cache_hits'] == 2, f"Unexpected cache use: {stats}"
+    assert stats['words_pages'] == 2, f"Unexpected word pages: {stats}"
+    assert stats['tables_after_words_pages'] == 1, "Table format should pay for words only once"
+    assert stats['tables_pages'] == 1, f"Unexpected table pages: {stats}"
+
+    # A table page before the first column header survives the cached word strategy
+    summary_file = os.path.join(tmpdir, 'Statement for Feb 05, 2021.pdf')
+    write_pdf(summary_file, [TABLE_STATEMENT_STREAM, STATEMENT_WORDS])
+    expected = parse_file(summary_file, StrategyCache())
+    assert parse_file(summary_file, strategies) == expected, "Cached word strategy dropped the summary page"
+    assert len(expected) > len(results[0]), f"Summary page rows missing: {expected}"
+
+    # A table-only statement does not lock its format into tables: a later statement whose
+    # tables stop short of the net pay line is still parsed by words
+    net_pay_line = b"BT /F1 8 Tf 20 639 Td (Total Net Pay 4,100.00 8,200.00) Tj ET\n"
+    summary_page = TABLE_STATEMENT_STREAM.replace(net_pay_line, b"")
+    later_file = os.path.join(tmpdir, 'Payslip_2024-02-02.pdf')
+    write_pdf(later_file, [summary_page, STATEMENT_WORDS])
+    expected = parse_file(later_file, StrategyCache())
+    assert parse_file(later_file, strategies) == expected, "Cached table strategy skipped the word pages"
+    assert {'desc': 'Regular Salary', 'cur': '5,000.00', 'ytd': '10,000.00'} in [row[0] for row in expected]
+
+    # Tables that never reach net pay are not learned
+    partial_file = os.path.join(tmpdir, 'Partial for Mar 05, 2021.pdf')
+    write_pdf(partial_file, [summary_page])
+    fresh = StrategyCache()
+    assert parse_file(partial_file, fresh) and fresh.snapshot()[0] == {}, "Incomplete table statement was learned"
+
+    print("✓ test_strategy_cache_per_format PASSED")
+
+
+def test_column_layout_survives_drift(tmp_path):
+    """Test that columns are re-inferred when the vendor shifts the layout"""
+    from load import parse_file, StrategyCache, cluster_positions
+
+    assert cluster_positions([265, 200, 205, 440, 266]) == [(200.0, 205.0), (265.0, 266.0), (440.0, 440.0)]
+
+    tmpdir = str(tmp_path)
+    # Shifted 60 points right: the YTD column passes the old fixed table edge at x=320
+    shifted = [(x + 60, top, text) for x, top, text in STATEMENT_WORDS]
+    write_pdf(os.path.join(tmpdir, 'Statement for Jan 08, 2021.pdf'), [STATEMENT_WORDS])
+    write_pdf(os.path.join(tmpdir, 'Statement for Jan 22, 2021.pdf'), [shifted])
+    write_pdf(os.path.join(tmpdir, 'Statement for Feb 05, 2021.pdf'), [shifted])
+
+    strategies = StrategyCache()
+    expected = parse_file(os.path.join(tmpdir, 'Statement for Jan 08, 2021.pdf'), strategies)
+    assert {'desc': 'PTO', 'earned': '6.67', 'used': '8.00', 'balance': '40.00'} in sum(expected, [])
+    for name in ('Statement for Jan 22, 2021.pdf', 'Statement for Feb 05, 2021.pdf'):
+        actual = parse_file(os.path.join(tmpdir, name), strategies)
+        assert actual == expected, f"Shifted layout parsed differently:\n{actual}\n{expected}"
+    assert strategies.stats['layout_hits'] >= 1, f"Layout not cached: {strategies.stats}"
+
+    # Only the headerless Other Benefits columns move: the cached layout no longer fits
+    moved = {(440, 115): 470, (500, 115): 540}
+    benefits = [(moved.get((x, top), x), top, text) for x, top, text in STATEMENT_WORDS]
+    write_pdf(os.path.join(tmpdir, 'Statement for Feb 19, 2021.pdf'), [benefits])
+    actual = parse_file(os.path.join(tmpdir, 'Statement for Feb 19, 2021.pdf'), strategies)
+    assert actual == expected, f"Shifted Other Benefits parsed differently:\n{actual}\n{expected}"
+
+    print("✓ test_column_layout_survives_drift PASSED")
+
+
+def test_parallel_pages_match_sequential(tmp_path):
+    """Test that a long statement parsed with parallel page extraction matches a sequential parse"""
+    from load import parse_file, StrategyCache, PARALLEL_MIN_PAGES
+
+    tmpdir = str(tmp_path)
+    pdf_file = os.path.join(tmpdir, 'Statement for Dec 31, 2021.pdf')
+    # Header page, then continuation pages whose last row continues as
+    # "Withholding Tax" at the top of the next page, a page without text,
+    # the net pay page and a trailing notice that must not be parsed
+    pages = [STATEMENT_WORDS[:12] + [(20, 130, 'Bonus A')]]
+    for n in range(2, PARALLEL_MIN_PAGES):
+        pages.append([
+            (20, 100, 'Withholding Tax'), (205, 100, f'{n}.00'), (265, 100, f'{n * 2}.00'),
+            (20, 115, f'Bonus {chr(ord("A") + n - 1)}'),
+        ])
+    pages.append(b"0 0 100 100 re f")
+    pages.append(MULTIPAGE_STATEMENT[1])
+    pages.append(MULTIPAGE_STATEMENT[2])
+    write_pdf(pdf_file, pages)
+
+    sequential = parse_file(pdf_file, StrategyCache())
+    strategies = StrategyCache()
+    parallel = parse_file(pdf_file, strategies, page_jobs=3)
+
+    assert parallel == sequential, f"Parallel parse differs:\n{parallel}\n{sequential}"
+    descs = [row[0]['desc'] for row in parallel]
+    assert descs.count('Bonus A') == 1 and 'Withholding Tax' not in descs, f"Seams not merged: {descs}"
+    assert {'desc': 'Bonus B', 'cur': '3.00', 'ytd': '6.00'} in [row[0] for row in parallel]
+    assert 'Important notice about your pay' not in descs, f"Page after net pay was parsed: {descs}"
+    assert strategies.stats['skipped_pages'] == 1, f"Unexpected stats: {strategies.stats}"
+
+    print("✓ test_parallel_pages_match_sequential PASSED")
+
+
+def pool_task(name):
+    """Worker pool task used by test_worker_pool_isolation"""
+    import time
+    if name == 'hang':
+        time.sleep(60)
+    if name == 'fail':
+        raise ValueError("bad statement")
+    return name.upper()
+
+
+def test_worker_pool_isolation():
+    """Test that hanging and failing tasks are reported without stopping the batch"""
+    from load import WorkerPool
+
+    tasks = [('first',), ('hang',), ('fail',), ('last',)]
+    with WorkerPool(pool_task, workers=2, timeout=2, max_tasks_per_worker=1) as pool:
+        results = list(pool.imap(tasks))
+
+    assert results[0] == ('FIRST', None), f"Unexpected result: {results[0]}"
+    assert results[1][0] is None and 'timed out' in results[1][1], f"Hang not detected: {results[1]}"
+    assert results[2][0] is None and 'bad statement' in results[2][1], f"Error not reported: {results[2]}"
+    assert results[3] == ('LAST', None), f"Unexpected result: {results[3]}"
+
+    # A worker that died while idle fails the task sent to it and is replaced
+    import multiprocessing
+    with WorkerPool(pool_task, workers=1, timeout=10, prestart=True) as pool:
+        assert pool.submit('first').result(timeout=60) == 'FIRST'
+        for child in multiprocessing.active_children():
+            child.kill()
+            child.join()
+        try:
+            pool.submit('lost').result(timeout=60)
+            assert False, "Task sent to a dead worker succeeded"
+        except RuntimeError as e:
+            assert 'worker' in str(e), e
+        assert pool.submit('last').result(timeout=60) == 'LAST'
+
+    print("✓ test_worker_pool_isolation PASSED")
+
+
+def test_directory_load_quarantines_bad_pdf(tmp_path):
+    """Test that an unreadable PDF is quarantined while the rest of the batch loads"""
+    import json
+    from load import main
+
+    tmpdir = str(tmp_path)
+    gnucash_file = os.path.join(tmpdir, 'book.gnucash')
+    statements = os.path.join(tmpdir, 'statements')
+    os.makedirs(statements)
+    write_pdf(os.path.join(statements, 'Statement for Jan 08, 2021.pdf'), [STATEMENT_WORDS])
+    with open(os.path.join(statements, 'Statement for Jan 22, 2021.pdf'), 'w') as f:
+        f.write('not a pdf')
+    create_gnucash_accounts(gnucash_file)
+
+    argv = sys.argv
+    sys.argv = ['load.py', gnucash_file, statements, '--jobs', '2']
+    try:
+        main()
+    finally:
+        sys.argv = argv
+
+    book = piecash.open_book(gnucash_file, readonly=True, do_backup=False, open_if_lock=True)
+    transactions = list(book.transactions)
+    book.close()
+    assert len(transactions) == 1, f"Expected 1 transaction, got {len(transactions)}"
+
+    with open(os.path.join(statements, 'json', 'quarantine.json')) as f:
+        quarantined = json.load(f)
+    assert list(quarantined) == ['Statement for Jan 22, 2021.pdf'], f"Unexpected quarantine: {quarantined}"
+
+    # A retried statement that now extracts is loaded and released from quarantine
+    write_pdf(os.path.join(statements, 'Statement for Jan 22, 2021.pdf'), [STATEMENT_WORDS])
+    sys.argv = ['load.py', gnucash_file, statements, '--retry-quarantined']
+    try:
+        main()
+    finally:
+        sys.argv = argv
+    with open(os.path.join(statements, 'json', 'quarantine.json')) as f:
+        assert json.load(f) == {}, "Retried statement is still quarantined"
+
+    print("✓ test_directory_load_quarantines_bad_pdf PASSED")
+
+
+def test_failed_statement_keeps_the_rest(tmp_path):
+    """Test that a failing statement rolls back alone and a re-run skips loaded statements"""
+    import argparse
+    from load import load_book
+
+    tmpdir = str(tmp_path)
+    gnucash_file = os.path.join(tmpdir, 'book.gnucash')
+    statements = os.path.join(tmpdir, 'statements')
+    os.makedirs(statements)
+    unknown = STATEMENT_WORDS + [(20, 145, 'Mystery Code'), (200, 145, '10.00'), (265, 145, '20.00')]
+    unbalanced = [w if w[2] != '4,100.00' else (200, 160, '4,000.00') for w in STATEMENT_WORDS]
+    write_pdf(os.path.join(statements, 'Statement for Jan 08, 2021.pdf'), [STATEMENT_WORDS])
+    write_pdf(os.path.join(statements, 'Statement for Jan 22, 2021.pdf'), [unknown])
+    write_pdf(os.path.join(statements, 'Statement for Feb 05, 2021.pdf'), [unbalanced])
+    write_pdf(os.path.join(statements, 'Statement for Feb 19, 2021.pdf'), [STATEMENT_WORDS])
+    create_gnucash_accounts(gnucash_file)
+
+    args = argparse.Namespace(gnucash_file=gnucash_file, path=statements, output_dir=None, clean=False,
+                              skip=None, jobs=1, timeout=120, max_rss=1024, max_tasks_per_worker=25,
+                              retry_quarantined=False, engine='pdfplumber', cache_dir=None, bulk_load=False,
+                              snapshot=False, keep_snapshots=10, typed_json=False, metrics_file=None)
+    summary = load_book(args)
+    assert summary['error'] is None, summary['error']
+    assert (summary['loaded'], summary['failed']) == (2, 2), f"Unexpected summary: {summary}"
+
+    book = piecash.open_book(gnucash_file, readonly=True, do_backup=False, open_if_lock=True)
+    dates = sorted(str(t.post_date) for t in book.transactions)
+    book.close()
+    assert dates == ['2021-01-08', '2021-02-19'], f"Unexpected transactions: {dates}"
+
+    summary = load_book(args)
+    assert (summary['loaded'], summary['already_loaded'], summary['failed']) == (0, 2, 2), \
+        f"Re-run should only retry the failures: {summary}"
+
+    print("✓ test_failed_statement_keeps_the_rest PASSED")
+
+
+def test_changed_statement_updated_in_place(tmp_path):
+    """Test that a statement whose errata changed is updated in place on re-run"""
+    import argparse
+    import json
+    from load import load_book
+
+    tmpdir = str(tmp_path)
+    gnucash_file = os.path.join(tmpdir, 'book.gnucash')
+    statements = os.path.join(tmpdir, 'statements')
+    os.makedirs(statements)
+    write_pdf(os.path.join(statements, 'Statement for Jan 08, 2021.pdf'), [STATEMENT_WORDS])
+    create_gnucash_accounts(gnucash_file)
+
+    args = argparse.Namespace(gnucash_file=gnucash_file, path=statements, output_dir=None, clean=False,
+                              skip=None, jobs=1, timeout=120, max_rss=1024, max_tasks_per_worker=25,
+                              retry_quarantined=False, engine='pdfplumber', cache_dir=None, bulk_load=False,
+                              snapshot=False, keep_snapshots=10, typed_json=False, metrics_file=None)
+    summary = load_book(args)
+    assert (summary['loaded'], summary['updated']) == (1, 0), f"Unexpected summary: {summary}"
+    with piecash.open_book(gnucash_file, readonly=True, open_if_lock=True) as book:
+        transaction, = book.transactions
+        guid = transaction.guid
+        kept = {split.guid for split in transaction.splits}
+
+    with open(os.path.join(statements, 'Errata for Jan 08, 2021.json'), 'w') as f:
+        json.dump([{"desc": "EE Social Security Tax", "cur": "62.00-"},
+                   {"desc": "Regular Salary", "cur": "62.00"}], f)
+    summary = load_book(args)
+    assert (summary['loaded'], summary['updated'], summary['already_loaded']) == (0, 1, 0), \
+        f"Changed statement was not updated: {summary}"
+
+    with piecash.open_book(gnucash_file, readonly=True, open_if_lock=True) as book:
+        transaction, = book.transactions
+        assert transaction.guid == guid, "Transaction was replaced instead of updated"
+        assert kept <= {split.guid for split in transaction.splits}, "Unchanged splits were replaced"
+        assert 'EE' in [split.memo for split in transaction.splits]
+        assert sum(split.value for split in transaction.splits) == 0
+
+    summary = load_book(args)
+    assert (summary['updated'], summary['already_loaded']) == (0, 1), f"Unchanged re-run updated: {summary}"
+
+    print("✓ test_changed_statement_updated_in_place PASSED")
+
+
+def test_load_metrics_textfile(tmp_path):
+    """Test that a load writes its counters and stage timings in Prometheus textfile format"""
+    import argparse
+    from load import load_book
+
+    tmpdir = str(tmp_path)
+    gnucash_file = os.path.join(tmpdir, 'book.gnucash')
+    statements = os.path.join(tmpdir, 'statements')
+    metrics_file = os.path.join(tmpdir, 'pypay.prom')
+    os.makedirs(statements)
+    unknown = STATEMENT_WORDS + [(20, 145, 'Mystery Code'), (200, 145, '10.00'), (265, 145, '20.00')]
+    write_pdf(os.path.join(statements, 'Statement for Jan 08, 2021.pdf'), [STATEMENT_WORDS])
+    write_pdf(os.path.join(statements, 'Statement for Jan 22, 2021.pdf'), [unknown])
+    create_gnucash_accounts(gnucash_file)
+
+    args = argparse.Namespace(gnucash_file=gnucash_file, path=statements, output_dir=None, clean=False,
+                              skip=None, jobs=1, timeout=120, max_rss=1024, max_tasks_per_worker=25,
+                              retry_quarantined=False, engine='pdfplumber', cache_dir=None, bulk_load=False,
+                              snapshot=False, keep_snapshots=10, typed_json=False, metrics_file=metrics_file)
+    summary = load_book(args)
+    assert (summary['loaded'], summary['failed']) == (1, 1), f"Unexpected summary: {summary}"
+
+    with open(metrics_file) as f:
+        text = f.read()
+    assert not [name for name in os.listdir(tmpdir) if name.endswith('.tmp')], "Temporary file left behind"
+    assert '# TYPE pypay_files_scanned_total counter' in text
+    samples = {}
+    for line in text.splitlines():
+        if not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+
+    book = '{book="book.gnucash"}'
+    pdf_bytes = sum(os.path.getsize(os.path.join(statements, name)) for name in os.listdir(statements)
+                    if name.endswith('.pdf'))
+    assert samples[f'pypay_files_scanned_total{book}'] == 2
+    assert samples[f'pypay_files_processed_total{book}'] == 2
+    assert samples[f'pypay_pages_parsed_total{book}'] == 2
+    assert samples[f'pypay_words_extracted_total{book}'] > 0
+    assert samples[f'pypay_unknown_descriptors_total{book}'] == 1
+    assert samples[f'pypay_splits_created_total{book}'] > 0
+    assert samples[f'pypay_bytes_read_total{book}'] == pdf_bytes
+    assert samples[f'pypay_last_run_success{book}'] == 1
+    assert samples['pypay_stage_seconds{book="book.gnucash",stage="extract"}'] > 0
+
+    # A load that fails before the book is open still replaces the last success
+    with open(gnucash_file, 'wb') as f:
+        f.write(b'not a book')
+    args.snapshot = True
+    try:
+        load_book(args)
+    except Exception:
+        pass
+    with open(metrics_file) as f:
+        assert 'pypay_last_run_success{book="book.gnucash"} 0' in f.read().splitlines()
+
+    print("✓ test_load_metrics_textfile PASSED")
+
+
+def test_archive_closed_years(tmp_path):
+    """Test that archiving moves closed years out of the book without changing totals"""
+    from datetime import date
+    from load import BookArchive, GnuCashSink, load_statement, loaded_statements, write_json
+
+    tmpdir = str(tmp_path)
+    gnucash_file = os.path.join(tmpdir, 'book.gnucash')
+    create_gnucash_accounts(gnucash_file)
+    book = piecash.open_book(gnucash_file, readonly=False, do_backup=False, open_if_lock=True)
+    registry = AccountRegistry()
+    registry.load_from_book(book)
+    for name, pay in (('Dec 11, 2020', '5,000.00'), ('Dec 25, 2020', '5,100.00'), ('Jan 08, 2021', '5,200.00')):
+        json_file = os.path.join(tmpdir, f'Statement for {name}.json')
+        write_json([[{'desc': 'Regular Salary', 'cur': pay}], [{'desc': 'Total Net Pay', 'cur': pay}]], json_file)
+        load_statement(book, registry, json_file, f'Statement for {name}.pdf')
+    book.save()
+    book.close()
+
+    archive = BookArchive(gnucash_file)
+    before, books = archive.account_totals()
+    assert books == [gnucash_file]
+
+    # An earlier archive run was interrupted after saving the archive book
+    with piecash.open_book(gnucash_file, readonly=True, open_if_lock=True) as book:
+        archive._copy_to_archive(2020, [t for t in book.transactions if t.post_date.year == 2020])
+
+    assert archive.archive(2021) == {2020: 2}
+    with piecash.open_book(archive.path(2020), readonly=True, open_if_lock=True) as book:
+        assert len(book.transactions) == 2, "Re-run copied the archived paychecks again"
+    assert archive.years() == [2020]
+    assert archive.statements() == {'Statement for Dec 11, 2020.pdf', 'Statement for Dec 25, 2020.pdf'}
+    with piecash.open_book(gnucash_file, readonly=True, open_if_lock=True) as book:
+        assert len(book.transactions) == 2, "Archived paychecks were not replaced by one balance transaction"
+        assert set(loaded_statements(book)) == {'Statement for Jan 08, 2021.pdf'}
+        active = {}
+        for split in book.splits:
+            active[split.account.fullname] = active.get(split.account.fullname, 0) + int(split.value * 100)
+        assert {a: c for a, c in active.items() if c} == {a: c for a, c in before.items() if c}, \
+            "Balances in the book changed"
+
+    totals, books = archive.account_totals()
+    assert totals == before and books == [gnucash_file, archive.path(2020)]
+    totals, books = archive.account_totals(start=date(2021, 1, 1))
+    assert books == [gnucash_file] and totals['Income:Taxable:Regular'] == -520000
+    totals, books = archive.account_totals(end=date(2020, 12, 31))
+    assert books == [gnucash_file, archive.path(2020)] and totals['Income:Taxable:Regular'] == -1010000
+
+    # Nothing left to archive
+    assert archive.archive(2021) == {}
+
+    sink = GnuCashSink.open(gnucash_file)
+    assert set(sink.loaded()) == {'Statement for Dec 11, 2020.pdf', 'Statement for Dec 25, 2020.pdf',
+                                  'Statement for Jan 08, 2021.pdf'}
+    sink.close()
+
+    # A recreated book (--init) has no balance transaction: its archives no longer count as loaded
+    create_gnucash_accounts(gnucash_file)
+    sink = GnuCashSink.open(gnucash_file)
+    assert sink.loaded() == {}, f"Archived statements of the old book counted as loaded: {sink.loaded()}"
+    for name in ('Dec 11, 2020', 'Dec 25, 2020', 'Jan 08, 2021'):
+        load_statement(sink.book, sink.registry, os.path.join(tmpdir, f'Statement for {name}.json'),
+                       f'Statement for {name}.pdf')
+    sink.save()
+    sink.close()
+    totals, books = archive.account_totals()
+    assert totals == before and books == [gnucash_file], f"Reloaded book reports {totals} from {books}"
+
+    print("✓ test_archive_closed_years PASSED")
+
+
+def test_ledger_sink(tmp_path):
+    """Test that the plain-text ledger sink appends balanced entries and corrects changed statements"""
+    import json
+    from load import ACCOUNT_PATHS, LedgerSink, process, write_json
+
+    tmpdir = str(tmp_path)
+    journal = os.path.join(tmpdir, 'pay.journal')
+    json_file = os.path.join(tmpdir, 'Statement for Jan 08, 2021.json')
+    errata_file = os.path.join(tmpdir, 'Errata for Jan 08, 2021.json')
+    name = 'Statement for Jan 08, 2021.pdf'
+    write_json([[{'desc': 'Regular Salary', 'cur': '5,000.00'}], [{'desc': 'Tax Deductions: Federal', 'cur': '900.00-'}],
+                [{'desc': 'Total Net Pay', 'cur': '4,100.00'}]], json_file)
+    LedgerSink.create(journal)
+
+    # process() writes through any sink; nothing is written until the sink is saved
+    sink = LedgerSink.open(journal)
+    assert process(json_file, sink) is not None
+    sink.close()
+    sink = LedgerSink.open(journal)
+    assert sink.loaded() == {}
+    sink.load(json_file, name, digest='first')
+    sink.save()
+    sink.close()
+
+    with open(journal) as f:
+        text = f.read()
+    entry = text.split('\n\n')[-1]
+    assert entry.startswith('2021-01-08 * Paycheck\n'), entry
+    postings = [line.split() for line in entry.splitlines() if line.startswith('    ') and not line.strip().startswith(';')]
+    assert {p[0] for p in postings} <= set(ACCOUNT_PATHS.values())
+    assert sum(Decimal(p[1]) for p in postings) == 0 and len(postings) == 3
+
+    with open(errata_file, 'w') as f:
+        json.dump([{"desc": "EE Social Security Tax", "cur": "62.00-"}, {"desc": "Bonus", "cur": "62.00"}], f)
+    sink = LedgerSink.open(journal)
+    loaded = sink.loaded()
+    assert loaded[name].digest == 'first'
+    correction, added, removed = sink.update(json_file, loaded[name], 'second', errata_path=errata_file)
+    assert (len(added), len(removed)) == (2, 0) and sum(split.value for split in correction) == 0
+    sink.save()
+    sink.close()
+
+    sink = LedgerSink.open(journal)
+    loaded = sink.loaded()
+    assert loaded[name].digest == 'second'
+    # Without changes only the digest is recorded
+    correction, added, removed = sink.update(json_file, loaded[name], 'third', errata_path=errata_file)
+    assert (correction, added, removed) == ([], [], [])
+    sink.save()
+    assert LedgerSink.open(journal).loaded()[name].digest == 'third'
+
+    print("✓ test_ledger_sink PASSED")
+
+
+def test_bulk_load_mode(tmp_path):
+    """Test that bulk-load mode lets readers in during a load and restores the journal afterwards"""
+    import argparse
+    import contextlib
+    import sqlite3
+    from load import bulk_load, load_book, load_statement, write_json
+
+    tmpdir = str(tmp_path)
+    gnucash_file = os.path.join(tmpdir, 'book.gnucash')
+    json_file = os.path.join(tmpdir, 'Statement for Jan 08, 2021.json')
+    create_gnucash_accounts(gnucash_file)
+    write_json([[{'desc': 'Regular Salary', 'cur': '5,000.00'}], [{'desc': 'Total Net Pay', 'cur': '5,000.00'}]],
+               json_file)
+
+    def journal_mode():
+        with contextlib.closing(sqlite3.connect(gnucash_file)) as conn:
+            return conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+    other_file = os.path.join(tmpdir, 'other.gnucash')
+    create_gnucash_accounts(other_file)
+
+    with bulk_load(gnucash_file) as tune:
+        assert journal_mode() == 'wal'
+        book = piecash.open_book(gnucash_file, readonly=False, do_backup=False, open_if_lock=True)
+        tune(book)
+        registry = AccountRegistry()
+        registry.load_from_book(book)
+        load_statement(book, registry, json_file, 'Statement for Jan 08, 2021.pdf')
+        book.flush()
+        assert book.session.connection().exec_driver_sql("PRAGMA synchronous").scalar() == 1
+
+        # Other books opened meanwhile keep their settings
+        with piecash.open_book(other_file, readonly=True, open_if_lock=True) as other:
+            assert other.session.connection().exec_driver_sql("PRAGMA synchronous").scalar() == 2
+
+        # A reader is not kept waiting while the book is open for writing
+        with contextlib.closing(sqlite3.connect(gnucash_file, timeout=0)) as reader:
+            assert reader.execute("SELECT count(*) FROM transactions").fetchone()[0] == 1
+        book.save()
+        book.close()
+
+    assert journal_mode() == 'delete', "Journal mode was not restored"
+    assert not os.path.exists(gnucash_file + '-wal'), "WAL was not checkpointed"
+
+    # A reader connected at the end keeps the book in WAL; the next load restores the rollback journal
+    with contextlib.closing(sqlite3.connect(gnucash_file)) as reader:
+        with bulk_load(gnucash_file):
+            reader.execute("SELECT count(*) FROM transactions").fetchone()
+    assert journal_mode() == 'wal'
+    with bulk_load(gnucash_file):
+        pass
+    assert journal_mode() == 'delete', "Journal mode left over from an earlier load was kept"
+    with piecash.open_book(gnucash_file, readonly=True, open_if_lock=True) as book:
+        assert len(book.transactions) == 1
+
+    # A book locked by another writer is reported in the summary, not raised
+    args = argparse.Namespace(gnucash_file=gnucash_file, path=json_file, output_dir=None, clean=False,
+                              skip=None, jobs=1, timeout=120, max_rss=1024, max_tasks_per_worker=25,
+                              retry_quarantined=False, engine='pdfplumber', cache_dir=None, bulk_load=True,
+                              snapshot=False, keep_snapshots=10, typed_json=False, metrics_file=None)
+    with contextlib.closing(sqlite3.connect(gnucash_file)) as writer:
+        writer.execute("BEGIN EXCLUSIVE")
+        summary = load_book(args)
+    assert summary['error'] and 'locked' in summary['error'], summary
+    assert journal_mode() == 'delete'
+
+    print("✓ test_bulk_load_mode PASSED")
+
+
+def test_book_snapshots(tmp_path):
+    """Test that pre-load snapshots restore the book and its quota ledger, and rotate"""
+    import contextlib
+    import sqlite3
+    from load import BookSnapshots, QuotaLedger, load_statement, write_json, restore_main
+
+    tmpdir = str(tmp_path)
+    gnucash_file = os.path.join(tmpdir, 'book.gnucash')
+    create_gnucash_accounts(gnucash_file)
+    snapshots = BookSnapshots(gnucash_file, keep=2)
+    before = os.path.basename(snapshots.take())[:-len('.gnucash')]
+
+    # A load to undo: a transaction in the book and a quota row in the ledger
+    json_file = os.path.join(tmpdir, 'Statement for Jan 08, 2021.json')
+    write_json([[{'desc': 'Regular Salary', 'cur': '5,000.00'}], [{'desc': 'Total Net Pay', 'cur': '5,000.00'}],
+                [{'desc': 'PTO', 'earned': '6.67', 'used': '8.00', 'balance': '40.00'}]], json_file)
+    with QuotaLedger(QuotaLedger.path_for(gnucash_file)) as ledger:
+        book = piecash.open_book(gnucash_file, readonly=False, do_backup=False, open_if_lock=True)
+        registry = AccountRegistry()
+        registry.load_from_book(book)
+        load_statement(book, registry, json_file, 'Statement for Jan 08, 2021.pdf', ledger=ledger)
+        book.save()
+        ledger.commit()
+        # Taken while the loader holds the book's lock, which is not copied
+        after = snapshots.take()
+        book.close()
+
+    with contextlib.closing(sqlite3.connect(after)) as copy:
+        assert copy.execute("SELECT count(*) FROM gnclock").fetchone()[0] == 0
+        assert copy.execute("SELECT count(*) FROM transactions").fetchone()[0] == 1
+
+    assert restore_main([gnucash_file, before]) == before
+    with piecash.open_book(gnucash_file, readonly=True, open_if_lock=True) as book:
+        assert len(book.transactions) == 0, "Load was not undone"
+    assert not os.path.exists(QuotaLedger.path_for(gnucash_file)), "Ledger of the undone load was kept"
+
+    assert restore_main([gnucash_file]) == snapshots.list()[-1]
+    with piecash.open_book(gnucash_file, readonly=True, open_if_lock=True) as book:
+        assert len(book.transactions) == 1
+    with QuotaLedger(QuotaLedger.path_for(gnucash_file)) as ledger:
+        assert ledger.subjects() == ['PTO']
+
+    snapshots.take()
+    assert len(snapshots.list()) == 2 and before not in snapshots.list(), f"Not rotated: {snapshots.list()}"
+
+    print("✓ test_book_snapshots PASSED")
+
+
+def test_quota_ledger(tmp_path):
+    """Test that quota balances are recorded per pay date as statements load"""
+    from datetime import date
+    from load import main, quota_main, QuotaLedger
+
+    tmpdir = str(tmp_path)
+    gnucash_file = os.path.join(tmpdir, 'book.gnucash')
+    statements = os.path.join(tmpdir, 'statements')
+    os.makedirs(statements)
+    later = [w if w[:2] != (525, 145) else (525, 145, '38.67') for w in STATEMENT_WORDS]
+    unknown = STATEMENT_WORDS + [(20, 145, 'Mystery Code'), (200, 145, '10.00'), (265, 145, '20.00')]
+    write_pdf(os.path.join(statements, 'Statement for Jan 08, 2021.pdf'), [STATEMENT_WORDS])
+    write_pdf(os.path.join(statements, 'Statement for Jan 22, 2021.pdf'), [later])
+    write_pdf(os.path.join(statements, 'Statement for Feb 05, 2021.pdf'), [unknown])
+    create_gnucash_accounts(gnucash_file)
+
+    argv = sys.argv
+    sys.argv = ['load.py', gnucash_file, statements, '--jobs', '1']
+    try:
+        main()
+    finally:
+        sys.argv = argv
+
+    with QuotaLedger(QuotaLedger.path_for(gnucash_file)) as ledger:
+        history = ledger.history('PTO')
+        assert [(h['date'], h['used'], h['balance']) for h in history] == [
+            (date(2021, 1, 8), Decimal('8.00'), Decimal('40.00')),
+            (date(2021, 1, 22), Decimal('8.00'), Decimal('38.67')),
+        ], f"Unexpected PTO history: {history}"
+        assert ledger.balance_at('PTO', date(2021, 1, 1)) is None
+        assert ledger.balance_at('PTO', date(2021, 1, 21)) == Decimal('40.00')
+        # The failed Feb 05 statement is not recorded
+        assert ledger.liability_at(date(2021, 3, 1), {'PTO': 50}) == {'PTO': Decimal('1933.50')}
+
+    assert quota_main([gnucash_file, '--at', '2021-03-01', '--rate', 'PTO=50']) == {'PTO': Decimal('1933.50')}
+    # Malformed rates are usage errors, not tracebacks
+    for rate in ('PTO', 'PTO=abc', '=50', 'PTO=-1', 'PTO=nan'):
+        try:
+            quota_main([gnucash_file, '--at', '2021-03-01', '--rate', rate])
+            assert False, f"--rate {rate} was accepted"
+        except SystemExit as e:
+            assert e.code == 2, f"--rate {rate} exited with {e.code}"
+
+    print("✓ test_quota_ledger PASSED")
+
+
+def test_pdfminer_engine_matches_pdfplumber(tmp_path):
+    """Test that the pdfminer engine produces the same rows as pdfplumber"""
+    import glob
+    from load import parse_file, StrategyCache
+
+    tmpdir = str(tmp_path)
+    corpus = {
+        'Statement for Jan 08, 2021.pdf': [STATEMENT_WORDS],
+        'Statement for Jan 22, 2021.pdf': MULTIPAGE_STATEMENT,
+        'Payslip_2024-01-05.pdf': [TABLE_STATEMENT_STREAM],
+    }
+    for name, pages in corpus.items():
+        write_pdf(os.path.join(tmpdir, name), pages)
+
+    # Include real statements when available
+    pdf_files = sorted(glob.glob(os.path.join(tmpdir, '*.pdf')) + glob.glob('data/*/*.pdf'))
+    for pdf_file in pdf_files:
+        expected = parse_file(pdf_file, StrategyCache(), engine='pdfplumber')
+        actual = parse_file(pdf_file, StrategyCache(), engine='pdfminer')
+        assert actual == expected, f"Engines disagree on {pdf_file}:\n{actual}\n{expected}"
+
+    print(f"✓ test_pdfminer_engine_matches_pdfplumber PASSED ({len(pdf_files)} files)")
+
+
+def test_export_parsers_match_pdf(tmp_path):
+    """Test that CSV and HTML exports parse to the PDF's rows and are preferred over it"""
+    import json
+    from load import parse_file, parse_input, compute_splits, extract, PathRegistry, StrategyCache
+
+    csv_export = (
+        "Description,Current,Year-To-Date\n"
+        "Regular Salary,\"$5,000.00\",\"$10,000.00\"\n"
+        "Tax Deductions: Federal,(900.00),\"(1,800.00)\"\n"
+        "Total Net Pay,\"4,100.00\",\"8,200.00\"\n"
+        "SPST,12.00,24.00\n"
+        "\n"
+        "Description,Earned,Used,Balance\n"
+        "PTO,6.67,8.00,40.00\n"
+    )
+    html_export = (
+        "<html><body><h1>Pay statement</h1>"
+        "<table><tr><th>Item</th><th>Amount</th><th>YTD</th></tr>"
+        "<tr><td>Regular Salary</td><td>5,000.00</td><td>10,000.00</td></tr>"
+        "<tr><td>Tax Deductions:\n  Federal</td><td>-900.00</td><td>-1,800.00</td></tr>"
+        "<tr><td>Total Net Pay</td><td>4,100.00</td><td>8,200.00</td></tr>"
+        "<tr><td>SPST</td><td>12.00</td><td>24.00</td></tr></table>"
+        "<table><tr><th>Description</th><th>Accrued</th><th>Taken</th><th>Balance</th></tr>"
+        "<tr><td>PTO</td><td>6.67</td><td>8.00</td><td>40.00</td></tr></table>"
+        "</body></html>"
+    )
+
+    tmpdir = str(tmp_path)
+    pdf_file = os.path.join(tmpdir, 'Statement for Jan 08, 2021.pdf')
+    csv_file = os.path.join(tmpdir, 'Statement for Jan 08, 2021.csv')
+    html_file = os.path.join(tmpdir, 'Payslip_2021-01-22.html')
+    write_pdf(pdf_file, [STATEMENT_WORDS])
+    write_pdf(os.path.join(tmpdir, 'Payslip_2021-01-22.pdf'), [STATEMENT_WORDS])
+    with open(csv_file, 'w') as f:
+        f.write(csv_export)
+    with open(html_file, 'w') as f:
+        f.write(html_export)
+    # Other CSV files in the directory are not statements
+    with open(os.path.join(tmpdir, 'items.csv'), 'w') as f:
+        f.write(csv_export)
+
+    # Same rows as the PDF, less the amountless header row
+    expected = [row for row in parse_file(pdf_file, StrategyCache()) if len(row[0]) > 1]
+    for export in (csv_file, html_file):
+        rows = parse_input(export)
+        assert rows == expected, f"{export} parsed differently:\n{rows}\n{expected}"
+        assert compute_splits(rows, PathRegistry()) == compute_splits(expected, PathRegistry())
+
+    with open(extract(csv_file, output_dir=tmpdir)) as f:
+        assert json.load(f) == expected
+
+    manifest = build_manifest(tmpdir)
+    assert [(e['name'], os.path.basename(e['source'])) for e in manifest] == [
+        ('Statement for Jan 08, 2021.pdf', 'Statement for Jan 08, 2021.csv'),
+        ('Payslip_2021-01-22.pdf', 'Payslip_2021-01-22.html'),
+    ], manifest
+    assert [e['source'] for e in build_manifest(tmpdir, formats=['.pdf'])] == [
+        pdf_file, os.path.join(tmpdir, 'Payslip_2021-01-22.pdf')]
+
+    try:
+        parse_input(os.path.join(tmpdir, 'notes.txt'))
+        assert False, "Unknown input type was parsed"
+    except ValueError:
+        pass
+
+    # An export in an unrecognised layout fails loudly and falls back to the PDF
+    with open(csv_file, 'w') as f:
+        f.write("Pay Type,Hours,Rate,Current,YTD\nSalary,80,62.50,\"5,000.00\",\"10,000.00\"\n")
+    try:
+        parse_input(csv_file)
+        assert False, "Unrecognised export parsed to nothing"
+    except ValueError as e:
+        assert 'header' in str(e), e
+    entry = build_manifest(tmpdir)[0]
+    assert entry['fallbacks'] == [pdf_file], entry
+    assert parse_input(entry['source'], fallbacks=entry['fallbacks']) == parse_file(pdf_file, StrategyCache())
+
+    print("✓ test_export_parsers_match_pdf PASSED")
+
+
+def test_batch_load_shares_extraction_cache(tmp_path):
+    """Test that batch mode loads each book and reuses extractions across books"""
+    import contextlib
+    import glob
+    import io
+    import json
+    from load import batch_main
+
+    tmpdir = str(tmp_path)
+    for person in ('alice', 'bob'):
+        statements = os.path.join(tmpdir, person)
+        os.makedirs(statements)
+        write_pdf(os.path.join(statements, 'Statement for Jan 08, 2021.pdf'), [STATEMENT_WORDS])
+        create_gnucash_accounts(os.path.join(tmpdir, f'{person}.gnucash'))
+    with open(os.path.join(tmpdir, 'books.json'), 'w') as f:
+        json.dump([{'gnucash_file': 'alice.gnucash', 'path': 'alice'},
+                   {'gnucash_file': 'bob.gnucash', 'path': 'bob'}], f)
+
+    summaries = batch_main([os.path.join(tmpdir, 'books.json'), '--books', '1', '--jobs', '1', '--typed-json'])
+    assert [s['error'] for s in summaries] == [None, None], f"Unexpected errors: {summaries}"
+    assert [s['loaded'] for s in summaries] == [1, 1], f"Unexpected loads: {summaries}"
+    # Identical statements: the second book is served from the shared cache
+    assert sum(s['cached'] for s in summaries) == 1, f"Expected one cache hit: {summaries}"
+    cached = glob.glob(os.path.join(tmpdir, '.pypay-cache', '*', '*.json'))
+    assert len(cached) == 1
+    # The cache holds rows, whatever format the JSON files are written in
+    with open(cached[0]) as f:
+        assert isinstance(json.load(f), list), "Typed record stored in the extraction cache"
+    for person in ('alice', 'bob'):
+        with open(os.path.join(tmpdir, person, 'json', 'Statement for Jan 08, 2021.json')) as f:
+            assert json.load(f)['format'] == 'pypay-statement'
+
+    for person in ('alice', 'bob'):
+        book = piecash.open_book(os.path.join(tmpdir, f'{person}.gnucash'), readonly=True,
+                                 do_backup=False, open_if_lock=True)
+        transactions = list(book.transactions)
+        book.close()
+        assert len(transactions) == 1, f"Expected 1 transaction for {person}, got {len(transactions)}"
+
+    # Concurrent books split the --jobs budget instead of each starting --jobs workers
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        batch_main([os.path.join(tmpdir, 'books.json'), '--books', '2', '--jobs', '5'])
+    assert "2 at a time with 2 extraction worker(s) each" in output.getvalue(), output.getvalue()
+
+    print("✓ test_batch_load_shares_extraction_cache PASSED")
+
+
+def test_preflight_reports_unknown_descriptors(tmp_path):
+    """Test that preflight lists unknown descriptors across a directory without a book"""
+    from load import preflight
+
+    tmpdir = str(tmp_path)
+    renamed = STATEMENT_WORDS + [(20, 145, 'Mystery Code'), (200, 145, '10.00'), (265, 145, '20.00')]
+    write_pdf(os.path.join(tmpdir, 'Statement for Jan 08, 2021.pdf'), [STATEMENT_WORDS])
+    write_pdf(os.path.join(tmpdir, 'Statement for Jan 22, 2021.pdf'), [renamed])
+    write_pdf(os.path.join(tmpdir, 'Statement for Feb 05, 2021.pdf'), [renamed])
+    with open(os.path.join(tmpdir, 'Statement for Feb 19, 2021.pdf'), 'w') as f:
+        f.write('not a pdf')
+
+    unknown, failed, checked = preflight(tmpdir, jobs=2)
+
+    assert unknown == {'Mystery Code': {'count': 2, 'files': 2, 'first': 'Statement for Jan 22, 2021.pdf'}}, unknown
+    assert [entry['name'] for entry, error in failed] == ['Statement for Feb 19, 2021.pdf'], failed
+    assert checked == 3, f"Expected 3 statements checked, got {checked}"
+
+    print("✓ test_preflight_reports_unknown_descriptors PASSED")
+
+
+def test_export_line_items(tmp_path):
+    """Test that export writes every booked line item to matching CSV and .npz columns"""
+    import csv
+    import numpy as np
+    from load import export_statements, ColumnarWriter
+
+    tmpdir = str(tmp_path)
+    write_pdf(os.path.join(tmpdir, 'Statement for Jan 08, 2021.pdf'), [STATEMENT_WORDS])
+    write_pdf(os.path.join(tmpdir, 'Statement for Jan 22, 2021.pdf'), [STATEMENT_WORDS])
+    with open(os.path.join(tmpdir, 'Errata for Jan 22, 2021.json'), 'w') as f:
+        f.write('[{"desc": "Manual Adjustment", "cur": "1.50"}]')
+    prefix = os.path.join(tmpdir, 'items')
+
+    # A chunk of two rows splits the items of each statement across chunks
+    rows, exported, failed = export_statements(tmpdir, prefix, chunk_rows=2)
+    assert (rows, exported, failed) == (9, 2, []), (rows, exported, failed)
+
+    with open(prefix + '.csv', newline='') as f:
+        table = list(csv.DictReader(f))
+    assert table[0] == {'date': '2021-01-08', 'desc': 'Regular Salary', 'account': 'Income:Taxable:Regular',
+                        'cur': '5000.00', 'ytd': '10000.00'}, table[0]
+    assert table[-1] == {'date': '2021-01-22', 'desc': 'Manual Adjustment', 'account': 'Equity:Adjustment',
+                         'cur': '1.50', 'ytd': ''}, table[-1]
+
+    with np.load(prefix + '.npz') as npz:
+        assert len(npz['cur']) == rows
+        assert list(npz['descriptors'][npz['desc']]) == [row['desc'] for row in table]
+        assert list(npz['accounts'][npz['account']]) == [row['account'] for row in table]
+        assert [str(d) for d in npz['date']] == [row['date'] for row in table]
+        assert npz['cur'][:3].tolist() == [500000, -90000, 410000], npz['cur']
+        assert npz['ytd'][-1] == ColumnarWriter.MISSING_CENTS
+        assert npz['cur'][npz['date'] == np.datetime64('2021-01-22')].sum() == 500000 - 90000 + 410000 + 1200 + 150
+
+    print("✓ test_export_line_items PASSED")
+
+
+def test_audit_flags_outliers(tmp_path):
+    """Test that the audit flags a doubled deduction and a missing match, but not a raise or a bonus"""
+    from datetime import date, timedelta
+    from load import ColumnarWriter, audit_line_items, read_line_items
+
+    tmpdir = str(tmp_path)
+    def history(name, doubled=None, missed=None):
+        prefix = os.path.join(tmpdir, name)
+        with ColumnarWriter(prefix) as writer:
+            for i in range(20):
+                pay_date = date(2021, 1, 8) + timedelta(days=14 * i)
+                writer.append(pay_date, 'Regular Salary', 'Income:Taxable:Regular',
+                              -500000 if i < 10 else -515000, None)
+                writer.append(pay_date, 'Medical', 'Expenses:Pretax:Medical', 40000 if i == doubled else 20000, None)
+                if i != missed:
+                    writer.append(pay_date, '401K Match', 'Assets:401k:PreTax:Employer', 15000 + i % 3 * 100, None)
+                if i == 7:
+                    writer.append(pay_date, 'Bonus', 'Income:Taxable:Bonus', -100000, None)
+                writer.append(pay_date, 'Mystery Code', '', 100, None)
+        return read_line_items(prefix + '.npz')
+
+    findings = audit_line_items([('alice', history('alice', doubled=12)), ('bob', history('bob', missed=15))])
+    flagged = [(f['source'], f['date'], f['level'], f['name'], f['cents'], f['score']) for f in findings]
+    assert flagged == [
+        ('alice', date(2021, 6, 25), 'account', 'Expenses:Pretax:Medical', 40000, 100.0),
+        ('alice', date(2021, 6, 25), 'descriptor', 'Medical', 40000, 100.0),
+        ('bob', date(2021, 8, 6), 'account', 'Assets:401k:PreTax:Employer', None, None),
+        ('bob', date(2021, 8, 6), 'descriptor', '401K Match', None, None),
+    ], f"Unexpected findings: {flagged}"
+    assert findings[2]['median'] == 15100
+
+    print("✓ test_audit_flags_outliers PASSED")
+
+
+def test_ingest_server(tmp_path):
+    """Test that the HTTP service returns splits, enforces size limits and commits through one writer"""
+    import json
+    import threading
+    import urllib.error
+    import urllib.request
+    import loadtest
+    from datetime import date
+    from load import IngestServer, QuotaLedger
+
+    tmpdir = str(tmp_path)
+    gnucash_file = os.path.join(tmpdir, 'book.gnucash')
+    pdf_path = os.path.join(tmpdir, 'Statement for Jan 08, 2021.pdf')
+    server = None
+    try:
+        write_pdf(pdf_path, [STATEMENT_WORDS])
+        with open(pdf_path, 'rb') as f:
+            body = f.read()
+        create_gnucash_accounts(gnucash_file)
+
+        server = IngestServer(('127.0.0.1', 0), jobs=1, max_bytes=64 * 1024, timeout=30,
+                              gnucash_file=gnucash_file, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        request = urllib.request.Request(f"{url}/statements?name=Statement%20for%20Jan%2008,%202021.pdf&commit=1",
+                                         data=body, method='POST')
+        with urllib.request.urlopen(request, timeout=60) as response:
+            result = json.load(response)
+        splits = {(s['account'], s['memo']): Decimal(s['value']) for s in result['splits']}
+        assert splits[('Assets:Bank:Checking', 'Net Pay')] == Decimal('4100.00'), result['splits']
+        assert sum(splits.values()) == Decimal('0.00'), f"Splits do not balance: {result['splits']}"
+        assert result['date'] == '2021-01-08' and result['transaction'], result
+
+        # Committing the same statement again books nothing
+        try:
+            urllib.request.urlopen(request, timeout=60)
+            assert False, "Duplicate commit was accepted"
+        except urllib.error.HTTPError as e:
+            assert e.code == 409, f"Expected 409 for a duplicate commit, got {e.code}"
+            assert json.load(e)['transaction'] == result['transaction']
+
+        status, _ = loadtest.post_statement(url, 'big.pdf', b'x' * (64 * 1024 + 1), timeout=60)
+        assert status == 413, f"Expected 413 for oversized statement, got {status}"
+        status, _ = loadtest.post_statement(url, 'bad.pdf', b'not a pdf', timeout=60)
+        assert status == 422, f"Expected 422 for unreadable statement, got {status}"
+
+        result = loadtest.run(url, [('Statement for Jan 08, 2021.pdf', body)], requests=6, concurrency=3, timeout=60)
+        assert result['status'] == {'200': 6}, f"Unexpected statuses: {result}"
+
+        server.shutdown()
+        server.server_close()
+        server = None
+
+        book = piecash.open_book(gnucash_file, readonly=True, do_backup=False, open_if_lock=True)
+        transactions = list(book.transactions)
+        book.close()
+        assert len(transactions) == 1, f"Expected 1 committed transaction, got {len(transactions)}"
+        with QuotaLedger(QuotaLedger.path_for(gnucash_file)) as ledger:
+            assert ledger.balance_at('PTO', date(2021, 1, 8)) == Decimal('40.00')
+
+        print("✓ test_ingest_server PASSED")
+
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+
+
+def test_golden_harness(tmp_path):
+    """Test that the golden harness records history and detects changed output"""
+    import json
+    import golden
+
+    tmpdir = str(tmp_path)
+    write_pdf(os.path.join(tmpdir, 'Statement for Jan 08, 2021.pdf'), [STATEMENT_WORDS])
+    write_pdf(os.path.join(tmpdir, 'Statement for Jan 22, 2021.pdf'), MULTIPAGE_STATEMENT)
+
+    assert golden.run(tmpdir, update=True) == 0
+    assert golden.run(tmpdir) == 0, "Unchanged output should match the golden files"
+
+    golden_file = os.path.join(tmpdir, 'golden', 'Statement for Jan 22, 2021.json')
+    with open(golden_file) as f:
+        expected = json.load(f)
+    assert ['Assets:Bank:Checking', 'Net Pay', '4100.00'] in expected['splits'], expected['splits']
+
+    expected['rows'][1][0]['cur'] = '5,100.00'
+    with open(golden_file, 'w') as f:
+        json.dump(expected, f)
+    assert golden.run(tmpdir) == 1, "Changed output should be reported"
+
+    with open(os.path.join(tmpdir, 'golden', 'history.jsonl')) as f:
+        history = [json.loads(line) for line in f]
+    assert len(history) == 3 and history[-1]['mismatches'] == 1
+    assert set(history[-1]['files']) == {'Statement for Jan 08, 2021.pdf', 'Statement for Jan 22, 2021.pdf'}
+
+    print("✓ test_golden_harness PASSED")
+
+
 if __name__ == "__main__":
+    import pathlib
+
+    def with_tmp_path(test):
+        """Run a test that takes pytest's tmp_path in a fresh temporary directory"""
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+
     print("Running pypay automated tests...\n")
 
     try:
@@ -293,6 +1494,32 @@ if __name__ == "__main__":
         test_all_splits_included()
         test_multiple_paychecks()
         test_errata_file_processing()
+        test_amount_cents()
+        with_tmp_path(test_typed_statement_format)
+        with_tmp_path(test_manifest_orders_by_pay_date)
+        with_tmp_path(test_dedupe_manifest)
+        with_tmp_path(test_parse_file_stops_after_net_pay)
+        with_tmp_path(test_strategy_cache_per_format)
+        with_tmp_path(test_column_layout_survives_drift)
+        with_tmp_path(test_parallel_pages_match_sequential)
+        test_worker_pool_isolation()
+        with_tmp_path(test_directory_load_quarantines_bad_pdf)
+        with_tmp_path(test_failed_statement_keeps_the_rest)
+        with_tmp_path(test_changed_statement_updated_in_place)
+        with_tmp_path(test_load_metrics_textfile)
+        with_tmp_path(test_archive_closed_years)
+        with_tmp_path(test_ledger_sink)
+        with_tmp_path(test_bulk_load_mode)
+        with_tmp_path(test_book_snapshots)
+        with_tmp_path(test_quota_ledger)
+        with_tmp_path(test_pdfminer_engine_matches_pdfplumber)
+        with_tmp_path(test_export_parsers_match_pdf)
+        with_tmp_path(test_batch_load_shares_extraction_cache)
+        with_tmp_path(test_preflight_reports_unknown_descriptors)
+        with_tmp_path(test_export_line_items)
+        with_tmp_path(test_audit_flags_outliers)
+        with_tmp_path(test_ingest_server)
+        with_tmp_path(test_golden_harness)
 
         print("\n✓ All tests PASSED")
         sys.exit(0)